@@ -0,0 +1,129 @@
+"""Async versions of the hot read endpoints, on the aiosqlite engine.
+
+The sync routes run in Starlette's threadpool, one thread per request, which
+bursts of search requests exhaust. These routes await the database instead.
+They are registered ahead of the sync routers when ASYNC_DB_ENABLED is set,
+so they answer the same paths.
+
+Queries reuse the sync code through AsyncSession.run_sync: SQLAlchemy runs
+it in a greenlet and awaits aiosqlite whenever it reaches the database.
+Python work in between runs on the event loop, so search leaves its ranking,
+highlighting and query encoding to worker threads instead (see
+podcast_service.search_episodes_async).
+"""
+import logging
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Literal, Optional
+from ..models.database_session import get_async_db
+from ..models.interview_schemas import InterviewResponse, ProjectResponse
+from ..models.schemas import Episode
+from ..services import podcast_service
+from ..services.interview_ops import interview_ops_buffer
+from ..services.semantic_search import SemanticSearchUnavailable
+from . import interviews, projects
+from .routes import set_next_cursor, set_search_headers
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/episodes", response_model=List[Episode])
+async def get_episodes_async(
+    response: Response,
+    podcast_ids: List[int] = Query(...),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        episodes = await db.run_sync(
+            podcast_service.get_episodes_for_podcasts, podcast_ids, skip, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, episodes, limit)
+    return episodes
+
+
+@router.post("/episodes/search")
+async def search_episodes_async(
+    response: Response,
+    query: str = Body(""),
+    podcast_ids: List[int] = Body(...),
+    title_weight: int = Body(50),
+    description_weight: int = Body(50),
+    cap_n_matches: int = Body(10),
+    include_matches: bool = Body(True),
+    mode: Literal["lexical", "semantic", "hybrid"] = Body("lexical"),
+    semantic_weight: float = Body(0.5, ge=0, le=1),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    timings = {}
+    try:
+        episodes = await podcast_service.search_episodes_async(
+            db,
+            query,
+            podcast_ids,
+            title_weight,
+            description_weight,
+            cap_n_matches,
+            skip,
+            limit,
+            include_matches,
+            mode,
+            semantic_weight,
+            timings,
+            cursor,
+        )
+    except SemanticSearchUnavailable as e:
+        logger.warning(f"Semantic search unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_search_headers(response, episodes, limit, query, mode, timings)
+    return episodes
+
+
+@router.get("/podcasts/with_counts", response_model=List[Dict])
+async def get_podcasts_with_counts_async(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(podcast_service.get_podcast_with_episode_count)
+
+
+@router.get("/projects", response_model=List[ProjectResponse], tags=["Projects"])
+async def list_projects_async(
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        return await db.run_sync(projects._list_projects, skip, limit)
+    except Exception as e:
+        logger.error("Error listing projects", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/interviews/{interview_id}",
+    response_model=InterviewResponse,
+    tags=["Interviews"],
+)
+async def get_interview_async(
+    interview_id: int,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        if interview_ops_buffer.pending(interview_id):
+            await run_in_threadpool(interview_ops_buffer.try_flush, interview_id)
+        response = await db.run_sync(interviews._load_interview, interview_id)
+    except Exception as e:
+        logger.error(f"Error retrieving interview with ID: {interview_id}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    if not response:
+        raise HTTPException(status_code=404, detail="Interview not found")
+    return response
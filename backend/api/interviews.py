@@ -1,28 +1,26 @@
 """API endpoints for Interview Prep Interviews (workspace)."""
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from backend.models.database_session import get_db
 from backend.models.interview_schemas import (
+    AutosaveChanges,
+    InterviewAutosaveResponse,
+    InterviewConflict,
     InterviewCreate,
     InterviewUpdate,
     InterviewFullUpdate,
+    InterviewOpsBatch,
+    InterviewOpsResponse,
     InterviewResponse,
     NoteResponse,
     NoteItemResponse,
     CanvasBlockResponse,
 )
-from backend.models.interview_models import (
-    Interview,
-    Note,
-    NoteItem,
-    CanvasBlock,
-    Project,
-    ItemType,
-    ProvenanceType,
-    BlockType,
-)
+from backend.models.interview_models import Interview, InterviewOpsSession, Note, Project
+from backend.services import interview_service
+from backend.services.interview_ops import interview_ops_buffer
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -42,64 +40,12 @@ def create_interview(
             logger.warning(f"Project not found with ID: {interview.project_id}")
             raise HTTPException(status_code=404, detail="Project not found")
 
-        # Create interview
-        db_interview = Interview(
-            project_id=interview.project_id,
-            interview_title=interview.interview_title,
-            background_context=interview.background_context,
-        )
-        db.add(db_interview)
-        db.flush()  # Get interview ID without committing
-
-        # Create notes with items
-        for note_data in interview.notes:
-            db_note = Note(
-                interview_id=db_interview.id,
-                title=note_data.title,
-                order_index=note_data.order_index,
-            )
-            db.add(db_note)
-            db.flush()  # Get note ID
-
-            # Create note items
-            for item_data in note_data.items:
-                db_item = NoteItem(
-                    note_id=db_note.id,
-                    type=ItemType(item_data.type),
-                    content=item_data.content,
-                    provenance=ProvenanceType(item_data.provenance),
-                    source_title=item_data.source_title,
-                    source_domain=item_data.source_domain,
-                    order_index=item_data.order_index,
-                )
-                db.add(db_item)
-
-        # Create canvas blocks
-        for block_data in interview.canvas_blocks:
-            db_block = CanvasBlock(
-                interview_id=db_interview.id,
-                type=BlockType(block_data.type),
-                text=block_data.text,
-                order_index=block_data.order_index,
-            )
-            db.add(db_block)
-
+        interview_id = interview_service.create_interview(db, interview)
         db.commit()
-        db.refresh(db_interview)
 
-        # Load with relationships for response
-        db_interview = (
-            db.query(Interview)
-            .options(
-                joinedload(Interview.notes).joinedload(Note.items),
-                joinedload(Interview.canvas_blocks),
-            )
-            .filter(Interview.id == db_interview.id)
-            .first()
-        )
-
-        logger.info(f"Successfully created interview with ID: {db_interview.id}")
-        return InterviewResponse.model_validate(db_interview)
+        response = _load_interview(db, interview_id)
+        logger.info(f"Successfully created interview with ID: {interview_id}")
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -108,6 +54,33 @@ def create_interview(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _load_interview(db: Session, interview_id: int) -> Optional[InterviewResponse]:
+    """An interview with its notes, items and canvas blocks, or None."""
+    db_interview = (
+        db.query(Interview)
+        .options(
+            selectinload(Interview.notes).selectinload(Note.items),
+            selectinload(Interview.canvas_blocks),
+        )
+        .filter(Interview.id == interview_id)
+        .first()
+    )
+    return InterviewResponse.model_validate(db_interview) if db_interview else None
+
+
+def _conflict(
+    db: Session, conflict: interview_service.InterviewVersionConflict
+) -> HTTPException:
+    """A 409 with the changes a stale write missed."""
+    db.rollback()
+    logger.info(str(conflict))
+    changes = interview_service.changes_since(db, conflict.interview_id, conflict.version)
+    return HTTPException(
+        status_code=409,
+        detail=InterviewConflict.model_validate(changes).model_dump(mode="json"),
+    )
+
+
 @router.get("/interviews/{interview_id}", response_model=InterviewResponse)
 def get_interview(
     interview_id: int,
@@ -116,22 +89,16 @@ def get_interview(
     """Get an interview workspace with all nested data."""
     logger.info(f"Retrieving interview with ID: {interview_id}")
     try:
-        db_interview = (
-            db.query(Interview)
-            .options(
-                joinedload(Interview.notes).joinedload(Note.items),
-                joinedload(Interview.canvas_blocks),
-            )
-            .filter(Interview.id == interview_id)
-            .first()
-        )
+        # If pending edits fail to write, serve what is committed
+        interview_ops_buffer.try_flush(interview_id)
+        response = _load_interview(db, interview_id)
 
-        if not db_interview:
+        if not response:
             logger.warning(f"Interview not found with ID: {interview_id}")
             raise HTTPException(status_code=404, detail="Interview not found")
 
-        logger.info(f"Successfully retrieved interview: {db_interview.interview_title}")
-        return InterviewResponse.model_validate(db_interview)
+        logger.info(f"Successfully retrieved interview: {response.interview_title}")
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -148,12 +115,18 @@ def update_interview(
     """Update interview metadata (title and/or background context)."""
     logger.info(f"Updating interview with ID: {interview_id}")
     try:
+        interview_ops_buffer.flush(interview_id)
         db_interview = db.query(Interview).filter(Interview.id == interview_id).first()
 
         if not db_interview:
             logger.warning(f"Interview not found with ID: {interview_id}")
             raise HTTPException(status_code=404, detail="Interview not found")
 
+        try:
+            interview_service.bump_version(db, interview_id, interview_update.version)
+        except interview_service.InterviewVersionConflict as e:
+            raise _conflict(db, e)
+
         # Update fields if provided
         if interview_update.interview_title is not None:
             db_interview.interview_title = interview_update.interview_title
@@ -166,8 +139,8 @@ def update_interview(
         db_interview = (
             db.query(Interview)
             .options(
-                joinedload(Interview.notes).joinedload(Note.items),
-                joinedload(Interview.canvas_blocks),
+                selectinload(Interview.notes).selectinload(Note.items),
+                selectinload(Interview.canvas_blocks),
             )
             .filter(Interview.id == interview_id)
             .first()
@@ -183,78 +156,48 @@ def update_interview(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/interviews/{interview_id}/autosave", response_model=InterviewResponse)
+@router.post(
+    "/interviews/{interview_id}/autosave", response_model=InterviewAutosaveResponse
+)
 def autosave_interview(
     interview_id: int,
     interview_data: InterviewFullUpdate,
     db: Session = Depends(get_db),
 ):
-    """Full save/autosave of interview state (replaces all nested entities)."""
+    """Full save/autosave of interview state.
+
+    Nested entities are matched by client_id and only changed rows are
+    written; the response reports the rows written in "changes". If the
+    "version" sent is stale, nothing is written and a 409 returns what
+    changed since (see InterviewConflict).
+    """
     logger.info(f"Autosaving interview with ID: {interview_id}")
     try:
+        # Pending operations are older than this autosave
+        interview_ops_buffer.flush(interview_id)
         db_interview = db.query(Interview).filter(Interview.id == interview_id).first()
 
         if not db_interview:
             logger.warning(f"Interview not found with ID: {interview_id}")
             raise HTTPException(status_code=404, detail="Interview not found")
 
-        # Update interview fields
-        db_interview.interview_title = interview_data.interview_title
-        db_interview.background_context = interview_data.background_context
-
-        # Delete existing notes and canvas blocks (cascade will delete items)
-        db.query(Note).filter(Note.interview_id == interview_id).delete()
-        db.query(CanvasBlock).filter(CanvasBlock.interview_id == interview_id).delete()
-        db.flush()
-
-        # Recreate notes with items
-        for note_data in interview_data.notes:
-            db_note = Note(
-                interview_id=interview_id,
-                title=note_data.title,
-                order_index=note_data.order_index,
-            )
-            db.add(db_note)
-            db.flush()
-
-            for item_data in note_data.items:
-                db_item = NoteItem(
-                    note_id=db_note.id,
-                    type=ItemType(item_data.type),
-                    content=item_data.content,
-                    provenance=ProvenanceType(item_data.provenance),
-                    source_title=item_data.source_title,
-                    source_domain=item_data.source_domain,
-                    order_index=item_data.order_index,
-                )
-                db.add(db_item)
-
-        # Recreate canvas blocks
-        for block_data in interview_data.canvas_blocks:
-            db_block = CanvasBlock(
-                interview_id=interview_id,
-                type=BlockType(block_data.type),
-                text=block_data.text,
-                order_index=block_data.order_index,
+        try:
+            changes = interview_service.autosave_interview(
+                db, db_interview, interview_data
             )
-            db.add(db_block)
-
+        except interview_service.InterviewVersionConflict as e:
+            raise _conflict(db, e)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         db.commit()
 
-        # Reload with relationships
-        db_interview = (
-            db.query(Interview)
-            .options(
-                joinedload(Interview.notes).joinedload(Note.items),
-                joinedload(Interview.canvas_blocks),
-            )
-            .filter(Interview.id == interview_id)
-            .first()
+        response = _load_interview(db, interview_id)
+        logger.info(f"Successfully autosaved interview: {response.interview_title}")
+        return InterviewAutosaveResponse(
+            **response.model_dump(), changes=AutosaveChanges(**changes)
         )
-
-        logger.info(f"Successfully autosaved interview: {db_interview.interview_title}")
-        return InterviewResponse.model_validate(db_interview)
     except HTTPException:
+        db.rollback()
         raise
     except Exception as e:
         logger.error(f"Error autosaving interview with ID: {interview_id}", exc_info=True)
@@ -262,6 +205,49 @@ def autosave_interview(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/interviews/{interview_id}/ops", response_model=InterviewOpsResponse)
+def apply_interview_ops(
+    interview_id: int,
+    batch: InterviewOpsBatch,
+    flush: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Apply a batch of granular edits to an interview.
+
+    Edits are coalesced with the ones that follow and written together
+    within INTERVIEW_OPS_FLUSH_DELAY seconds, or before responding with
+    flush=true. A batch whose client_seq was already accepted from the same
+    session is ignored, so batches can be retried.
+    """
+    logger.debug(f"Applying {len(batch.ops)} operations to interview {interview_id}")
+    try:
+        if not db.query(Interview.id).filter(Interview.id == interview_id).first():
+            logger.warning(f"Interview not found with ID: {interview_id}")
+            raise HTTPException(status_code=404, detail="Interview not found")
+
+        stored_seq = (
+            db.query(InterviewOpsSession.seq)
+            .filter(
+                InterviewOpsSession.interview_id == interview_id,
+                InterviewOpsSession.session_id == batch.session_id,
+            )
+            .scalar()
+        )
+        return interview_ops_buffer.submit(
+            interview_id,
+            batch.session_id,
+            stored_seq,
+            batch.client_seq,
+            batch.ops,
+            flush=flush,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying operations to interview with ID: {interview_id}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/interviews/{interview_id}", status_code=204)
 def delete_interview(
     interview_id: int,
@@ -277,6 +263,7 @@ def delete_interview(
             raise HTTPException(status_code=404, detail="Interview not found")
 
         interview_title = db_interview.interview_title
+        interview_ops_buffer.discard(interview_id)
         db.delete(db_interview)
         db.commit()
 
@@ -2,7 +2,7 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import exists, func, select
 from typing import List
 from backend.models.database_session import get_db
 from backend.models.interview_schemas import (
@@ -17,6 +17,53 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _projects_with_stats(db: Session):
+    """Query of (project, note_count, has_context) rows.
+
+    The stats are correlated subqueries rather than joins grouped by project,
+    so a page of projects is read in last_modified order straight from its
+    index and only the projects on the page are counted.
+    """
+    note_count = (
+        select(func.count(Note.id))
+        .join(Interview, Note.interview_id == Interview.id)
+        .where(Interview.project_id == Project.id)
+        .correlate(Project)
+        .scalar_subquery()
+    )
+    has_context = (
+        exists()
+        .where(
+            Interview.project_id == Project.id,
+            func.length(Interview.background_context) > 0,
+        )
+        .correlate(Project)
+    )
+    return db.query(
+        Project, note_count.label("note_count"), has_context.label("has_context")
+    )
+
+
+def _list_projects(db: Session, skip: int, limit: int) -> List[ProjectResponse]:
+    """A page of projects with statistics, most recently modified first."""
+    projects_query = (
+        _projects_with_stats(db)
+        .order_by(Project.last_modified.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+
+    results = []
+    for project, note_count, has_context in projects_query:
+        response = ProjectResponse.model_validate(project)
+        response.stats = ProjectStats(
+            note_count=note_count or 0,
+            has_context=bool(has_context),
+        )
+        results.append(response)
+    return results
+
+
 @router.post("/projects", response_model=ProjectResponse, status_code=201)
 def create_project(
     project: ProjectCreate,
@@ -50,30 +97,7 @@ def list_projects(
     """List all projects with pagination and statistics."""
     logger.info(f"Listing projects with skip={skip}, limit={limit}")
     try:
-        # Query projects with stats
-        projects_query = (
-            db.query(
-                Project,
-                func.count(Note.id).label("note_count"),
-                func.max(func.length(Interview.background_context) > 0).label("has_context"),
-            )
-            .outerjoin(Interview, Project.id == Interview.project_id)
-            .outerjoin(Note, Interview.id == Note.interview_id)
-            .group_by(Project.id)
-            .order_by(Project.last_modified.desc())
-            .offset(skip)
-            .limit(limit)
-        )
-
-        results = []
-        for project, note_count, has_context in projects_query:
-            response = ProjectResponse.model_validate(project)
-            response.stats = ProjectStats(
-                note_count=note_count or 0,
-                has_context=bool(has_context),
-            )
-            results.append(response)
-
+        results = _list_projects(db, skip, limit)
         logger.info(f"Successfully retrieved {len(results)} projects")
         return results
     except Exception as e:
@@ -90,18 +114,7 @@ def get_project(
     logger.info(f"Retrieving project with ID: {project_id}")
     try:
         # Query project with stats
-        result = (
-            db.query(
-                Project,
-                func.count(Note.id).label("note_count"),
-                func.max(func.length(Interview.background_context) > 0).label("has_context"),
-            )
-            .outerjoin(Interview, Project.id == Interview.project_id)
-            .outerjoin(Note, Interview.id == Note.interview_id)
-            .filter(Project.id == project_id)
-            .group_by(Project.id)
-            .first()
-        )
+        result = _projects_with_stats(db).filter(Project.id == project_id).first()
 
         if not result:
             logger.warning(f"Project not found with ID: {project_id}")
@@ -1,10 +1,24 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Body,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional, Union
 from ..models.database_session import get_db
 from ..models.schemas import Podcast, PodcastCreate, Episode, SearchWeights
 from ..services import podcast_service
+from ..services.episode_index import episode_index
+from ..services.opml_import import opml_import_service, parse_opml
+from ..services.refresh_service import refresh_service
+from ..services.refresh_scheduler import refresh_scheduler
+from ..services.semantic_search import SemanticSearchUnavailable
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -15,14 +29,18 @@ class RssUrlInput(BaseModel):
     rss_url: str
 
 
+class RefreshInput(BaseModel):
+    podcast_ids: Union[List[int], Literal["all"]] = "all"
+
+
 @router.post("/podcasts/validate")
-def validate_rss_feed(
+async def validate_rss_feed(
     input_data: RssUrlInput,
 ):
     logger.info(f"Validating RSS feed: {input_data.rss_url}")
     try:
         is_valid, message, homepage_url, image_url, description = (
-            podcast_service.validate_rss_feed(input_data.rss_url)
+            await podcast_service.validate_rss_feed(input_data.rss_url)
         )
         if not is_valid:
             logger.warning(f"Invalid RSS feed: {input_data.rss_url} - {message}")
@@ -34,16 +52,8 @@ def validate_rss_feed(
                 "title": message,
                 "description": description,
                 "rss_url": input_data.rss_url,
-                "homepage_url": (
-                    homepage_url
-                    if homepage_url and homepage_url.startswith(("http://", "https://"))
-                    else None
-                ),
-                "image_url": (
-                    image_url
-                    if image_url and image_url.startswith(("http://", "https://"))
-                    else None
-                ),
+                "homepage_url": podcast_service.http_url(homepage_url),
+                "image_url": podcast_service.http_url(image_url),
             },
         }
     except Exception as e:
@@ -72,13 +82,58 @@ def get_podcasts_with_counts(db: Session = Depends(get_db)):
     return podcast_service.get_podcast_with_episode_count(db)
 
 
+@router.post("/podcasts/refresh")
+async def refresh_podcasts(input_data: RefreshInput, db: Session = Depends(get_db)):
+    """Refresh several podcasts concurrently; returns a result per podcast."""
+    logger.info(f"Refreshing podcasts: {input_data.podcast_ids}")
+    try:
+        return await refresh_service.refresh_podcasts(db, input_data.podcast_ids)
+    except Exception as e:
+        logger.error("Error refreshing podcasts", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/podcasts/refresh/schedule")
+def get_refresh_schedule():
+    """Background refresh scheduler state, with per-podcast lag."""
+    return refresh_scheduler.status()
+
+
+@router.post("/podcasts/import_opml", status_code=202)
+async def import_opml(
+    request: Request, background_tasks: BackgroundTasks, ingest: bool = False
+):
+    """Import the feeds of an OPML document (the request body) in the background.
+
+    Returns the import job; poll GET /podcasts/import_opml/{job_id} for its
+    progress. With ingest=true, the added podcasts are refreshed too.
+    """
+    try:
+        feeds = parse_opml(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Importing {len(feeds)} feeds from OPML")
+    job = opml_import_service.create_job(feeds, ingest)
+    background_tasks.add_task(opml_import_service.run_job, job["job_id"], feeds)
+    return job
+
+
+@router.get("/podcasts/import_opml/{job_id}")
+def get_opml_import(job_id: str):
+    """Progress of an OPML import."""
+    job = opml_import_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
 @router.post("/podcasts/{podcast_id}/refresh")
 def refresh_podcast(podcast_id: int, db: Session = Depends(get_db)):
     podcast = podcast_service.get_podcast(db, podcast_id)
     if not podcast:
         raise HTTPException(status_code=404, detail="Podcast not found")
-    new_episodes = podcast_service.update_podcast_episodes(db, podcast)
-    return {"message": f"Added {len(new_episodes)} new episodes"}
+    result = podcast_service.update_podcast_episodes(db, podcast)
+    return {"message": f"Added {result['inserted']} new episodes", **result}
 
 
 @router.post("/episodes/delete")
@@ -89,38 +144,108 @@ def delete_episodes(podcast_ids: List[int] = Body(...), db: Session = Depends(ge
 
 @router.get("/episodes", response_model=List[Episode])
 def get_episodes(
+    response: Response,
     podcast_ids: List[int] = Query(...),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    return podcast_service.get_episodes_for_podcasts(db, podcast_ids, skip, limit)
+    """List episodes, most recent first.
+
+    Full pages return an X-Next-Cursor header; pass it as cursor to get the
+    next page.
+    """
+    try:
+        episodes = podcast_service.get_episodes_for_podcasts(
+            db, podcast_ids, skip, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, episodes, limit)
+    return episodes
 
 
 @router.post("/episodes/search")
 def search_episodes(
+    response: Response,
     query: str = Body(""),
     podcast_ids: List[int] = Body(...),
     title_weight: int = Body(50),
     description_weight: int = Body(50),
     cap_n_matches: int = Body(10),
+    include_matches: bool = Body(True),
+    mode: Literal["lexical", "semantic", "hybrid"] = Body("lexical"),
+    semantic_weight: float = Body(0.5, ge=0, le=1),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    episodes = podcast_service.search_episodes(
-        db,
-        query,
-        podcast_ids,
-        title_weight,
-        description_weight,
-        cap_n_matches,
-        skip,
-        limit,
-    )
+    """Search episodes; per-stage durations are returned in a Server-Timing header.
+
+    Full pages of lexical results return an X-Next-Cursor header; pass it as
+    cursor to get the next page.
+    """
+    timings = {}
+    try:
+        episodes = podcast_service.search_episodes(
+            db,
+            query,
+            podcast_ids,
+            title_weight,
+            description_weight,
+            cap_n_matches,
+            skip,
+            limit,
+            include_matches,
+            mode,
+            semantic_weight,
+            timings,
+            cursor,
+        )
+    except SemanticSearchUnavailable as e:
+        logger.warning(f"Semantic search unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_search_headers(response, episodes, limit, query, mode, timings)
     return episodes
 
 
+def set_next_cursor(response: Response, episodes: List, limit: int) -> None:
+    """Send the cursor of the page after a full page of episodes."""
+    if episodes and len(episodes) == limit:
+        response.headers["X-Next-Cursor"] = podcast_service.episode_cursor(
+            episodes[-1]
+        )
+
+
+def set_search_headers(
+    response: Response,
+    results: List[Dict],
+    limit: int,
+    query: str,
+    mode: str,
+    timings: Dict[str, float],
+) -> None:
+    """Send search stage durations, and the next page's cursor if pageable."""
+    if results and len(results) == limit and (mode == "lexical" or not query):
+        last = results[-1]
+        response.headers["X-Next-Cursor"] = podcast_service.episode_cursor(
+            last["episode"], last.get("score")
+        )
+    response.headers["Server-Timing"] = ", ".join(
+        f"{stage};dur={duration:.1f}" for stage, duration in timings.items()
+    )
+
+
+@router.get("/episodes/index/stats")
+def get_episode_index_stats():
+    """Get the size and approximate memory use of the in-memory episode index."""
+    return episode_index.memory_report()
+
+
 @router.get("/status_db")
 def get_db_status(db: Session = Depends(get_db)):
     """Get the number of rows in each database table."""
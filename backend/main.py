@@ -1,12 +1,23 @@
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api.routes import router
+from backend.api.async_routes import router as async_router
 from backend.api.projects import router as projects_router
 from backend.api.interviews import router as interviews_router
 from backend.api.search import router as search_router
 from backend.api.text_refinement import router as text_refinement_router
-from backend.models.database import create_tables
+from backend.models.database import ASYNC_DB_ENABLED, create_tables
+from backend.models.database_session import SessionLocal, async_engine
+from backend.services import podcast_service
+from backend.services.episode_index import episode_index
+from backend.services.feed_fetcher import feed_client
+from backend.services import semantic_search
+from backend.services.semantic_search import semantic_index
+from backend.services import refresh_scheduler as scheduler
+from backend.services.refresh_scheduler import refresh_scheduler
+from backend.services.interview_ops import interview_ops_buffer
 import time
 
 # Configure logging
@@ -29,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
 
 
@@ -46,6 +58,9 @@ async def log_requests(request: Request, call_next):
 
 
 # Include routers
+if ASYNC_DB_ENABLED:
+    # Registered first, so they answer instead of their sync versions
+    app.include_router(async_router, prefix="/api")
 app.include_router(router, prefix="/api")
 app.include_router(projects_router, prefix="/api", tags=["Projects"])
 app.include_router(interviews_router, prefix="/api", tags=["Interviews"])
@@ -53,9 +68,50 @@ app.include_router(search_router, prefix="/api", tags=["Search"])
 app.include_router(text_refinement_router, prefix="/api", tags=["Text Refinement"])
 
 
+def build_episode_index():
+    db = SessionLocal()
+    try:
+        episode_index.build(db)
+    finally:
+        db.close()
+
+
+def load_semantic_index():
+    semantic_index.load()
+    db = SessionLocal()
+    try:
+        semantic_index.sync(db)
+    except Exception:
+        logger.error("Error syncing semantic index", exc_info=True)
+    finally:
+        db.close()
+
+
 # Create tables on startup
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up Hesketomat API")
     create_tables()
     logger.info("Database tables created")
+    if podcast_service.SEARCH_ENGINE == "index":
+        # Searches use the FTS5 index until the build completes
+        asyncio.get_running_loop().run_in_executor(None, build_episode_index)
+    if semantic_search.SEMANTIC_SEARCH_ENABLED:
+        asyncio.get_running_loop().run_in_executor(None, load_semantic_index)
+    if scheduler.REFRESH_SCHEDULER_ENABLED:
+        refresh_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await refresh_scheduler.stop()
+    await feed_client.aclose()
+    # Write interview edits still waiting to be coalesced
+    interview_ops_buffer.close()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if semantic_index.loaded:
+        # Queued episodes not embedded yet are picked up by the next sync
+        semantic_index.close()
+        # The index is persisted in batches; write out pending changes
+        semantic_index.save()
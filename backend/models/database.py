@@ -1,9 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, create_engine
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    create_engine,
+    event,
+    insert,
+    inspect,
+    text,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 from datetime import datetime
+from typing import Dict, List, Optional
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 
@@ -17,6 +36,13 @@ class Podcast(Base):
     image_url = Column(String)
     homepage_url = Column(String)
     last_updated = Column(DateTime, default=datetime.utcnow)
+    # Cache validators of the last feed download
+    feed_etag = Column(String)
+    feed_last_modified = Column(String)
+    feed_content_hash = Column(String)
+    # Guid of the newest entry of the last feed ingest that ran to the end;
+    # streamed ingests only stop early at stored entries older than it
+    feed_high_water = Column(String)
     episodes = relationship(
         "Episode", back_populates="podcast", cascade="all, delete-orphan"
     )
@@ -32,21 +58,260 @@ class Episode(Base):
     url = Column(String)
     image_url = Column(String)
     publish_date = Column(DateTime)
+    # Stable identity within the feed (the entry's guid, or its link if it
+    # has none) and a hash of the stored entry fields
+    guid = Column(String)
+    content_hash = Column(String)
     podcast = relationship("Podcast", back_populates="episodes")
 
+    __table_args__ = (
+        Index("ux_episodes_podcast_guid", "podcast_id", "guid", unique=True),
+        # Listing a podcast's episodes newest first reads this index in order
+        Index("ix_episodes_podcast_publish_date", "podcast_id", "publish_date"),
+    )
+
+
+# Full-text index mirroring episodes.title/description. The trigram tokenizer
+# gives case-insensitive substring matching, which is what the regex search
+# in podcast_service does, so the index can be used as its candidate filter.
+EPISODE_FTS_TABLE = "episodes_fts"
+
+EPISODE_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {EPISODE_FTS_TABLE} USING fts5(
+        title, description,
+        content='episodes', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS episodes_fts_ai AFTER INSERT ON episodes BEGIN
+        INSERT INTO {EPISODE_FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS episodes_fts_ad AFTER DELETE ON episodes BEGIN
+        INSERT INTO {EPISODE_FTS_TABLE}({EPISODE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS episodes_fts_au AFTER UPDATE ON episodes BEGIN
+        INSERT INTO {EPISODE_FTS_TABLE}({EPISODE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {EPISODE_FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def has_episode_fts(connection) -> bool:
+    """Check whether the episodes full-text index exists on this connection."""
+    if connection.dialect.name != "sqlite":
+        return False
+    return (
+        connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": EPISODE_FTS_TABLE},
+        ).first()
+        is not None
+    )
+
+
+def ensure_episode_fts(connection) -> bool:
+    """Create the episodes full-text index and its sync triggers if missing.
+
+    An index created over an already populated episodes table is rebuilt from
+    it. Returns False when the SQLite build lacks FTS5/trigram support, in
+    which case search falls back to the regex scan.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    created = not has_episode_fts(connection)
+    try:
+        for statement in EPISODE_FTS_DDL:
+            connection.execute(text(statement))
+        if created:
+            connection.execute(
+                text(
+                    f"INSERT INTO {EPISODE_FTS_TABLE}({EPISODE_FTS_TABLE}) "
+                    "VALUES ('rebuild')"
+                )
+            )
+    except OperationalError:
+        logger.warning(
+            "SQLite FTS5 trigram tokenizer unavailable, episode search will scan",
+            exc_info=True,
+        )
+        return False
+    return True
+
+
+@event.listens_for(Episode.__table__, "after_create")
+def _create_episode_fts(target, connection, **kw):
+    ensure_episode_fts(connection)
+
+
+@event.listens_for(Episode.__table__, "before_drop")
+def _drop_episode_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {EPISODE_FTS_TABLE}"))
+
 
 # Create data directory if it doesn't exist
 os.makedirs("data", exist_ok=True)
 
-# Database URL will be loaded from environment variables
-SQLALCHEMY_DATABASE_URL = "sqlite:///data/podcasts.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/podcasts.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# SQLite settings applied to every connection. WAL lets searches read while a
+# feed refresh writes; synchronous=NORMAL is durable in WAL mode except for
+# the last transactions before a power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative sizes are in KiB
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 2**20))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+# Connections kept open, and opened on top of them under load
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Serve the hot read routes from an aiosqlite engine instead of the threadpool
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "false").lower() == "true"
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas: Optional[Dict] = None) -> None:
+    """Apply SQLite pragmas (SQLITE_PRAGMAS by default) to a DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or SQLITE_PRAGMAS).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(url: str, pragmas: Optional[Dict] = None, **kwargs):
+    """Engine for a SQLite database, with the pragmas set on each connection.
+
+    File databases get a pool of DB_POOL_SIZE connections; in-memory ones
+    keep SQLAlchemy's default single-connection pool.
+    """
+    _set_pool_defaults(url, kwargs)
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+    return engine
+
+
+def create_async_sqlite_engine(
+    url: str, pragmas: Optional[Dict] = None, **kwargs
+) -> AsyncEngine:
+    """Like create_sqlite_engine, but for asyncio through the aiosqlite driver.
+
+    url may name any SQLite driver; the engine always uses aiosqlite.
+    """
+    url = make_url(url).set(drivername="sqlite+aiosqlite").render_as_string(
+        hide_password=False
+    )
+    _set_pool_defaults(url, kwargs)
+    engine = create_async_engine(url, **kwargs)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+    return engine
+
+
+def _set_pool_defaults(url: str, kwargs: Dict) -> None:
+    database = make_url(url).database
+    if database and ":memory:" not in database and "poolclass" not in kwargs:
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+        kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+
+
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
+
+
+def add_missing_columns(connection) -> None:
+    """Add model columns missing from tables created by an older version.
+
+    create_all() only creates missing tables, so columns added to existing
+    models are added here. New columns have to be nullable or have a
+    server_default, which existing rows get.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                if column.server_default is not None:
+                    column_type += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        column_type += " NOT NULL"
+                logger.info(f"Adding column {table.name}.{column.name}")
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+
+
+def add_missing_indexes(connection) -> None:
+    """Create model indexes missing from tables created by an older version."""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f"Creating index {index.name}")
+                index.create(connection)
+
+
+def insert_rows(db: Session, model, rows: List[Dict]) -> List[int]:
+    """Insert rows in at most two statements; return their ids in order.
+
+    SQLite cannot return the ids of a multi-row INSERT in parameter order,
+    and SQLAlchemy falls back to one INSERT per row when asked to. So the
+    first row is inserted alone for its id, which also takes the write lock
+    until commit, and the others are inserted in one executemany with the
+    ids after it: SQLite gives a new row the largest id plus one, so none
+    of them is taken.
+    """
+    if not rows:
+        return []
+    first_id = db.execute(
+        insert(model).values(**rows[0]).returning(model.id)
+    ).scalar_one()
+    ids = list(range(first_id, first_id + len(rows)))
+    if len(rows) > 1:
+        db.execute(
+            insert(model),
+            [{**row, "id": row_id} for row, row_id in zip(rows[1:], ids[1:])],
+        )
+    return ids
 
 
 def create_tables():
     # Import interview models to ensure they're registered with Base
     from backend.models import interview_models  # noqa: F401
+    with engine.begin() as connection:
+        add_missing_columns(connection)
+        add_missing_indexes(connection)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_episode_fts(connection)
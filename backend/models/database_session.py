@@ -1,11 +1,29 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from .database import engine
+from .database import (
+    ASYNC_DB_ENABLED,
+    SQLALCHEMY_DATABASE_URL,
+    create_async_sqlite_engine,
+    engine,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The aiosqlite engine is only created when the async read routes are enabled
+async_engine = (
+    create_async_sqlite_engine(SQLALCHEMY_DATABASE_URL) if ASYNC_DB_ENABLED else None
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.models.database import Base
@@ -29,15 +29,37 @@ class Interview(Base):
     interview_title = Column(String, nullable=False)
     background_context = Column(Text, default="")
     timestamp = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     project = relationship("Project", back_populates="interviews")
     notes = relationship(
-        "Note", back_populates="interview", cascade="all, delete-orphan", order_by="Note.order_index"
+        "Note",
+        back_populates="interview",
+        cascade="all, delete-orphan",
+        order_by="(Note.interview_id, Note.order_index)",
     )
     canvas_blocks = relationship(
-        "CanvasBlock", back_populates="interview", cascade="all, delete-orphan", order_by="CanvasBlock.order_index"
+        "CanvasBlock",
+        back_populates="interview",
+        cascade="all, delete-orphan",
+        order_by="(CanvasBlock.interview_id, CanvasBlock.order_index)",
     )
+    ops_sessions = relationship(
+        "InterviewOpsSession", back_populates="interview", cascade="all, delete-orphan"
+    )
+
+
+class InterviewOpsSession(Base):
+    """Last operations batch written from one client session of an interview."""
+    __tablename__ = "interview_ops_sessions"
+
+    interview_id = Column(Integer, ForeignKey("interviews.id"), primary_key=True)
+    session_id = Column(String, primary_key=True)  # assigned by the client
+    seq = Column(Integer, nullable=False)
+
+    # Relationships
+    interview = relationship("Interview", back_populates="ops_sessions")
 
 
 class Note(Base):
@@ -45,7 +67,10 @@ class Note(Base):
     __tablename__ = "notes"
 
     id = Column(Integer, primary_key=True, index=True)
-    interview_id = Column(Integer, ForeignKey("interviews.id"), nullable=False, index=True)
+    interview_id = Column(Integer, ForeignKey("interviews.id"), nullable=False)
+    client_id = Column(String, nullable=True)  # stable id assigned by the client
+    # Interview version that last wrote the row
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     title = Column(String, nullable=False)
     order_index = Column(Integer, default=0, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -53,9 +78,14 @@ class Note(Base):
     # Relationships
     interview = relationship("Interview", back_populates="notes")
     items = relationship(
-        "NoteItem", back_populates="note", cascade="all, delete-orphan", order_by="NoteItem.order_index"
+        "NoteItem",
+        back_populates="note",
+        cascade="all, delete-orphan",
+        order_by="(NoteItem.note_id, NoteItem.order_index)",
     )
 
+    __table_args__ = (Index("ix_notes_interview_order", "interview_id", "order_index"),)
+
 
 class ItemType(str, enum.Enum):
     """Type of note item content."""
@@ -74,7 +104,10 @@ class NoteItem(Base):
     __tablename__ = "note_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    client_id = Column(String, nullable=True)  # stable id assigned by the client
+    # Interview version that last wrote the row
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     type = Column(Enum(ItemType), nullable=False)
     content = Column(Text, nullable=False)  # text content or image URL
     provenance = Column(Enum(ProvenanceType), default=ProvenanceType.MANUAL)
@@ -86,6 +119,8 @@ class NoteItem(Base):
     # Relationships
     note = relationship("Note", back_populates="items")
 
+    __table_args__ = (Index("ix_note_items_note_order", "note_id", "order_index"),)
+
 
 class BlockType(str, enum.Enum):
     """Type of canvas block."""
@@ -98,7 +133,10 @@ class CanvasBlock(Base):
     __tablename__ = "canvas_blocks"
 
     id = Column(Integer, primary_key=True, index=True)
-    interview_id = Column(Integer, ForeignKey("interviews.id"), nullable=False, index=True)
+    interview_id = Column(Integer, ForeignKey("interviews.id"), nullable=False)
+    client_id = Column(String, nullable=True)  # stable id assigned by the client
+    # Interview version that last wrote the row
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     type = Column(Enum(BlockType), nullable=False)
     text = Column(Text, nullable=False)
     order_index = Column(Integer, default=0, index=True)
@@ -106,3 +144,7 @@ class CanvasBlock(Base):
 
     # Relationships
     interview = relationship("Interview", back_populates="canvas_blocks")
+
+    __table_args__ = (
+        Index("ix_canvas_blocks_interview_order", "interview_id", "order_index"),
+    )
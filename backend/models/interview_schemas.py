@@ -1,7 +1,7 @@
 """Pydantic schemas for Interview Prep API."""
-from pydantic import BaseModel, Field, HttpUrl, field_validator
+from pydantic import BaseModel, Field, HttpUrl, field_validator, model_validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from enum import Enum
 
 
@@ -77,6 +77,7 @@ class NoteItemBase(BaseModel):
 class NoteItemCreate(NoteItemBase):
     """Schema for creating a note item."""
     order_index: int = Field(default=0, ge=0)
+    client_id: Optional[str] = Field(None, max_length=64, description="Stable client-side id, matched on autosave")
 
 
 class NoteItemUpdate(BaseModel):
@@ -88,6 +89,8 @@ class NoteItemUpdate(BaseModel):
 class NoteItemResponse(NoteItemBase):
     """Response schema for note item."""
     id: int
+    note_id: int
+    client_id: Optional[str] = None
     order_index: int
     created_at: datetime
 
@@ -105,6 +108,7 @@ class NoteBase(BaseModel):
 class NoteCreate(NoteBase):
     """Schema for creating a note."""
     order_index: int = Field(default=0, ge=0)
+    client_id: Optional[str] = Field(None, max_length=64, description="Stable client-side id, matched on autosave")
     items: List[NoteItemCreate] = Field(default_factory=list)
 
 
@@ -117,6 +121,7 @@ class NoteUpdate(BaseModel):
 class NoteResponse(NoteBase):
     """Response schema for note."""
     id: int
+    client_id: Optional[str] = None
     order_index: int
     created_at: datetime
     items: List[NoteItemResponse] = Field(default_factory=list)
@@ -136,6 +141,7 @@ class CanvasBlockBase(BaseModel):
 class CanvasBlockCreate(CanvasBlockBase):
     """Schema for creating a canvas block."""
     order_index: int = Field(default=0, ge=0)
+    client_id: Optional[str] = Field(None, max_length=64, description="Stable client-side id, matched on autosave")
 
 
 class CanvasBlockUpdate(BaseModel):
@@ -147,6 +153,7 @@ class CanvasBlockUpdate(BaseModel):
 class CanvasBlockResponse(CanvasBlockBase):
     """Response schema for canvas block."""
     id: int
+    client_id: Optional[str] = None
     order_index: int
     created_at: datetime
 
@@ -173,10 +180,12 @@ class InterviewUpdate(BaseModel):
     """Schema for updating an interview."""
     interview_title: Optional[str] = Field(None, min_length=1, max_length=500)
     background_context: Optional[str] = Field(None, max_length=50000)
+    version: Optional[int] = Field(None, ge=1, description="Version the update is based on; a stale one gets a 409")
 
 
 class InterviewFullUpdate(InterviewBase):
     """Schema for full interview update (including nested entities)."""
+    version: Optional[int] = Field(None, ge=1, description="Version the state is based on; a stale one gets a 409")
     notes: List[NoteCreate] = Field(default_factory=list)
     canvas_blocks: List[CanvasBlockCreate] = Field(default_factory=list)
 
@@ -186,6 +195,7 @@ class InterviewResponse(InterviewBase):
     id: int
     project_id: int
     timestamp: datetime
+    version: int = Field(..., description="Incremented by every write")
     notes: List[NoteResponse] = Field(default_factory=list)
     canvas_blocks: List[CanvasBlockResponse] = Field(default_factory=list)
 
@@ -193,6 +203,116 @@ class InterviewResponse(InterviewBase):
         from_attributes = True
 
 
+class AutosaveChanges(BaseModel):
+    """Rows written by an autosave."""
+    inserted: int = 0
+    updated: int = Field(default=0, description="Rows whose content changed")
+    reordered: int = Field(default=0, description="Rows that only moved")
+    deleted: int = 0
+
+
+class InterviewAutosaveResponse(InterviewResponse):
+    """Response schema for interview autosave."""
+    changes: AutosaveChanges
+
+
+class InterviewConflict(BaseModel):
+    """What changed since the version of a stale write (409 response).
+
+    notes holds the notes that changed or have changed items, each with
+    only its changed items. Entities missing from the id lists were deleted.
+    """
+    message: str
+    version: int
+    interview_title: str
+    background_context: str
+    notes: List[NoteResponse] = Field(default_factory=list)
+    canvas_blocks: List[CanvasBlockResponse] = Field(default_factory=list)
+    note_ids: List[int] = Field(default_factory=list)
+    item_ids: List[int] = Field(default_factory=list)
+    canvas_block_ids: List[int] = Field(default_factory=list)
+
+
+# ==================== Operation Schemas ====================
+
+# Fields each operation may set, by entity. "update" edits content and
+# "move" edits position; "add" takes both and requires the listed fields.
+OP_CONTENT_FIELDS = {
+    "note": {"title"},
+    "item": {"type", "content", "provenance", "source_title", "source_domain"},
+    "block": {"type", "text"},
+}
+OP_POSITION_FIELDS = {
+    "note": {"order_index"},
+    "item": {"order_index", "note_client_id"},
+    "block": {"order_index"},
+}
+OP_REQUIRED_FIELDS = {
+    "note": {"title"},
+    "item": {"note_client_id", "type", "content"},
+    "block": {"type", "text"},
+}
+
+
+class InterviewOp(BaseModel):
+    """A granular edit of a note, note item or canvas block, by client_id."""
+    op: Literal["add", "update", "move", "delete"]
+    entity: Literal["note", "item", "block"]
+    client_id: str = Field(..., min_length=1, max_length=64)
+    title: Optional[str] = Field(None, min_length=1, max_length=500)
+    type: Optional[str] = None
+    content: Optional[str] = Field(None, min_length=1, max_length=50000)
+    text: Optional[str] = Field(None, min_length=1, max_length=50000)
+    provenance: Optional[ProvenanceType] = None
+    source_title: Optional[str] = Field(None, max_length=500)
+    source_domain: Optional[str] = Field(None, max_length=255)
+    order_index: Optional[int] = Field(None, ge=0)
+    note_client_id: Optional[str] = Field(None, min_length=1, max_length=64)
+
+    @model_validator(mode="after")
+    def validate_fields(self):
+        """Ensure the fields given fit the operation and entity."""
+        fields = self.fields()
+        allowed = {
+            "add": OP_CONTENT_FIELDS[self.entity] | OP_POSITION_FIELDS[self.entity],
+            "update": OP_CONTENT_FIELDS[self.entity],
+            "move": OP_POSITION_FIELDS[self.entity],
+            "delete": set(),
+        }[self.op]
+        if fields.keys() - allowed:
+            unexpected = ", ".join(sorted(fields.keys() - allowed))
+            raise ValueError(f"{self.op} {self.entity} does not take {unexpected}")
+        if self.op == "add" and OP_REQUIRED_FIELDS[self.entity] - fields.keys():
+            missing = ", ".join(sorted(OP_REQUIRED_FIELDS[self.entity] - fields.keys()))
+            raise ValueError(f"add {self.entity} requires {missing}")
+        if self.op in ("update", "move") and not fields:
+            raise ValueError(f"{self.op} {self.entity} changes nothing")
+        if self.type is not None:
+            (ItemType if self.entity == "item" else BlockType)(self.type)
+        return self
+
+    def fields(self) -> dict:
+        """The entity fields this operation sets."""
+        return self.model_dump(
+            mode="json", exclude={"op", "entity", "client_id"}, exclude_none=True
+        )
+
+
+class InterviewOpsBatch(BaseModel):
+    """A batch of operations, numbered by the client session sending it."""
+    session_id: str = Field(..., min_length=1, max_length=100, description="Identifies the sending client, e.g. a browser tab")
+    client_seq: int = Field(..., ge=0, description="Increases with every batch the session sends")
+    ops: List[InterviewOp] = Field(..., min_length=1, max_length=1000)
+
+
+class InterviewOpsResponse(BaseModel):
+    """Response schema for an operations batch."""
+    client_seq: int = Field(..., description="Last batch the server has accepted from the session")
+    status: Literal["buffered", "saved", "duplicate"]
+    pending: int = Field(..., description="Changes waiting to be written")
+    changes: Optional[AutosaveChanges] = Field(None, description="Rows written, when saved")
+
+
 # ==================== Search Schemas ====================
 
 class SearchRequest(BaseModel):
@@ -0,0 +1,365 @@
+"""In-memory inverted index over episode titles and descriptions."""
+import logging
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from backend.models.database import Episode
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+
+# Term frequencies are stored as unsigned 16-bit integers
+_MAX_TF = 0xFFFF
+# Length of the substrings terms are looked up by
+_GRAM = 3
+
+
+def _grams(term: str) -> Set[str]:
+    return {term[i : i + _GRAM] for i in range(len(term) - _GRAM + 1)}
+
+
+def _empty_counts() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    empty = np.zeros(0, dtype=np.int64)
+    return empty, empty, empty, np.zeros(0, dtype=np.float64)
+
+
+class _Postings:
+    """Postings list of a single term: parallel arrays of doc keys and counts."""
+
+    __slots__ = ("docs", "title_tf", "description_tf")
+
+    def __init__(self):
+        self.docs = array("i")
+        self.title_tf = array("H")
+        self.description_tf = array("H")
+
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.docs)
+            + sys.getsizeof(self.title_tf)
+            + sys.getsizeof(self.description_tf)
+        )
+
+
+class EpisodeIndex:
+    """Inverted index mapping lowercase word tokens to the episodes using them.
+
+    Episodes are stored under dense internal doc keys so postings stay sorted
+    as rows are appended. Removing or re-adding an episode only marks its old
+    doc key dead; dead keys are skipped at query time and dropped by
+    compact(), which runs once they make up a quarter of the index.
+
+    Search keeps the case-insensitive substring semantics of
+    podcast_service.search_episodes: a query made of a single word is matched
+    against every indexed term containing it, which gives exact match counts
+    straight from the term frequencies. Longer queries only get a candidate
+    set that the caller has to verify. Terms containing a word are found
+    through a trigram index of the vocabulary, and only their postings are
+    read.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, _Postings] = {}
+        # Terms by the trigrams they contain; shorter terms are kept apart
+        self._gram_terms: Dict[str, Set[str]] = {}
+        self._short_terms: Set[str] = set()
+        self._doc_episode_id = array("i")
+        self._doc_podcast_id = array("i")
+        self._doc_publish_ts = array("d")
+        self._doc_alive = bytearray()
+        self._episode_doc: Dict[int, int] = {}
+        self._dead = 0
+
+    def build(self, db: Session, batch_size: int = 5000) -> None:
+        """(Re)build the index from the episodes table."""
+        logger.info("Building episode index")
+        with self._lock:
+            self._reset()
+            query = (
+                db.query(
+                    Episode.id,
+                    Episode.podcast_id,
+                    Episode.title,
+                    Episode.description,
+                    Episode.publish_date,
+                )
+                .order_by(Episode.id)
+                .yield_per(batch_size)
+            )
+            for row in query:
+                self._add(*row)
+            self.loaded = True
+        logger.info(
+            f"Episode index built: {len(self._episode_doc)} episodes, "
+            f"{len(self._postings)} terms"
+        )
+
+    def add_episodes(self, rows: Iterable[Tuple]) -> None:
+        """Index episodes, replacing any previous version of the same ids.
+
+        Each row is (id, podcast_id, title, description, publish_date).
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            for row in rows:
+                self._add(*row)
+
+    def remove_episodes(self, episode_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            for episode_id in episode_ids:
+                self._remove(episode_id)
+            self._maybe_compact()
+
+    def remove_podcasts(self, podcast_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            podcast_ids = set(podcast_ids)
+            for doc, podcast_id in enumerate(self._doc_podcast_id):
+                if self._doc_alive[doc] and podcast_id in podcast_ids:
+                    self._remove(self._doc_episode_id[doc])
+            self._maybe_compact()
+
+    def _add(
+        self,
+        episode_id: int,
+        podcast_id: int,
+        title: Optional[str],
+        description: Optional[str],
+        publish_date: Optional[datetime],
+    ) -> None:
+        self._remove(episode_id)
+        doc = len(self._doc_episode_id)
+        self._doc_episode_id.append(episode_id)
+        self._doc_podcast_id.append(podcast_id)
+        self._doc_publish_ts.append(publish_date.timestamp() if publish_date else 0.0)
+        self._doc_alive.append(1)
+        self._episode_doc[episode_id] = doc
+
+        title_tf = Counter(_WORD_RE.findall((title or "").lower()))
+        description_tf = Counter(_WORD_RE.findall((description or "").lower()))
+        for term in title_tf.keys() | description_tf.keys():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+                self._index_term(term)
+            postings.docs.append(doc)
+            postings.title_tf.append(min(title_tf.get(term, 0), _MAX_TF))
+            postings.description_tf.append(min(description_tf.get(term, 0), _MAX_TF))
+
+    def _remove(self, episode_id: int) -> None:
+        doc = self._episode_doc.pop(episode_id, None)
+        if doc is not None:
+            self._doc_alive[doc] = 0
+            self._dead += 1
+
+    def _maybe_compact(self) -> None:
+        if self._dead > 1000 and self._dead * 4 > len(self._doc_alive):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop dead doc keys from all postings and renumber the live ones."""
+        with self._lock:
+            remap = array("i", [-1]) * len(self._doc_alive)
+            doc_episode_id = array("i")
+            doc_podcast_id = array("i")
+            doc_publish_ts = array("d")
+            for doc, alive in enumerate(self._doc_alive):
+                if alive:
+                    remap[doc] = len(doc_episode_id)
+                    doc_episode_id.append(self._doc_episode_id[doc])
+                    doc_podcast_id.append(self._doc_podcast_id[doc])
+                    doc_publish_ts.append(self._doc_publish_ts[doc])
+
+            postings_by_term = {}
+            for term, old in self._postings.items():
+                new = _Postings()
+                for doc, title_tf, description_tf in zip(
+                    old.docs, old.title_tf, old.description_tf
+                ):
+                    if remap[doc] >= 0:
+                        new.docs.append(remap[doc])
+                        new.title_tf.append(title_tf)
+                        new.description_tf.append(description_tf)
+                if new.docs:
+                    postings_by_term[term] = new
+
+            self._postings = postings_by_term
+            self._gram_terms = {}
+            self._short_terms = set()
+            for term in postings_by_term:
+                self._index_term(term)
+            self._doc_episode_id = doc_episode_id
+            self._doc_podcast_id = doc_podcast_id
+            self._doc_publish_ts = doc_publish_ts
+            self._doc_alive = bytearray(b"\x01") * len(doc_episode_id)
+            self._episode_doc = {
+                episode_id: doc for doc, episode_id in enumerate(doc_episode_id)
+            }
+            self._dead = 0
+
+    def _index_term(self, term: str) -> None:
+        if len(term) < _GRAM:
+            self._short_terms.add(term)
+        for gram in _grams(term):
+            self._gram_terms.setdefault(gram, set()).add(term)
+
+    def _terms_containing(self, word: str) -> List[str]:
+        if len(word) < _GRAM:
+            # Every longer term containing the word has a trigram containing it
+            terms = {term for term in self._short_terms if word in term}
+            for gram, gram_terms in self._gram_terms.items():
+                if word in gram:
+                    terms.update(gram_terms)
+            return list(terms)
+        gram_terms = sorted(
+            (self._gram_terms.get(gram, set()) for gram in _grams(word)), key=len
+        )
+        candidates = gram_terms[0].intersection(*gram_terms[1:])
+        return [term for term in candidates if word in term]
+
+    def match_counts(
+        self, query: str, podcast_ids: Iterable[int]
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Exact title/description match counts for a single-word query.
+
+        Returns columnar arrays of (episode ids, title matches, description
+        matches, publish timestamps) for the matching episodes of the given
+        podcasts, or None when the query is not a single word. Since a
+        word-only query can never match across token boundaries, its
+        occurrences in a text are the sum of its occurrences in each token.
+        """
+        needle = query.lower()
+        if not _WORD_RE.fullmatch(needle):
+            return None
+        with self._lock:
+            docs, title_counts, description_counts = [], [], []
+            for term in self._terms_containing(needle):
+                per_term = term.count(needle)
+                postings = self._postings[term]
+                docs.append(np.frombuffer(postings.docs, dtype=np.int32))
+                title_counts.append(
+                    np.frombuffer(postings.title_tf, dtype=np.uint16) * per_term
+                )
+                description_counts.append(
+                    np.frombuffer(postings.description_tf, dtype=np.uint16)
+                    * per_term
+                )
+            if not docs:
+                return _empty_counts()
+
+            # Sum the counts per doc over the matching postings only
+            docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+            title_counts = np.bincount(
+                inverse, weights=np.concatenate(title_counts), minlength=len(docs)
+            )
+            description_counts = np.bincount(
+                inverse, weights=np.concatenate(description_counts), minlength=len(docs)
+            )
+            keep = (
+                (title_counts > 0) | (description_counts > 0)
+            ) & (np.frombuffer(self._doc_alive, dtype=np.uint8)[docs] > 0) & np.isin(
+                np.frombuffer(self._doc_podcast_id, dtype=np.int32)[docs],
+                np.fromiter(podcast_ids, dtype=np.int32),
+            )
+            docs = docs[keep]
+            return (
+                np.frombuffer(self._doc_episode_id, dtype=np.int32)[docs].astype(
+                    np.int64
+                ),
+                title_counts[keep].astype(np.int64),
+                description_counts[keep].astype(np.int64),
+                np.frombuffer(self._doc_publish_ts, dtype=np.float64)[docs],
+            )
+
+    def candidate_ids(
+        self, query: str, podcast_ids: Iterable[int]
+    ) -> Optional[Set[int]]:
+        """Ids of episodes that may contain the query, or None if unknown.
+
+        Every word of the query has to appear inside some token of a matching
+        episode, so the candidates are the intersection, over the query words,
+        of the episodes using a term that contains that word.
+        """
+        words = set(_WORD_RE.findall(query.lower()))
+        if not words:
+            return None
+        podcast_ids = set(podcast_ids)
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            for word in sorted(words, key=len, reverse=True):
+                docs = set()
+                for term in self._terms_containing(word):
+                    docs.update(self._postings[term].docs)
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    return set()
+            return {
+                self._doc_episode_id[doc]
+                for doc in candidates
+                if self._doc_alive[doc] and self._doc_podcast_id[doc] in podcast_ids
+            }
+
+    def memory_report(self) -> Dict:
+        """Approximate memory held by the index, with a 1M-episode projection."""
+        with self._lock:
+            episodes = len(self._episode_doc)
+            postings_count = sum(len(p.docs) for p in self._postings.values())
+            terms_bytes = (
+                sys.getsizeof(self._postings)
+                + sum(sys.getsizeof(term) for term in self._postings)
+                + sys.getsizeof(self._gram_terms)
+                + sys.getsizeof(self._short_terms)
+                + sum(
+                    sys.getsizeof(gram) + sys.getsizeof(terms)
+                    for gram, terms in self._gram_terms.items()
+                )
+            )
+            postings_bytes = sum(p.nbytes() for p in self._postings.values())
+            docs_bytes = (
+                sys.getsizeof(self._doc_episode_id)
+                + sys.getsizeof(self._doc_podcast_id)
+                + sys.getsizeof(self._doc_publish_ts)
+                + sys.getsizeof(self._doc_alive)
+                + sys.getsizeof(self._episode_doc)
+            )
+            total_bytes = terms_bytes + postings_bytes + docs_bytes
+            return {
+                "loaded": self.loaded,
+                "episodes": episodes,
+                "dead_docs": self._dead,
+                "terms": len(self._postings),
+                "postings": postings_count,
+                "bytes": {
+                    "terms": terms_bytes,
+                    "postings": postings_bytes,
+                    "docs": docs_bytes,
+                    "total": total_bytes,
+                },
+                "bytes_per_episode": total_bytes / episodes if episodes else 0,
+                # Linear extrapolation; vocabulary growth is sublinear, so
+                # this slightly overestimates.
+                "projected_bytes_1m_episodes": (
+                    int(total_bytes / episodes * 1_000_000) if episodes else 0
+                ),
+            }
+
+
+# Global episode index instance
+episode_index = EpisodeIndex()
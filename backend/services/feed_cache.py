@@ -0,0 +1,93 @@
+"""Short-lived in-process cache of parsed feeds."""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from feedparser import FeedParserDict
+
+logger = logging.getLogger(__name__)
+
+# Seconds a parsed feed is reused, and the total feed size kept in memory
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "300"))
+FEED_CACHE_MAX_BYTES = int(os.getenv("FEED_CACHE_MAX_BYTES", str(64 * 2**20)))
+
+
+class FeedCache:
+    """LRU cache of parsed feeds keyed by URL, bounded by age and size.
+
+    Values are a feed download (as returned by feed_fetcher, without its
+    body) and the parsed feed. The size of an item is the size of the feed
+    body it was parsed from; the least recently used items are evicted once
+    the total exceeds max_bytes, and feeds larger than max_bytes are not
+    cached at all.
+    """
+
+    def __init__(
+        self,
+        ttl: float = FEED_CACHE_TTL,
+        max_bytes: int = FEED_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._items: "OrderedDict[str, Tuple[float, int, Dict, FeedParserDict]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, url: str, fetched: Dict, feed: FeedParserDict) -> None:
+        size = fetched["bytes"]
+        with self._lock:
+            self._discard(url)
+            if self.ttl <= 0 or size > self.max_bytes:
+                return
+            fetched = {**fetched, "content": None}
+            self._items[url] = (self._clock() + self.ttl, size, fetched, feed)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                evicted, _ = next(iter(self._items.items()))
+                logger.debug(f"Evicting cached feed: {evicted}")
+                self._discard(evicted)
+
+    def get(self, url: str) -> Optional[Tuple[Dict, FeedParserDict]]:
+        """The cached download and parsed feed of url, if still fresh."""
+        with self._lock:
+            item = self._items.get(url)
+            if item is None or item[0] <= self._clock():
+                self._discard(url)
+                self.misses += 1
+                return None
+            self._items.move_to_end(url)
+            self.hits += 1
+            return item[2], item[3]
+
+    def take(self, url: str) -> Optional[Tuple[Dict, FeedParserDict]]:
+        """Like get, but removes the feed from the cache."""
+        cached = self.get(url)
+        if cached is not None:
+            with self._lock:
+                self._discard(url)
+        return cached
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size_bytes = 0
+
+    def _discard(self, url: str) -> None:
+        item = self._items.pop(url, None)
+        if item is not None:
+            self.size_bytes -= item[1]
+
+
+# Global feed cache instance
+feed_cache = FeedCache()
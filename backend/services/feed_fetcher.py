@@ -0,0 +1,316 @@
+"""Feed downloads with HTTP conditional GET and content hashing."""
+import asyncio
+import hashlib
+import importlib.util
+import itertools
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+import feedparser
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a connection, and for each read of a feed download
+FEED_CONNECT_TIMEOUT = float(os.getenv("FEED_CONNECT_TIMEOUT", "10"))
+FEED_TIMEOUT = float(os.getenv("FEED_TIMEOUT", "30"))
+# Downloads of feeds larger than this many (decompressed) bytes are aborted
+FEED_MAX_BYTES = int(os.getenv("FEED_MAX_BYTES", str(200 * 2**20)))
+
+# HTTP/2 needs the optional h2 package
+_HTTP2 = importlib.util.find_spec("h2") is not None
+# Feeds larger than this many bytes are parsed while they download
+FEED_STREAM_THRESHOLD = int(os.getenv("FEED_STREAM_THRESHOLD", str(5 * 2**20)))
+
+# Fetch outcomes: the feed has to be parsed when it was "fetched", or
+# incrementally from "chunks" when it is "streaming". "cached" downloads were
+# parsed before and come from the feed cache.
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+UNCHANGED = "unchanged"
+STREAMING = "streaming"
+CACHED = "cached"
+
+
+class FeedTooLarge(ValueError):
+    pass
+
+
+class FeedClient:
+    """Pooled HTTP clients shared by all feed downloads.
+
+    Connections are kept alive between downloads from the same host, and
+    responses are decompressed from gzip/deflate, plus brotli and HTTP/2 when
+    the brotli and h2 packages are installed. The async client is bound to
+    the event loop it was created in, and is recreated for a new loop.
+    """
+
+    def __init__(
+        self,
+        timeout: float = FEED_TIMEOUT,
+        connect_timeout: float = FEED_CONNECT_TIMEOUT,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._transport = transport
+        self._async_transport = async_transport
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    transport=self._transport,
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                transport=self._async_transport,
+                timeout=self.timeout,
+                follow_redirects=True,
+                http2=_HTTP2,
+            )
+            self._loop = loop
+        return self._async_client
+
+    async def fetch(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        previous_hash: Optional[str] = None,
+        stream_threshold: Optional[int] = None,
+    ) -> Dict:
+        """Download a whole feed with the shared async client.
+
+        See fetch_feed_async; feeds are only reported as STREAMING when a
+        stream_threshold is given.
+        """
+        return await fetch_feed_async(
+            self.async_client, url, etag, last_modified, previous_hash, stream_threshold
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def request_headers(
+    etag: Optional[str] = None, last_modified: Optional[str] = None
+) -> Dict[str, str]:
+    """Request headers, with the cache validators of a previous fetch if known."""
+    headers = {"User-Agent": feedparser.USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def _result(
+    response: httpx.Response,
+    status: str,
+    content: Optional[bytes],
+    body_hash: Optional[str],
+    size: int,
+) -> Dict:
+    return {
+        "status": status,
+        "content": content,
+        "headers": dict(response.headers),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": body_hash,
+        "bytes": size,
+    }
+
+
+def _body_result(
+    response: httpx.Response, content: bytes, previous_hash: Optional[str]
+) -> Dict:
+    body_hash = content_hash(content)
+    status = UNCHANGED if body_hash == previous_hash else FETCHED
+    return _result(response, status, content, body_hash, len(content))
+
+
+def _check_size(response: httpx.Response, size: int) -> None:
+    """Raise FeedTooLarge once a download exceeds FEED_MAX_BYTES."""
+    if size > FEED_MAX_BYTES:
+        raise FeedTooLarge(
+            f"Feed is larger than {FEED_MAX_BYTES} bytes: {response.url}"
+        )
+
+
+def _check_response(response: httpx.Response) -> None:
+    response.raise_for_status()
+    # Compressed bodies only grow when decoded
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit():
+        _check_size(response, int(length))
+
+
+def fetch_feed(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    previous_hash: Optional[str] = None,
+    client: Optional[httpx.Client] = None,
+) -> Dict:
+    """Download a feed, revalidating it with the validators of the last fetch.
+
+    Returns a dict with the outcome ("status"), the body and response headers
+    to parse, the validators to store for the next fetch (etag,
+    last_modified, content_hash) and the number of body bytes downloaded.
+    A 304 response, or a body whose hash equals previous_hash, is reported as
+    not modified/unchanged so callers can skip parsing it. Raises
+    httpx.HTTPError for failed downloads and FeedTooLarge for feeds over
+    FEED_MAX_BYTES.
+    """
+    with open_feed(url, etag, last_modified, previous_hash, client, None) as fetched:
+        return fetched
+
+
+@contextmanager
+def open_feed(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    previous_hash: Optional[str] = None,
+    client: Optional[httpx.Client] = None,
+    stream_threshold: Optional[int] = FEED_STREAM_THRESHOLD,
+) -> Iterator[Dict]:
+    """Like fetch_feed, but without reading feeds over stream_threshold bytes.
+
+    Those are reported as STREAMING with a "chunks" iterator over the body,
+    which has to be consumed inside the with block. Their content_hash is
+    None, and "bytes" counts the chunks consumed so far. Downloads use the
+    shared feed client unless another client is given.
+    """
+    client = client or feed_client.client
+    headers = request_headers(etag, last_modified)
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            yield _result(response, NOT_MODIFIED, None, previous_hash, 0)
+            return
+        _check_response(response)
+        chunks = response.iter_bytes()
+        head = bytearray()
+        for chunk in chunks:
+            head += chunk
+            _check_size(response, len(head))
+            if stream_threshold is not None and len(head) > stream_threshold:
+                break
+        else:
+            yield _body_result(response, bytes(head), previous_hash)
+            return
+
+        fetched = _result(response, STREAMING, None, None, 0)
+        fetched["chunks"] = _counted(
+            response, fetched, itertools.chain([bytes(head)], chunks)
+        )
+        yield fetched
+
+
+def _counted(
+    response: httpx.Response, fetched: Dict, chunks: Iterator[bytes]
+) -> Iterator[bytes]:
+    for chunk in chunks:
+        fetched["bytes"] += len(chunk)
+        _check_size(response, fetched["bytes"])
+        yield chunk
+
+
+@asynccontextmanager
+async def open_feed_async(
+    client: httpx.AsyncClient,
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    previous_hash: Optional[str] = None,
+    stream_threshold: Optional[int] = FEED_STREAM_THRESHOLD,
+) -> AsyncIterator[Dict]:
+    """Async open_feed: feeds over stream_threshold bytes get async "chunks"."""
+    headers = request_headers(etag, last_modified)
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            yield _result(response, NOT_MODIFIED, None, previous_hash, 0)
+            return
+        _check_response(response)
+        chunks = response.aiter_bytes()
+        head = bytearray()
+        async for chunk in chunks:
+            head += chunk
+            _check_size(response, len(head))
+            if stream_threshold is not None and len(head) > stream_threshold:
+                break
+        else:
+            yield _body_result(response, bytes(head), previous_hash)
+            return
+
+        fetched = _result(response, STREAMING, None, None, 0)
+        fetched["chunks"] = _counted_async(response, fetched, bytes(head), chunks)
+        yield fetched
+
+
+async def _counted_async(
+    response: httpx.Response,
+    fetched: Dict,
+    head: bytes,
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[bytes]:
+    fetched["bytes"] += len(head)
+    yield head
+    async for chunk in chunks:
+        fetched["bytes"] += len(chunk)
+        _check_size(response, fetched["bytes"])
+        yield chunk
+
+
+async def fetch_feed_async(
+    client: httpx.AsyncClient,
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    previous_hash: Optional[str] = None,
+    stream_threshold: Optional[int] = FEED_STREAM_THRESHOLD,
+) -> Dict:
+    """Async fetch_feed, for feeds of at most stream_threshold bytes.
+
+    Larger feeds are abandoned and reported as STREAMING without content;
+    open_feed_async parses them while they download instead. Without a
+    stream_threshold, feeds are read whole up to FEED_MAX_BYTES.
+    """
+    async with open_feed_async(
+        client, url, etag, last_modified, previous_hash, stream_threshold
+    ) as fetched:
+        fetched.pop("chunks", None)
+        return fetched
+
+
+# Global feed client instance
+feed_client = FeedClient()
@@ -0,0 +1,234 @@
+"""Write-behind buffer for granular interview edits."""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from backend.models.database_session import SessionLocal
+from backend.models.interview_schemas import InterviewOp
+from backend.services import interview_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds edits wait to be coalesced with later ones before they are
+# written, and the number of changed entities written without waiting
+INTERVIEW_OPS_FLUSH_DELAY = float(os.getenv("INTERVIEW_OPS_FLUSH_DELAY", "2"))
+INTERVIEW_OPS_MAX_PENDING = int(os.getenv("INTERVIEW_OPS_MAX_PENDING", "500"))
+# Client sessions whose last client_seq is kept in memory; older ones are
+# checked against the client_seq stored with the interview
+INTERVIEW_OPS_MAX_SESSIONS = int(os.getenv("INTERVIEW_OPS_MAX_SESSIONS", "10000"))
+
+
+class InterviewOpsBuffer:
+    """Coalesces batches of interview operations and writes them late.
+
+    Each batch is merged as a whole into the pending changes of its
+    interview, keyed by entity and client_id: edits of an entity overwrite
+    the fields set by earlier ones and a delete replaces them, so a burst of
+    keystrokes in a block ends up as a single UPDATE. Pending changes are
+    written in one transaction flush_delay seconds after the first of them
+    arrived, as soon as max_pending entities have changed, or when flush()
+    is called, which routes do before reading an interview.
+
+    Each client session numbers its batches with an increasing client_seq,
+    and a batch whose client_seq was already accepted from its session is a
+    retry and is ignored. The last client_seq of the max_sessions most
+    recently active sessions is kept in memory, and of sessions with changes
+    still pending. Accepted changes are held in memory until written, and a
+    failed write is retried after flush_delay; close() writes them at
+    shutdown.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_delay: float = INTERVIEW_OPS_FLUSH_DELAY,
+        max_pending: int = INTERVIEW_OPS_MAX_PENDING,
+        max_sessions: int = INTERVIEW_OPS_MAX_SESSIONS,
+    ):
+        self.session_factory = session_factory
+        self.flush_delay = flush_delay
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self._pending: Dict[int, Dict] = {}
+        # Least recently active session first
+        self._accepted: "OrderedDict[Tuple[int, str], int]" = OrderedDict()
+        self._timers: Dict[int, threading.Timer] = {}
+        self._lock = threading.Lock()
+        # Held while writing, so that flushes of an interview land in order
+        self._write_lock = threading.Lock()
+
+    def pending(self, interview_id: int) -> int:
+        """Number of entities of an interview with unwritten changes."""
+        with self._lock:
+            return self._count(interview_id)
+
+    def submit(
+        self,
+        interview_id: int,
+        session_id: str,
+        stored_seq: Optional[int],
+        client_seq: int,
+        ops: List[InterviewOp],
+        flush: bool = False,
+    ) -> Dict:
+        """Accept a batch of operations from a client session.
+
+        stored_seq is the last batch of the session written to the database.
+        Returns the last client_seq accepted from the session, whether the
+        batch was buffered, saved or a duplicate, the number of pending
+        changes and, once saved, the rows written.
+        """
+        with self._lock:
+            accepted = self._accepted.get((interview_id, session_id), stored_seq)
+            if accepted is not None and client_seq <= accepted:
+                return {
+                    "client_seq": accepted,
+                    "status": "duplicate",
+                    "pending": self._count(interview_id),
+                }
+            entry = self._pending.setdefault(
+                interview_id,
+                {"seqs": {}, "changes": {"note": {}, "item": {}, "block": {}}},
+            )
+            for op in ops:
+                action = "update" if op.op == "move" else op.op
+                _merge(
+                    entry["changes"][op.entity],
+                    op.client_id,
+                    {"action": action, "fields": op.fields()},
+                )
+            entry["seqs"][session_id] = client_seq
+            self._accepted[(interview_id, session_id)] = client_seq
+            self._accepted.move_to_end((interview_id, session_id))
+            self._evict_sessions()
+            flush = flush or self._count(interview_id) >= self.max_pending
+            if not flush:
+                self._schedule(interview_id)
+        if flush:
+            changes = self.flush(interview_id)
+            return {
+                "client_seq": client_seq,
+                "status": "saved",
+                "pending": self.pending(interview_id),
+                "changes": changes,
+            }
+        return {
+            "client_seq": client_seq,
+            "status": "buffered",
+            "pending": self.pending(interview_id),
+        }
+
+    def flush(self, interview_id: int) -> Optional[Dict[str, int]]:
+        """Write the pending changes of an interview, if any.
+
+        Returns the rows written, or None if nothing was pending. If the
+        write fails, the changes are kept pending and the error is raised.
+        """
+        with self._write_lock:
+            with self._lock:
+                entry = self._pending.pop(interview_id, None)
+                timer = self._timers.pop(interview_id, None)
+            if timer is not None:
+                timer.cancel()
+            if entry is None:
+                return None
+            db = self.session_factory()
+            try:
+                changes = interview_service.apply_interview_changes(
+                    db, interview_id, entry["changes"], entry["seqs"]
+                )
+                db.commit()
+                return changes
+            except Exception:
+                db.rollback()
+                self._restore(interview_id, entry)
+                raise
+            finally:
+                db.close()
+
+    def try_flush(self, interview_id: int) -> None:
+        """Like flush, but a failed write is logged instead of raised.
+
+        The changes stay pending and are retried after flush_delay.
+        """
+        try:
+            self.flush(interview_id)
+        except Exception:
+            logger.error(
+                f"Error writing operations of interview {interview_id}", exc_info=True
+            )
+
+    def discard(self, interview_id: int) -> None:
+        """Drop the pending changes of an interview, e.g. one being deleted."""
+        with self._lock:
+            self._pending.pop(interview_id, None)
+            for key in [key for key in self._accepted if key[0] == interview_id]:
+                del self._accepted[key]
+            timer = self._timers.pop(interview_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def close(self) -> None:
+        """Write all pending changes."""
+        with self._lock:
+            interview_ids = list(self._pending)
+        for interview_id in interview_ids:
+            self.try_flush(interview_id)
+
+    def _schedule(self, interview_id: int) -> None:
+        """Start the flush timer of an interview, unless it runs; needs _lock."""
+        if interview_id in self._timers:
+            return
+        timer = threading.Timer(self.flush_delay, self.try_flush, (interview_id,))
+        timer.daemon = True
+        self._timers[interview_id] = timer
+        timer.start()
+
+    def _restore(self, interview_id: int, entry: Dict) -> None:
+        """Put back changes that failed to write, under any newer ones."""
+        with self._lock:
+            newer = self._pending.get(interview_id)
+            if newer is not None:
+                for entity, changes in newer["changes"].items():
+                    for client_id, change in changes.items():
+                        _merge(entry["changes"][entity], client_id, change)
+                entry["seqs"].update(newer["seqs"])
+            self._pending[interview_id] = entry
+            # Retried later, even if no further edits arrive
+            self._schedule(interview_id)
+
+    def _evict_sessions(self) -> None:
+        """Forget written sessions beyond max_sessions, oldest first; needs _lock."""
+        excess = len(self._accepted) - self.max_sessions
+        if excess <= 0:
+            return
+        written = []
+        for interview_id, session_id in self._accepted:
+            if len(written) == excess:
+                break
+            entry = self._pending.get(interview_id)
+            if entry is None or session_id not in entry["seqs"]:
+                written.append((interview_id, session_id))
+        for key in written:
+            del self._accepted[key]
+
+    def _count(self, interview_id: int) -> int:
+        entry = self._pending.get(interview_id)
+        if entry is None:
+            return 0
+        return sum(len(changes) for changes in entry["changes"].values())
+
+
+def _merge(changes: Dict[str, Dict], client_id: str, change: Dict) -> None:
+    """Merge a change of an entity into its pending change."""
+    current = changes.get(client_id)
+    if current is None or change["action"] != "update":
+        changes[client_id] = {"action": change["action"], "fields": dict(change["fields"])}
+    elif current["action"] != "delete":
+        current["fields"].update(change["fields"])
+
+
+# Global interview operations buffer instance
+interview_ops_buffer = InterviewOpsBuffer(SessionLocal)
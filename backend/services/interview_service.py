@@ -0,0 +1,525 @@
+"""Persistence of interview workspaces."""
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.models.database import insert_rows
+from backend.models.interview_models import (
+    BlockType,
+    CanvasBlock,
+    Interview,
+    InterviewOpsSession,
+    ItemType,
+    Note,
+    NoteItem,
+    ProvenanceType,
+)
+from backend.models.interview_schemas import InterviewCreate, InterviewFullUpdate
+
+logger = logging.getLogger(__name__)
+
+# Columns that place a row; changing only these is a reorder
+_POSITION_FIELDS = {"order_index", "note_id"}
+
+
+def create_interview(db: Session, data: InterviewCreate) -> int:
+    """Insert an interview with its notes, note items and canvas blocks.
+
+    Takes a fixed number of INSERTs whatever the number of entities: items
+    and blocks are inserted in bulk, and notes through insert_rows for the
+    ids their items need. Returns the interview id. Does not commit.
+    """
+    interview_id = db.execute(
+        insert(Interview)
+        .values(
+            project_id=data.project_id,
+            interview_title=data.interview_title,
+            background_context=data.background_context,
+        )
+        .returning(Interview.id)
+    ).scalar_one()
+    if data.notes:
+        note_ids = insert_rows(
+            db,
+            Note,
+            [
+                {
+                    "interview_id": interview_id,
+                    "client_id": note.client_id,
+                    "title": note.title,
+                    "order_index": note.order_index,
+                }
+                for note in data.notes
+            ],
+        )
+        items = [
+            {
+                "note_id": note_id,
+                "client_id": item.client_id,
+                "type": ItemType(item.type),
+                "content": item.content,
+                "provenance": ProvenanceType(item.provenance),
+                "source_title": item.source_title,
+                "source_domain": item.source_domain,
+                "order_index": item.order_index,
+            }
+            for note, note_id in zip(data.notes, note_ids)
+            for item in note.items
+        ]
+        if items:
+            db.execute(insert(NoteItem), items)
+    if data.canvas_blocks:
+        db.execute(
+            insert(CanvasBlock),
+            [
+                {
+                    "interview_id": interview_id,
+                    "client_id": block.client_id,
+                    "type": BlockType(block.type),
+                    "text": block.text,
+                    "order_index": block.order_index,
+                }
+                for block in data.canvas_blocks
+            ],
+        )
+    return interview_id
+
+
+class InterviewVersionConflict(Exception):
+    """Raised when a write is based on an outdated version of an interview."""
+
+    def __init__(self, interview_id: int, version: int):
+        super().__init__(f"Interview {interview_id} changed since version {version}")
+        self.interview_id = interview_id
+        self.version = version
+
+
+def bump_version(
+    db: Session, interview_id: int, expected: Optional[int] = None, **values
+) -> Optional[int]:
+    """Increment the version of an interview, along with any other values.
+
+    With expected given, the version is only incremented if it is still
+    expected, and InterviewVersionConflict is raised otherwise. Being the
+    first write of a transaction, this also locks out concurrent writers
+    until commit. Returns the new version, or None if there is no such
+    interview.
+    """
+    statement = update(Interview).where(Interview.id == interview_id)
+    if expected is not None:
+        statement = statement.where(Interview.version == expected)
+    version = db.execute(
+        statement.values(version=Interview.version + 1, **values)
+        .returning(Interview.version)
+    ).scalar()
+    if version is None and expected is not None:
+        if db.get(Interview, interview_id) is not None:
+            raise InterviewVersionConflict(interview_id, expected)
+    return version
+
+
+def autosave_interview(
+    db: Session, interview: Interview, data: InterviewFullUpdate
+) -> Dict[str, int]:
+    """Apply an autosave to an interview, writing only the rows that changed.
+
+    Incoming notes, note items and canvas blocks are matched to stored rows
+    by client_id. Items are matched across the whole interview, so an item
+    dragged to another note keeps its row. Unmatched incoming entities are
+    inserted and stored rows missing from the autosave are deleted, each
+    kind of change being one bulk statement per table.
+
+    If anything changed, the interview version is incremented, and written
+    rows are marked with it. With data.version given, the changes are only
+    written if it is still the interview version.
+
+    Returns the number of rows inserted, updated (content changed),
+    reordered (only position changed) and deleted. Raises ValueError if a
+    client_id is repeated and InterviewVersionConflict if data.version is
+    stale. Does not commit.
+    """
+    _check_client_ids(data)
+    changes = dict.fromkeys(("inserted", "updated", "reordered", "deleted"), 0)
+    if (interview.interview_title, interview.background_context) != (
+        data.interview_title,
+        data.background_context,
+    ):
+        changes["updated"] += 1
+
+    stored_notes = db.execute(
+        select(Note.id, Note.client_id, Note.title, Note.order_index).where(
+            Note.interview_id == interview.id
+        )
+    ).all()
+    notes = [
+        (
+            note.client_id,
+            {"title": note.title, "order_index": note.order_index},
+        )
+        for note in data.notes
+    ]
+    note_ids, new_notes, note_updates, deleted_note_ids = _diff(
+        stored_notes, notes, changes
+    )
+    # New notes get ids when inserted; until then items refer to them by a
+    # negative placeholder
+    note_ids = [note_id or -index for index, note_id in enumerate(note_ids, start=1)]
+
+    stored_items = db.execute(
+        select(
+            NoteItem.id,
+            NoteItem.client_id,
+            NoteItem.note_id,
+            NoteItem.type,
+            NoteItem.content,
+            NoteItem.provenance,
+            NoteItem.source_title,
+            NoteItem.source_domain,
+            NoteItem.order_index,
+        )
+        .join(Note, NoteItem.note_id == Note.id)
+        .where(Note.interview_id == interview.id)
+    ).all()
+    items = [
+        (
+            item.client_id,
+            {
+                "note_id": note_id,
+                "type": ItemType(item.type),
+                "content": item.content,
+                "provenance": ProvenanceType(item.provenance),
+                "source_title": item.source_title,
+                "source_domain": item.source_domain,
+                "order_index": item.order_index,
+            },
+        )
+        for note, note_id in zip(data.notes, note_ids)
+        for item in note.items
+    ]
+    _, new_items, item_updates, deleted_item_ids = _diff(stored_items, items, changes)
+
+    stored_blocks = db.execute(
+        select(
+            CanvasBlock.id,
+            CanvasBlock.client_id,
+            CanvasBlock.type,
+            CanvasBlock.text,
+            CanvasBlock.order_index,
+        ).where(CanvasBlock.interview_id == interview.id)
+    ).all()
+    blocks = [
+        (
+            block.client_id,
+            {
+                "type": BlockType(block.type),
+                "text": block.text,
+                "order_index": block.order_index,
+            },
+        )
+        for block in data.canvas_blocks
+    ]
+    _, new_blocks, block_updates, deleted_block_ids = _diff(
+        stored_blocks, blocks, changes
+    )
+
+    if not any(changes.values()):
+        return changes
+    version = bump_version(
+        db,
+        interview.id,
+        data.version,
+        interview_title=data.interview_title,
+        background_context=data.background_context,
+    )
+
+    # Items of deleted notes are either moved or deleted themselves
+    for model, ids in (
+        (NoteItem, deleted_item_ids),
+        (Note, deleted_note_ids),
+        (CanvasBlock, deleted_block_ids),
+    ):
+        if ids:
+            db.execute(delete(model).where(model.id.in_(ids)))
+    if new_notes:
+        inserted_ids = insert_rows(
+            db,
+            Note,
+            [
+                {**values, "interview_id": interview.id, "version": version}
+                for values in new_notes
+            ],
+        )
+        placeholders = (-index for index, note_id in enumerate(note_ids, start=1) if note_id < 0)
+        new_note_ids = dict(zip(placeholders, inserted_ids))
+        for row in new_items + item_updates:
+            if row.get("note_id", 0) < 0:
+                row["note_id"] = new_note_ids[row["note_id"]]
+    for model, rows in (
+        (Note, note_updates),
+        (NoteItem, item_updates),
+        (CanvasBlock, block_updates),
+    ):
+        if rows:
+            db.execute(update(model), [{**row, "version": version} for row in rows])
+    if new_items:
+        db.execute(insert(NoteItem), [{**row, "version": version} for row in new_items])
+    if new_blocks:
+        db.execute(
+            insert(CanvasBlock),
+            [
+                {**values, "interview_id": interview.id, "version": version}
+                for values in new_blocks
+            ],
+        )
+
+    logger.info(f"Autosaved interview {interview.id} as version {version}: {changes}")
+    return changes
+
+
+def changes_since(db: Session, interview_id: int, version: int) -> Dict:
+    """The entities of an interview written after a version, as an InterviewConflict."""
+    interview = db.get(Interview, interview_id)
+    changed_items = (
+        db.query(NoteItem)
+        .join(Note, NoteItem.note_id == Note.id)
+        .filter(Note.interview_id == interview_id, NoteItem.version > version)
+        .order_by(NoteItem.note_id, NoteItem.order_index)
+        .all()
+    )
+    items_by_note: Dict[int, List] = {}
+    for item in changed_items:
+        items_by_note.setdefault(item.note_id, []).append(item)
+    notes = (
+        db.query(Note)
+        .filter(
+            Note.interview_id == interview_id,
+            (Note.version > version) | Note.id.in_(list(items_by_note)),
+        )
+        .order_by(Note.order_index)
+        .all()
+    )
+    return {
+        "message": f"Interview changed since version {version}",
+        "version": interview.version,
+        "interview_title": interview.interview_title,
+        "background_context": interview.background_context,
+        "notes": [
+            {
+                "id": note.id,
+                "client_id": note.client_id,
+                "title": note.title,
+                "order_index": note.order_index,
+                "created_at": note.created_at,
+                "items": items_by_note.get(note.id, []),
+            }
+            for note in notes
+        ],
+        "canvas_blocks": db.query(CanvasBlock)
+        .filter(CanvasBlock.interview_id == interview_id, CanvasBlock.version > version)
+        .order_by(CanvasBlock.order_index)
+        .all(),
+        "note_ids": db.execute(
+            select(Note.id).where(Note.interview_id == interview_id)
+        ).scalars().all(),
+        "item_ids": db.execute(
+            select(NoteItem.id)
+            .join(Note, NoteItem.note_id == Note.id)
+            .where(Note.interview_id == interview_id)
+        ).scalars().all(),
+        "canvas_block_ids": db.execute(
+            select(CanvasBlock.id).where(CanvasBlock.interview_id == interview_id)
+        ).scalars().all(),
+    }
+
+
+def _diff(
+    stored: List,
+    incoming: List[Tuple[Optional[str], Dict]],
+    changes: Dict[str, int],
+) -> Tuple[List[Optional[int]], List[Dict], List[Dict], List[int]]:
+    """Match incoming (client_id, values) pairs to stored rows.
+
+    Returns the stored id of each incoming entity (None for new ones), the
+    rows to insert, the changed columns of matched rows keyed by id, and
+    the ids of unmatched stored rows. Counts the changes into changes.
+    """
+    by_client_id = {row.client_id: row for row in stored if row.client_id}
+    ids, inserts, updates = [], [], []
+    for client_id, values in incoming:
+        row = by_client_id.pop(client_id, None) if client_id else None
+        if row is None:
+            ids.append(None)
+            inserts.append({**values, "client_id": client_id})
+            changes["inserted"] += 1
+            continue
+        ids.append(row.id)
+        changed = {
+            field: value
+            for field, value in values.items()
+            if getattr(row, field) != value
+        }
+        if changed:
+            updates.append({"id": row.id, **changed})
+            moved_only = changed.keys() <= _POSITION_FIELDS
+            changes["reordered" if moved_only else "updated"] += 1
+    matched = {row_id for row_id in ids if row_id is not None}
+    deleted = [row.id for row in stored if row.id not in matched]
+    changes["deleted"] += len(deleted)
+    return ids, inserts, updates, deleted
+
+
+def _check_client_ids(data: InterviewFullUpdate) -> None:
+    for kind, client_ids in (
+        ("note", [note.client_id for note in data.notes]),
+        ("item", [item.client_id for note in data.notes for item in note.items]),
+        ("canvas block", [block.client_id for block in data.canvas_blocks]),
+    ):
+        seen = set()
+        for client_id in client_ids:
+            if client_id is not None and client_id in seen:
+                raise ValueError(f"Duplicate {kind} client_id: {client_id}")
+            seen.add(client_id)
+
+
+def apply_interview_changes(
+    db: Session,
+    interview_id: int,
+    changes: Dict[str, Dict],
+    client_seqs: Dict[str, int],
+) -> Dict[str, int]:
+    """Write coalesced operations to an interview in bulk statements.
+
+    changes maps "note", "item" and "block" to {client_id: change}, where a
+    change is {"action": "add" | "update" | "delete", "fields": {...}} as
+    built by the interview operations buffer. Adding an entity that already
+    exists updates it. Changes to entities that do not exist, or items in
+    notes that do not exist, are skipped. Deleting a note deletes the items
+    still in it. Increments the interview version, marking written rows with
+    it, and records client_seqs ({session_id: client_seq}) as the last
+    batches written from each client session.
+
+    Returns the number of rows inserted, updated, reordered and deleted.
+    Does not commit.
+    """
+    counts = dict.fromkeys(("inserted", "updated", "reordered", "deleted"), 0)
+    version = bump_version(db, interview_id)
+    if version is None:
+        logger.warning(f"Dropping operations of deleted interview {interview_id}")
+        return counts
+    statement = sqlite_insert(InterviewOpsSession)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["interview_id", "session_id"],
+            set_={"seq": statement.excluded.seq},
+        ),
+        [
+            {"interview_id": interview_id, "session_id": session_id, "seq": seq}
+            for session_id, seq in client_seqs.items()
+        ],
+    )
+    notes = dict(
+        db.execute(
+            select(Note.client_id, Note.id).where(
+                Note.interview_id == interview_id, Note.client_id.is_not(None)
+            )
+        ).all()
+    )
+    deleted_notes = _apply_changes(
+        db, Note, notes, changes.get("note", {}), counts, version, interview_id=interview_id
+    )
+
+    items = dict(
+        db.execute(
+            select(NoteItem.client_id, NoteItem.id)
+            .join(Note, NoteItem.note_id == Note.id)
+            .where(Note.interview_id == interview_id, NoteItem.client_id.is_not(None))
+        ).all()
+    )
+    item_changes = {}
+    for client_id, change in changes.get("item", {}).items():
+        fields = dict(change.get("fields", {}))
+        if "note_client_id" in fields:
+            fields["note_id"] = notes.get(fields.pop("note_client_id"))
+            if fields["note_id"] is None:
+                logger.warning(f"Skipping item {client_id}: its note does not exist")
+                continue
+        for field, enum in (("type", ItemType), ("provenance", ProvenanceType)):
+            if field in fields:
+                fields[field] = enum(fields[field])
+        item_changes[client_id] = {**change, "fields": fields}
+    deleted_items = _apply_changes(db, NoteItem, items, item_changes, counts, version)
+
+    blocks = dict(
+        db.execute(
+            select(CanvasBlock.client_id, CanvasBlock.id).where(
+                CanvasBlock.interview_id == interview_id,
+                CanvasBlock.client_id.is_not(None),
+            )
+        ).all()
+    )
+    block_changes = {
+        client_id: {
+            **change,
+            "fields": {
+                field: BlockType(value) if field == "type" else value
+                for field, value in change.get("fields", {}).items()
+            },
+        }
+        for client_id, change in changes.get("block", {}).items()
+    }
+    deleted_blocks = _apply_changes(
+        db, CanvasBlock, blocks, block_changes, counts, version, interview_id=interview_id
+    )
+
+    # Updates ran first, so items moved out of a deleted note survive it
+    for model, column, ids in (
+        (NoteItem, NoteItem.id, deleted_items),
+        (NoteItem, NoteItem.note_id, deleted_notes),
+        (Note, Note.id, deleted_notes),
+        (CanvasBlock, CanvasBlock.id, deleted_blocks),
+    ):
+        if ids:
+            counts["deleted"] += db.execute(delete(model).where(column.in_(ids))).rowcount
+    logger.info(f"Applied operations to interview {interview_id} as version {version}: {counts}")
+    return counts
+
+
+def _apply_changes(
+    db: Session,
+    model,
+    stored: Dict[str, int],
+    changes: Dict[str, Dict],
+    counts: Dict[str, int],
+    version: int,
+    **parent,
+) -> List[int]:
+    """Insert and update the rows of one table; return the ids to delete.
+
+    stored maps client_ids to row ids and gets the inserted rows added.
+    Written rows are marked with version.
+    """
+    inserts, updates, deletes = [], [], []
+    for client_id, change in changes.items():
+        row_id = stored.get(client_id)
+        if change["action"] == "delete":
+            if row_id is not None:
+                deletes.append(row_id)
+        elif row_id is not None:
+            updates.append({"id": row_id, **change["fields"], "version": version})
+            moved_only = change["fields"].keys() <= _POSITION_FIELDS
+            counts["reordered" if moved_only else "updated"] += 1
+        elif change["action"] == "add":
+            inserts.append(
+                {**parent, **change["fields"], "client_id": client_id, "version": version}
+            )
+        else:
+            logger.warning(f"Skipping {change['action']} of missing {model.__name__} {client_id}")
+    if inserts:
+        ids = insert_rows(db, model, inserts)
+        stored.update(zip((row["client_id"] for row in inserts), ids))
+        counts["inserted"] += len(inserts)
+    if updates:
+        db.execute(update(model), updates)
+    return deletes
+
@@ -0,0 +1,222 @@
+"""Bulk import of podcast subscriptions from OPML."""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import ParseError, fromstring
+from sqlalchemy.orm import Session
+from backend.models.database import Podcast
+from backend.models.database_session import SessionLocal
+from backend.services import podcast_service
+from backend.services.refresh_service import (
+    REFRESH_PER_HOST,
+    RefreshService,
+    refresh_service,
+)
+
+logger = logging.getLogger(__name__)
+
+# Feeds validated at once during an import
+OPML_IMPORT_CONCURRENCY = int(os.getenv("OPML_IMPORT_CONCURRENCY", "20"))
+# Number of finished imports whose progress is kept
+_MAX_FINISHED_JOBS = 20
+
+
+def parse_opml(content: bytes) -> List[Dict[str, Optional[str]]]:
+    """Feed outlines of an OPML document: their rss_url and title.
+
+    Outlines are read at any nesting depth, so folders of subscriptions are
+    flattened. Duplicate feed URLs are dropped. Raises ValueError if the
+    document is not OPML.
+    """
+    try:
+        root = fromstring(content)
+    except ParseError as e:
+        raise ValueError(f"Invalid OPML: {e}") from e
+    if root.tag != "opml":
+        raise ValueError("Invalid OPML: missing <opml> root element")
+    feeds = OrderedDict()
+    for outline in root.iter("outline"):
+        rss_url = (outline.get("xmlUrl") or "").strip()
+        if rss_url.startswith(("http://", "https://")) and rss_url not in feeds:
+            feeds[rss_url] = {
+                "rss_url": rss_url,
+                "title": outline.get("title") or outline.get("text"),
+            }
+    return list(feeds.values())
+
+
+class OpmlImportService:
+    """Runs OPML imports in the background and tracks their progress.
+
+    At most concurrency feeds are validated at once, and at most per_host
+    at a time from the same host. A feed waits for its host before taking
+    one of the global slots, so a host with many feeds does not hold up the
+    others. Valid feeds are then added in
+    a single transaction, skipping feeds that are already subscribed, and
+    optionally refreshed through the refresh service. Feeds parsed while
+    validating stay in the feed cache, so the refresh does not download
+    them again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        service: RefreshService = refresh_service,
+        concurrency: int = OPML_IMPORT_CONCURRENCY,
+        per_host: int = REFRESH_PER_HOST,
+    ):
+        self.session_factory = session_factory
+        self.service = service
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def create_job(self, feeds: List[Dict], ingest: bool = False) -> Dict:
+        """Register an import of the given feeds; run it with run_job."""
+        self._forget_finished_jobs()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "pending",
+            "ingest": ingest,
+            "total": len(feeds),
+            "validated": 0,
+            "valid": 0,
+            "invalid": 0,
+            "existing": 0,
+            "created": 0,
+            "inserted": 0,
+            "errors": [],
+            "elapsed_ms": 0.0,
+        }
+        self._jobs[job["job_id"]] = job
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        return self._jobs.get(job_id)
+
+    async def run_job(self, job_id: str, feeds: List[Dict]) -> Dict:
+        job = self._jobs[job_id]
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        db = self.session_factory()
+        try:
+            job["status"] = "validating"
+            existing = await loop.run_in_executor(
+                None, _subscribed_urls, db, [feed["rss_url"] for feed in feeds]
+            )
+            job["existing"] = len(existing)
+            job["validated"] = len(existing)
+            podcasts: List[Dict] = []
+            limit = asyncio.Semaphore(self.concurrency)
+            host_limits: Dict[str, asyncio.Semaphore] = {}
+            await asyncio.gather(
+                *(
+                    self._validate_one(job, feed, podcasts, limit, host_limits)
+                    for feed in feeds
+                    if feed["rss_url"] not in existing
+                )
+            )
+
+            job["status"] = "saving"
+            podcast_ids = await loop.run_in_executor(None, _add_podcasts, db, podcasts)
+            job["created"] = len(podcast_ids)
+
+            if job["ingest"] and podcast_ids:
+                job["status"] = "ingesting"
+                summary = await self.service.refresh_podcasts(db, podcast_ids)
+                job["inserted"] = summary["inserted"]
+                job["errors"].extend(
+                    {"podcast_id": result["podcast_id"], "error": result["error"]}
+                    for result in summary["results"]
+                    if result["status"] == "error"
+                )
+            job["status"] = "done"
+        except Exception as e:
+            logger.error(f"Error importing OPML (job {job_id})", exc_info=True)
+            job["status"] = "error"
+            job["error"] = str(e)
+        finally:
+            db.close()
+            job["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"OPML import {job_id}: {job['created']} of {job['total']} feeds added, "
+            f"{job['invalid']} invalid, {job['existing']} already subscribed"
+        )
+        return job
+
+    async def _validate_one(
+        self,
+        job: Dict,
+        feed: Dict,
+        podcasts: List[Dict],
+        limit: asyncio.Semaphore,
+        host_limits: Dict[str, asyncio.Semaphore],
+    ) -> None:
+        host = urlsplit(feed["rss_url"]).hostname or ""
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            async with host_limit, limit:
+                is_valid, title, homepage_url, image_url, description = (
+                    await podcast_service.validate_rss_feed(feed["rss_url"])
+                )
+        except Exception as e:
+            is_valid, title = False, str(e)
+        job["validated"] += 1
+        if not is_valid:
+            job["invalid"] += 1
+            job["errors"].append({"rss_url": feed["rss_url"], "error": title})
+            return
+        job["valid"] += 1
+        podcasts.append(
+            {
+                "title": title or feed["title"],
+                "description": description,
+                "rss_url": feed["rss_url"],
+                "homepage_url": podcast_service.http_url(homepage_url),
+                "image_url": podcast_service.http_url(image_url),
+            }
+        )
+
+    def _forget_finished_jobs(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] in ("done", "error")
+        ]
+        for job_id in finished[: max(0, len(finished) - _MAX_FINISHED_JOBS + 1)]:
+            del self._jobs[job_id]
+
+
+def _subscribed_urls(db: Session, rss_urls: List[str]) -> set:
+    subscribed = set()
+    for i in range(0, len(rss_urls), 500):
+        subscribed.update(
+            rss_url
+            for (rss_url,) in db.query(Podcast.rss_url).filter(
+                Podcast.rss_url.in_(rss_urls[i : i + 500])
+            )
+        )
+    return subscribed
+
+
+def _add_podcasts(db: Session, podcasts: List[Dict]) -> List[int]:
+    """Add podcasts in one transaction; returns their ids."""
+    try:
+        rows = [Podcast(**podcast) for podcast in podcasts]
+        db.add_all(rows)
+        db.flush()
+        podcast_ids = [row.id for row in rows]
+        db.commit()
+        return podcast_ids
+    except Exception:
+        db.rollback()
+        raise
+
+
+# Global OPML import service instance
+opml_import_service = OpmlImportService(SessionLocal)
@@ -1,15 +1,127 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
 import feedparser
+import httpx
+import numpy as np
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Tuple
-from ..models.database import Podcast, Episode
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from ..models.database import (
+    Podcast,
+    Episode,
+    EPISODE_FTS_TABLE,
+    has_episode_fts,
+    insert_rows,
+)
 from ..models.schemas import PodcastCreate, EpisodeCreate
-from sqlalchemy import or_, func
+from sqlalchemy import (
+    and_,
+    or_,
+    func,
+    text,
+    bindparam,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.types import DateTime
+from . import feed_fetcher, feed_stream
+from .feed_cache import feed_cache
+from .episode_index import episode_index
+from .semantic_search import semantic_index
 import re
 
 logger = logging.getLogger(__name__)
 
+# Engine answering non-empty search queries: "fts" (SQLite FTS5 index),
+# "index" (in-memory inverted index, built at startup) or "scan" (regex scan).
+# Each falls back to the next simpler one when it cannot answer a query.
+SEARCH_ENGINE = os.getenv("EPISODE_SEARCH_ENGINE", "fts")
+
+# Hybrid search fuses at least this many candidates from each ranking
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "200"))
+# Rank offset of reciprocal rank fusion; dampens the weight of the top ranks
+RRF_K = 60
+
+# Max number of bound parameters per IN (...) clause when loading rows by id
+_ID_CHUNK_SIZE = 5000
+# SQLite allows at most 500 SELECTs in a compound statement
+_MAX_COMPOUND_SELECT = 250
+# Timestamp ranking missing publish dates last; NaT would overflow on negation
+_NO_DATE_TS = np.iinfo(np.int64).min + 1
+
+# Streamed feeds are stored in batches of this many entries, and reading
+# stops after this many consecutive entries that are already stored
+FEED_BATCH_SIZE = int(os.getenv("FEED_BATCH_SIZE", "500"))
+FEED_STOP_AFTER_KNOWN = int(os.getenv("FEED_STOP_AFTER_KNOWN", "20"))
+
+# The trigram tokenizer needs at least three characters to match anything
+FTS_MIN_QUERY_LENGTH = 3
+
+_FTS_SEARCH_SQL = text(
+    f"""
+    SELECT id, score FROM (
+        SELECT
+            id,
+            publish_date,
+            MIN(title_matches, :cap) * :title_weight
+                + MIN(description_matches, :cap) * :description_weight AS score
+        FROM (
+            SELECT
+                e.id,
+                e.publish_date,
+                (length(coalesce(e.title, ''))
+                    - length(replace(lower(coalesce(e.title, '')), :needle, '')))
+                    / :needle_length AS title_matches,
+                (length(coalesce(e.description, ''))
+                    - length(replace(lower(coalesce(e.description, '')), :needle, '')))
+                    / :needle_length AS description_matches
+            FROM {EPISODE_FTS_TABLE}
+            JOIN episodes AS e ON e.id = {EPISODE_FTS_TABLE}.rowid
+            WHERE {EPISODE_FTS_TABLE} MATCH :match
+              AND e.podcast_id IN :podcast_ids
+        )
+    )
+    WHERE score > 0
+      AND (
+        :after_id IS NULL
+        OR score < :after_score
+        OR score = :after_score AND (
+            coalesce(publish_date, '') < coalesce(:after_date, '')
+            OR coalesce(publish_date, '') = coalesce(:after_date, '')
+                AND id > :after_id
+        )
+      )
+    ORDER BY score DESC, publish_date DESC, id ASC
+    LIMIT :limit OFFSET :skip
+    """
+).bindparams(
+    bindparam("podcast_ids", expanding=True),
+    bindparam("after_date", type_=DateTime()),
+)
+
 
 def create_podcast(db: Session, podcast: PodcastCreate) -> Podcast:
     logger.info(f"Creating podcast: {podcast.title} ({podcast.rss_url})")
@@ -80,12 +192,21 @@ def get_podcast_with_episode_count(db: Session) -> List[Dict]:
         raise
 
 
-def validate_rss_feed(
+def http_url(url: Optional[str]) -> Optional[str]:
+    """The URL if it is an http(s) URL, else None."""
+    return url if url and url.startswith(("http://", "https://")) else None
+
+
+async def validate_rss_feed(
     rss_url: str,
 ) -> Tuple[bool, str, Optional[str], Optional[str], Optional[str]]:
     logger.info(f"Validating RSS feed: {rss_url}")
     try:
-        feed = feedparser.parse(rss_url)
+        try:
+            feed = await fetch_parsed_feed(rss_url)
+        except (httpx.HTTPError, feed_fetcher.FeedTooLarge) as e:
+            logger.warning(f"Could not download RSS feed: {rss_url} ({e})")
+            return False, "Could not download RSS feed", None, None, None
         if feed.bozo:
             logger.warning(f"Invalid RSS feed format: {rss_url}")
             return False, "Invalid RSS feed format", None, None, None
@@ -118,37 +239,385 @@ def validate_rss_feed(
         raise
 
 
-def update_podcast_episodes(db: Session, podcast: Podcast) -> List[Episode]:
-    feed = feedparser.parse(podcast.rss_url)
-    new_episodes = []
+async def fetch_parsed_feed(rss_url: str) -> feedparser.FeedParserDict:
+    """Download and parse a feed, or reuse it if it was parsed moments ago.
+
+    The feed is downloaded with the shared feed client and parsed in a
+    worker thread. The parsed feed is kept in the feed cache so the first
+    refresh of a podcast added right after validating its feed does not
+    download it again (see take_cached_feed).
+    """
+    cached = feed_cache.get(rss_url)
+    if cached is not None:
+        return cached[1]
+    fetched = await feed_fetcher.feed_client.fetch(rss_url)
+    feed = await asyncio.get_running_loop().run_in_executor(
+        None,
+        partial(
+            feedparser.parse, fetched["content"], response_headers=fetched["headers"]
+        ),
+    )
+    feed_cache.put(rss_url, fetched, feed)
+    return feed
+
+
+def take_cached_feed(
+    rss_url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> Optional[Tuple[Dict, List]]:
+    """The cached download and entries of a feed that was never stored.
+
+    Only a podcast's first refresh, before any validators were stored, is
+    answered from the feed cache; later ones revalidate the feed instead.
+    """
+    if etag or last_modified or content_hash:
+        return None
+    cached = feed_cache.take(rss_url)
+    if cached is None:
+        return None
+    fetched, feed = cached
+    if feed.bozo and not feed.entries:
+        return None
+    return {**fetched, "status": feed_fetcher.CACHED, "bytes": 0}, feed.entries
+
+
+def update_podcast_episodes(db: Session, podcast: Podcast) -> Dict:
+    """Fetch the podcast's feed and store the episodes not seen before.
+
+    The feed is revalidated with the validators of the previous download, so
+    an unchanged feed is neither parsed nor stored, and large feeds are
+    parsed while they download. A feed validated moments before the first
+    refresh is taken from the feed cache. Returns the result of
+    store_feed_entries plus the time spent until the feed could be parsed
+    (fetch_ms).
+    """
+    start = time.perf_counter()
+    cached = take_cached_feed(
+        podcast.rss_url,
+        podcast.feed_etag,
+        podcast.feed_last_modified,
+        podcast.feed_content_hash,
+    )
+    if cached is not None:
+        result = store_feed_entries(db, podcast, *cached)
+        result["fetch_ms"] = (time.perf_counter() - start) * 1000
+        return result
+    with feed_fetcher.open_feed(
+        podcast.rss_url,
+        podcast.feed_etag,
+        podcast.feed_last_modified,
+        podcast.feed_content_hash,
+    ) as fetched:
+        fetch_ms = (time.perf_counter() - start) * 1000
+        result = store_feed_entries(db, podcast, fetched, parse_fetched_feed(fetched))
+    result["fetch_ms"] = fetch_ms
+    return result
+
+
+def parse_fetched_feed(fetched: Dict) -> Optional[List]:
+    """Entries of a downloaded feed, or None if it was not downloaded whole."""
+    if fetched["status"] != feed_fetcher.FETCHED:
+        return None
+    feed = feedparser.parse(fetched["content"], response_headers=fetched["headers"])
+    if feed.bozo and not feed.entries:
+        raise ValueError(f"Invalid RSS feed: {feed.get('bozo_exception')}")
+    return feed.entries
+
+
+def store_feed_entries(
+    db: Session, podcast: Podcast, fetched: Dict, entries: Optional[List]
+) -> Dict:
+    """Store the validators of a feed download and its new entries.
+
+    Streaming downloads are parsed and stored incrementally from their
+    chunks (see ingest_feed_stream); entries is None for them. Returns the
+    ingest counts, plus "cache" ("not_modified" or "unchanged" when the
+    download was answered from the validators, "cached" when it came from
+    the feed cache, "miss" otherwise) and the number of feed bytes
+    downloaded.
+    """
+    if fetched["status"] == feed_fetcher.STREAMING:
+        result = ingest_feed_stream(
+            db,
+            podcast,
+            feed_stream.iter_feed_entries(fetched["chunks"], fetched["headers"]),
+        )
+        cache = "miss"
+    elif entries is None:
+        podcast.last_updated = datetime.utcnow()
+        result = {"inserted": 0, "updated": 0, "skipped": 0, "elapsed_ms": 0.0}
+        cache = fetched["status"]
+    else:
+        result = ingest_feed_entries(db, podcast, entries)
+        cache = "cached" if fetched["status"] == feed_fetcher.CACHED else "miss"
+
+    _store_validators(podcast, fetched)
+    db.commit()
+    return {**result, "cache": cache, "bytes": fetched["bytes"]}
+
+
+def finish_feed_stream(ingest: "FeedIngest", fetched: Dict) -> Dict:
+    """Finish storing a streaming download that was fed to ingest in batches.
 
-    for entry in feed.entries:
-        # Check if episode already exists
-        existing = (
-            db.query(Episode)
-            .filter(Episode.url == entry.link, Episode.podcast_id == podcast.id)
-            .first()
+    Returns the same as store_feed_entries.
+    """
+    _store_validators(ingest.podcast, fetched)
+    result = ingest.finish()
+    return {**result, "cache": "miss", "bytes": fetched["bytes"]}
+
+
+def _store_validators(podcast: Podcast, fetched: Dict) -> None:
+    # Validators are stored once all entries are, so that a feed whose
+    # ingest failed part way is downloaded and stored again
+    if fetched["status"] == feed_fetcher.NOT_MODIFIED:
+        # A 304 may omit validators that did not change
+        podcast.feed_etag = fetched["etag"] or podcast.feed_etag
+        podcast.feed_last_modified = (
+            fetched["last_modified"] or podcast.feed_last_modified
         )
+    else:
+        podcast.feed_etag = fetched["etag"]
+        podcast.feed_last_modified = fetched["last_modified"]
+        podcast.feed_content_hash = fetched["content_hash"]
+
+
+def ingest_feed_entries(db: Session, podcast: Podcast, entries: List) -> Dict:
+    """Upsert the entries of a parsed feed.
+
+    Entries are identified by their guid (their link if they have none) and
+    compared by a hash of their fields: new entries are inserted, edited
+    ones updated, and unchanged ones left untouched. Only inserted and
+    updated episodes are passed on to the search indexes. Returns the
+    inserted/updated/skipped counts and the time spent (elapsed_ms).
+    """
+    return _upsert_entries(db, podcast, entries, _ID_CHUNK_SIZE, None)
+
+
+def ingest_feed_stream(
+    db: Session,
+    podcast: Podcast,
+    entries: Iterable,
+    batch_size: int = FEED_BATCH_SIZE,
+    stop_after_known: int = FEED_STOP_AFTER_KNOWN,
+) -> Dict:
+    """Upsert the entries of a streamed feed in fixed-size batches.
+
+    Like ingest_feed_entries, but only one batch of entries is held at a
+    time. Feeds list their newest items first, so reading stops once
+    stop_after_known consecutive entries are stored and unchanged. Only
+    entries from the podcast's high-water mark on count: entries stored by
+    an ingest that did not finish may have gaps below them.
+    """
+    return _upsert_entries(db, podcast, entries, batch_size, stop_after_known)
 
-        if not existing:
-            episode = Episode(
-                podcast_id=podcast.id,
-                title=entry.title,
-                description=entry.description,
-                url=entry.link,
-                image_url=entry.get("image", {}).get("href", podcast.image_url),
-                publish_date=(
-                    datetime(*entry.published_parsed[:6])
-                    if hasattr(entry, "published_parsed")
-                    else datetime.utcnow()
-                ),
+
+def _upsert_entries(
+    db: Session,
+    podcast: Podcast,
+    entries: Iterable,
+    batch_size: int,
+    stop_after_known: Optional[int],
+) -> Dict:
+    ingest = FeedIngest(db, podcast, stop_after_known)
+    entries = iter(entries)
+    while True:
+        batch = list(itertools.islice(entries, batch_size))
+        if not batch or not ingest.add(batch):
+            break
+    return ingest.finish()
+
+
+class FeedIngest:
+    """Upserts the entries of one feed, batch by batch.
+
+    Each batch is committed on its own, so the write lock is not held while
+    the next batch downloads. With stop_after_known, reading can stop once
+    that many consecutive entries from the podcast's high-water mark on are
+    stored and unchanged. The mark only moves in finish(), after the last
+    batch.
+    """
+
+    def __init__(
+        self, db: Session, podcast: Podcast, stop_after_known: Optional[int] = None
+    ):
+        self.db = db
+        self.podcast = podcast
+        self.stop_after_known = stop_after_known
+        self.counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        self.stopped_early = False
+        self._start = time.perf_counter()
+        self._high_water = podcast.feed_high_water
+        self._past_high_water = False
+        self._newest = None
+        self._known_run = 0
+
+    def add(self, entries: List) -> bool:
+        """Store a batch of entries; returns False once reading can stop."""
+        changed_ids = []
+        # Rows written by earlier batches are visible to the next lookups
+        for entry, (episode_id, outcome) in zip(
+            entries, _upsert_batch(self.db, self.podcast, entries)
+        ):
+            self.counts[outcome] += 1
+            if episode_id is not None:
+                changed_ids.append(episode_id)
+            guid = _entry_guid(entry)
+            self._newest = self._newest or guid
+            self._past_high_water = self._past_high_water or (
+                self._high_water is not None and guid == self._high_water
             )
-            db.add(episode)
-            new_episodes.append(episode)
+            if outcome == "skipped" and self._past_high_water:
+                self._known_run += 1
+            else:
+                self._known_run = 0
+            if self.stop_after_known and self._known_run >= self.stop_after_known:
+                self.stopped_early = True
+                break
+        self.db.commit()
+        _index_episode_ids(self.db, changed_ids)
+        return not self.stopped_early
 
-    podcast.last_updated = datetime.utcnow()
-    db.commit()
-    return new_episodes
+    def finish(self) -> Dict:
+        """Move the high-water mark; returns the counts and time spent."""
+        podcast = self.podcast
+        podcast.feed_high_water = self._newest or self._high_water
+        podcast.last_updated = datetime.utcnow()
+        self.db.commit()
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        counts = self.counts
+        logger.info(
+            f"Podcast {podcast.id}: inserted {counts['inserted']} episodes, "
+            f"updated {counts['updated']}, skipped {counts['skipped']}"
+            f"{' and stopped early' if self.stopped_early else ''} "
+            f"in {elapsed_ms:.0f} ms"
+        )
+        return {**counts, "stopped_early": self.stopped_early, "elapsed_ms": elapsed_ms}
+
+
+def _upsert_batch(
+    db: Session, podcast: Podcast, entries: List
+) -> List[Tuple[Optional[int], str]]:
+    """Insert or update a batch of entries with one lookup and two bulk writes.
+
+    Returns (episode id if inserted or updated, outcome) per entry, in order.
+    """
+    keyed = [(_entry_guid(entry), entry) for entry in entries]
+    guids = [guid for guid, _ in keyed if guid is not None]
+    links = [entry.get("link") for _, entry in keyed if entry.get("link")]
+    by_guid, by_url = {}, {}
+    for row in db.query(
+        Episode.id,
+        Episode.guid,
+        Episode.url,
+        Episode.content_hash,
+        Episode.publish_date,
+    ).filter(
+        Episode.podcast_id == podcast.id,
+        or_(
+            Episode.guid.in_(guids),
+            # Episodes stored before guids were recorded
+            and_(Episode.guid.is_(None), Episode.url.in_(links)),
+        ),
+    ):
+        if row.guid is not None:
+            by_guid[row.guid] = row
+        else:
+            by_url[row.url] = row
+
+    outcomes, inserts, updates = [], [], []
+    seen = set()
+    for guid, entry in keyed:
+        if guid is None or guid in seen:
+            outcomes.append("skipped")
+            continue
+        seen.add(guid)
+        row = _episode_row(podcast, entry)
+        row["guid"] = guid
+        row["content_hash"] = _entry_hash(entry)
+        existing = by_guid.get(guid) or by_url.get(entry.get("link"))
+        if existing is None:
+            inserts.append(row)
+            outcomes.append("inserted")
+        elif existing.content_hash == row["content_hash"]:
+            outcomes.append("skipped")
+        else:
+            if not entry.get("published_parsed"):
+                row["publish_date"] = existing.publish_date
+            del row["podcast_id"]
+            row["id"] = existing.id
+            updates.append(row)
+            outcomes.append("updated")
+
+    if updates:
+        db.execute(update(Episode), updates)
+    ids = {
+        "inserted": iter(insert_rows(db, Episode, inserts)),
+        "updated": iter(row["id"] for row in updates),
+    }
+    return [
+        (next(ids[outcome]) if outcome in ids else None, outcome)
+        for outcome in outcomes
+    ]
+
+
+def _entry_guid(entry) -> Optional[str]:
+    return entry.get("id") or entry.get("link")
+
+
+def _entry_hash(entry) -> str:
+    published = entry.get("published_parsed")
+    fields = (
+        entry.get("title"),
+        entry.get("description"),
+        entry.get("link"),
+        entry.get("image", {}).get("href"),
+        tuple(published[:6]) if published else None,
+    )
+    return hashlib.sha1(repr(fields).encode()).hexdigest()
+
+
+def _episode_row(podcast: Podcast, entry) -> Dict:
+    published = entry.get("published_parsed")
+    return {
+        "podcast_id": podcast.id,
+        "title": entry.get("title", ""),
+        "description": entry.get("description", ""),
+        "url": entry.get("link"),
+        "image_url": entry.get("image", {}).get("href", podcast.image_url),
+        "publish_date": datetime(*published[:6]) if published else datetime.utcnow(),
+    }
+
+
+def _index_episode_ids(db: Session, episode_ids: List[int]) -> None:
+    """Add committed episodes to the search indexes by id."""
+    for chunk_start in range(0, len(episode_ids), _ID_CHUNK_SIZE):
+        chunk = episode_ids[chunk_start : chunk_start + _ID_CHUNK_SIZE]
+        _index_episodes(
+            db.query(
+                Episode.id,
+                Episode.podcast_id,
+                Episode.title,
+                Episode.description,
+                Episode.publish_date,
+            )
+            .filter(Episode.id.in_(chunk))
+            .order_by(Episode.id)
+            .all()
+        )
+
+
+def _index_episodes(rows: List[Tuple]) -> None:
+    """Add committed episode rows to the search indexes kept outside SQLite."""
+    episode_index.add_episodes(rows)
+    # Embedding is slow; keep it off the thread writing the episodes
+    semantic_index.queue_episodes(rows)
+
+
+def _unindex_podcasts(podcast_ids: List[int]) -> None:
+    episode_index.remove_podcasts(podcast_ids)
+    semantic_index.remove_podcasts(podcast_ids)
 
 
 def delete_all_episodes(db: Session, podcast_ids: List[int]) -> None:
@@ -156,18 +625,136 @@ def delete_all_episodes(db: Session, podcast_ids: List[int]) -> None:
         synchronize_session=False
     )
     db.commit()
+    _unindex_podcasts(podcast_ids)
 
 
 def get_episodes_for_podcasts(
-    db: Session, podcast_ids: List[int], skip: int = 0, limit: int = 100
+    db: Session,
+    podcast_ids: List[int],
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> List[Episode]:
-    return (
-        db.query(Episode)
-        .filter(Episode.podcast_id.in_(podcast_ids))
-        .order_by(Episode.publish_date.desc())
+    """Episodes of the given podcasts, most recent first.
+
+    Filtering podcast_id IN (...) and sorting by date would sort every
+    episode of the podcasts. Instead each podcast's episodes are read in
+    date order from the (podcast_id, publish_date) index, one SELECT per
+    podcast, and SQLite merges the sorted SELECTs of a UNION ALL until the
+    page is full.
+
+    With a cursor from episode_cursor(), the page starts after that episode
+    and skip counts from there. Each SELECT then seeks to the cursor in the
+    index, so deep pages cost the same as the first one. Raises ValueError
+    for an invalid cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    podcast_ids = sorted(set(podcast_ids))
+    if not podcast_ids or limit <= 0:
+        return []
+    chunks = [
+        podcast_ids[i : i + _MAX_COMPOUND_SELECT]
+        for i in range(0, len(podcast_ids), _MAX_COMPOUND_SELECT)
+    ]
+    # Merged chunks all have to supply rows for the skipped part of the page
+    n_rows = skip + limit if len(chunks) > 1 else limit
+    pages = [
+        _latest_episodes(db, chunk, 0 if len(chunks) > 1 else skip, n_rows, after)
+        for chunk in chunks
+    ]
+    if len(pages) == 1:
+        return pages[0]
+    merged = heapq.merge(*pages, key=_episode_recency, reverse=True)
+    return list(itertools.islice(merged, skip, skip + limit))
+
+
+def _latest_episodes(
+    db: Session,
+    podcast_ids: List[int],
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Episode]:
+    if after is not None and after[0] is not None:
+        # Episodes without a date sort last but are outside the index range
+        # the cursor seeks into; read them once the dated episodes run out
+        episodes = _select_latest(db, podcast_ids, 0, skip + limit, after)
+        if len(episodes) < skip + limit:
+            episodes += _select_latest(
+                db, podcast_ids, 0, skip + limit - len(episodes), (None, None)
+            )
+        return episodes[skip:]
+    return _select_latest(db, podcast_ids, skip, limit, after)
+
+
+def _select_latest(
+    db: Session,
+    podcast_ids: List[int],
+    skip: int,
+    limit: int,
+    after: Optional[Tuple],
+) -> List[Episode]:
+    if after is None:
+        seek = []
+    elif after[0] is not None:
+        seek = [tuple_(Episode.publish_date, Episode.id) < tuple_(*after)]
+    else:
+        seek = [Episode.publish_date.is_(None)]
+        if after[1] is not None:
+            seek.append(Episode.id < after[1])
+    arms = [
+        select(Episode).where(Episode.podcast_id == podcast_id, *seek)
+        for podcast_id in podcast_ids
+    ]
+    statement = arms[0] if len(arms) == 1 else union_all(*arms)
+    columns = statement.selected_columns
+    statement = (
+        statement.order_by(columns.publish_date.desc(), columns.id.desc())
         .offset(skip)
         .limit(limit)
-        .all()
+    )
+    if len(arms) > 1:
+        statement = select(Episode).from_statement(statement)
+    return list(db.execute(statement).scalars())
+
+
+def episode_cursor(episode: Episode, score: Optional[float] = None) -> str:
+    """Opaque token for the page after episode.
+
+    Listing pages are keyed by (publish_date, id); search pages also by the
+    episode's score.
+    """
+    key = [
+        episode.publish_date.isoformat() if episode.publish_date else None,
+        episode.id,
+    ]
+    if score is not None:
+        key.insert(0, score)
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, with_score: bool = False) -> Tuple:
+    """The (score,) publish_date, id key of a cursor; raises ValueError."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        *score, publish_date, episode_id = key
+        if len(score) != int(with_score):
+            raise ValueError(f"Unexpected cursor key: {key}")
+        return (
+            *(float(value) for value in score),
+            datetime.fromisoformat(publish_date) if publish_date is not None else None,
+            int(episode_id),
+        )
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _episode_recency(episode: Episode) -> Tuple:
+    """Sort key of ORDER BY publish_date DESC, id DESC (NULL dates last)."""
+    return (
+        episode.publish_date is not None,
+        episode.publish_date or datetime.min,
+        episode.id,
     )
 
 
@@ -180,73 +767,598 @@ def search_episodes(
     cap_n_matches: int = 10,
     skip: int = 0,
     limit: int = 100,
+    include_matches: bool = True,
+    mode: str = "lexical",
+    semantic_weight: float = 0.5,
+    timings: Optional[Dict[str, float]] = None,
+    cursor: Optional[str] = None,
+) -> List[Dict]:
+    """Search episodes of the given podcasts by title and description.
+
+    Ranking depends on the mode:
+    - "lexical": weighted, capped match counts in title and description
+    - "semantic": embedding similarity to the query
+    - "hybrid": reciprocal rank fusion of the top lexical and semantic
+      candidates, semantic_weight giving the share of the semantic ranking.
+      Each result then carries its component "scores".
+
+    Results with a query carry their "score". Lexical results, and results
+    without a query, can be paged with a cursor from episode_cursor() of
+    the last result (with its score): the page then starts after that
+    result and skip counts from there. Raises ValueError for an invalid
+    cursor.
+
+    Highlight spans are only computed for the returned page, and skipped
+    entirely when include_matches is False. Per-stage durations in
+    milliseconds are recorded into timings when given.
+    """
+    return _run_steps(
+        db,
+        _search_steps(
+            query,
+            podcast_ids,
+            title_weight,
+            description_weight,
+            cap_n_matches,
+            skip,
+            limit,
+            include_matches,
+            mode,
+            semantic_weight,
+            timings,
+            cursor,
+        ),
+    )
+
+
+async def search_episodes_async(
+    db: AsyncSession,
+    query: str,
+    podcast_ids: List[int],
+    title_weight: int = 50,
+    description_weight: int = 50,
+    cap_n_matches: int = 10,
+    skip: int = 0,
+    limit: int = 100,
+    include_matches: bool = True,
+    mode: str = "lexical",
+    semantic_weight: float = 0.5,
+    timings: Optional[Dict[str, float]] = None,
+    cursor: Optional[str] = None,
 ) -> List[Dict]:
+    """search_episodes on an AsyncSession.
+
+    Rows are read through the async session, while match counting, ranking,
+    highlight spans and query encoding run in worker threads, so none of
+    them blocks the event loop.
+    """
+    return await _run_steps_async(
+        db,
+        _search_steps(
+            query,
+            podcast_ids,
+            title_weight,
+            description_weight,
+            cap_n_matches,
+            skip,
+            limit,
+            include_matches,
+            mode,
+            semantic_weight,
+            timings,
+            cursor,
+        ),
+    )
+
+
+class _Step(NamedTuple):
+    """A stage of a search: fn(*args), with the session first if uses_db."""
+
+    fn: Callable
+    args: Tuple
+    uses_db: bool = False
+
+
+def _run_steps(db: Session, steps: Generator[_Step, Any, Any]) -> Any:
+    """Run the steps of a search in the calling thread; returns its result."""
+    result = None
+    try:
+        while True:
+            step = steps.send(result)
+            result = step.fn(db, *step.args) if step.uses_db else step.fn(*step.args)
+    except StopIteration as e:
+        return e.value
+
+
+async def _run_steps_async(
+    db: AsyncSession, steps: Generator[_Step, Any, Any]
+) -> Any:
+    """Run the steps of a search off the event loop; returns its result.
+
+    Database steps go through the async session, the others to worker threads.
+    """
+    result = None
+    try:
+        while True:
+            step = steps.send(result)
+            if step.uses_db:
+                result = await db.run_sync(step.fn, *step.args)
+            else:
+                result = await asyncio.to_thread(step.fn, *step.args)
+    except StopIteration as e:
+        return e.value
+
+
+def _search_steps(
+    query: str,
+    podcast_ids: List[int],
+    title_weight: int,
+    description_weight: int,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    include_matches: bool,
+    mode: str,
+    semantic_weight: float,
+    timings: Optional[Dict[str, float]],
+    cursor: Optional[str],
+) -> Generator[_Step, Any, List[Dict]]:
+    """The stages of search_episodes, yielded as steps for a runner to call.
+
+    Each step's result is sent back in, so the sync and async searches share
+    the mode dispatch, fusion, timings and paging and differ only in where
+    database reads and CPU-bound stages run.
+    """
+    if timings is None:
+        timings = {}
     if not query:
-        episodes = (
-            db.query(Episode)
-            .filter(Episode.podcast_id.in_(podcast_ids))
-            .order_by(Episode.publish_date.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        with _timed(timings, "db"):
+            episodes = yield _Step(
+                get_episodes_for_podcasts, (podcast_ids, skip, limit, cursor), True
+            )
         return [{"episode": episode, "matches": None} for episode in episodes]
 
+    after = _search_after(cursor, mode)
+    components = None
+    if mode == "semantic":
+        with _timed(timings, "semantic"):
+            hits = yield _Step(
+                semantic_index.search, (query, podcast_ids, skip + limit)
+            )
+        hits = hits[skip : skip + limit]
+    else:
+        weights = (
+            *_normalize_weights(title_weight, description_weight),
+            cap_n_matches,
+        )
+        if mode == "hybrid":
+            n_candidates = max(HYBRID_CANDIDATES, skip + limit)
+            with _timed(timings, "lexical"):
+                lexical_hits = yield from _lexical_steps(
+                    query, podcast_ids, *weights, 0, n_candidates
+                )
+            with _timed(timings, "semantic"):
+                semantic_hits = yield _Step(
+                    semantic_index.search, (query, podcast_ids, n_candidates)
+                )
+            with _timed(timings, "fusion"):
+                hits, components = _reciprocal_rank_fusion(
+                    {"lexical": lexical_hits, "semantic": semantic_hits},
+                    {"lexical": 1 - semantic_weight, "semantic": semantic_weight},
+                )
+            hits = hits[skip : skip + limit]
+        else:
+            with _timed(timings, "lexical"):
+                hits = yield from _lexical_steps(
+                    query, podcast_ids, *weights, skip, limit, after
+                )
+
+    with _timed(timings, "page"):
+        episodes = yield _Step(
+            _load_episodes, ([episode_id for episode_id, _ in hits],), True
+        )
+        results = yield _Step(
+            _page_results, (episodes, hits, query if include_matches else None)
+        )
+    if components is not None:
+        for item in results:
+            item["scores"] = components[item["episode"].id]
+    return results
+
+
+def _lexical_steps(
+    query: str,
+    podcast_ids: List[int],
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> Generator[_Step, Any, List[Tuple[int, float]]]:
+    """The lexical search engines of search_episodes, as steps."""
+    ranking = (title_weight, description_weight, cap_n_matches, skip, limit)
+    episode_ids = None
+    if SEARCH_ENGINE == "index" and episode_index.loaded:
+        counts = yield _Step(episode_index.match_counts, (query, podcast_ids))
+        if counts is not None:
+            return (yield _Step(_rank_index_counts, (counts, *ranking, after)))
+        episode_ids = yield _Step(episode_index.candidate_ids, (query, podcast_ids))
+    elif SEARCH_ENGINE != "scan" and (yield _Step(_can_use_fts, (query,), True)):
+        # Scored in SQLite
+        return (
+            yield _Step(
+                _search_episodes_fts, (query, podcast_ids, *ranking, after), True
+            )
+        )
+    rows = yield _Step(_scan_rows, (podcast_ids, episode_ids), True)
+    return (yield _Step(_rank_rows, (rows, query, *ranking, after)))
+
+
+def _search_after(cursor: Optional[str], mode: str) -> Optional[Tuple]:
+    """The key a search page starts after; raises ValueError for a bad cursor."""
+    if not cursor:
+        return None
+    if mode != "lexical":
+        raise ValueError("Cursors are only supported for lexical search")
+    return decode_cursor(cursor, with_score=True)
+
+
+def _normalize_weights(
+    title_weight: float, description_weight: float
+) -> Tuple[float, float]:
+    """Scale title and description weights to sum to 100."""
     total = title_weight + description_weight
     if total <= 0:
-        title_weight = 50
-        description_weight = 50
-        total = 100
+        return 50, 50
+    return title_weight / total * 100, description_weight / total * 100
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = (time.perf_counter() - start) * 1000
+
+
+def _reciprocal_rank_fusion(
+    rankings: Dict[str, List[Tuple[int, float]]],
+    weights: Dict[str, float],
+) -> Tuple[List[Tuple[int, float]], Dict[int, Dict]]:
+    """Fuse ranked (episode id, score) lists with weighted reciprocal rank fusion.
+
+    An episode's fused score is the sum over rankings of
+    weight / (RRF_K + rank), rank starting at 1. Returns the fused ranking and,
+    per episode, its score and rank in every input ranking (None where it was
+    not retrieved) along with the fused score.
+    """
+    components: Dict[int, Dict] = {}
+    for name, hits in rankings.items():
+        for rank, (episode_id, score) in enumerate(hits, start=1):
+            entry = components.setdefault(
+                episode_id,
+                {
+                    **dict.fromkeys(rankings),
+                    **dict.fromkeys(f"{other}_rank" for other in rankings),
+                    "fused": 0.0,
+                },
+            )
+            entry[name] = score
+            entry[f"{name}_rank"] = rank
+            entry["fused"] += weights[name] / (RRF_K + rank)
+    fused = sorted(
+        ((episode_id, entry["fused"]) for episode_id, entry in components.items()),
+        key=lambda hit: (-hit[1], hit[0]),
+    )
+    return fused, components
+
+
+def _can_use_fts(db: Session, query: str) -> bool:
+    """Check whether the FTS5 index can answer the query exactly.
+
+    The trigram tokenizer cannot match strings shorter than three characters,
+    and SQLite's lower() only folds ASCII, so queries with non-ASCII cased
+    letters are left to the regex scan. Hebrew has no case and is fine.
+    """
+    if len(query) < FTS_MIN_QUERY_LENGTH:
+        return False
+    if any(not c.isascii() and c.lower() != c.upper() for c in query):
+        return False
+    return has_episode_fts(db.connection())
+
+
+def _match_spans(pattern: re.Pattern, episode: Episode) -> Dict[str, List]:
+    return {
+        "title": [m.span() for m in pattern.finditer(episode.title or "")],
+        "description": [
+            m.span() for m in pattern.finditer(episode.description or "")
+        ],
+    }
+
+
+def _search_episodes_fts(
+    db: Session,
+    query: str,
+    podcast_ids: List[int],
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    """Score, rank and paginate in SQLite using the episodes FTS5 index.
+
+    The index narrows the scan down to rows containing the query; match counts
+    are then taken with replace() so scores, the cap and the ordering are
+    identical to the regex path. Results follow the (score, publish_date, id)
+    key after, if given.
+    """
+    after_score, after_date, after_id = after or (None, None, None)
+    rows = db.execute(
+        _FTS_SEARCH_SQL,
+        {
+            "match": '"' + query.replace('"', '""') + '"',
+            "needle": query.lower(),
+            "needle_length": len(query),
+            "podcast_ids": podcast_ids,
+            "cap": cap_n_matches,
+            "title_weight": title_weight,
+            "description_weight": description_weight,
+            "skip": skip,
+            "limit": limit,
+            "after_score": after_score,
+            "after_date": after_date,
+            "after_id": after_id,
+        },
+    ).all()
+    return [(row.id, row.score) for row in rows]
+
+
+def _load_episodes(db: Session, episode_ids: Iterable[int]) -> Dict[int, Episode]:
+    episode_ids = list(episode_ids)
+    episodes = {}
+    for start in range(0, len(episode_ids), _ID_CHUNK_SIZE):
+        chunk = episode_ids[start : start + _ID_CHUNK_SIZE]
+        for episode in db.query(Episode).filter(Episode.id.in_(chunk)):
+            episodes[episode.id] = episode
+    return episodes
+
+
+def _search_episodes_index(
+    db: Session,
+    query: str,
+    podcast_ids: List[int],
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    """Rank episodes using the postings of the in-memory episode index.
+
+    Single-word queries are scored from the index alone and only the returned
+    page is read from the database. Other queries are verified with the regex
+    scan, restricted to the index's candidate episodes.
+    """
+    counts = episode_index.match_counts(query, podcast_ids)
+    if counts is None:
+        return _search_episodes_regex(
+            db,
+            query,
+            podcast_ids,
+            title_weight,
+            description_weight,
+            cap_n_matches,
+            skip,
+            limit,
+            episode_ids=episode_index.candidate_ids(query, podcast_ids),
+            after=after,
+        )
+
+    return _rank_index_counts(
+        counts,
+        title_weight,
+        description_weight,
+        cap_n_matches,
+        skip,
+        limit,
+        after,
+    )
+
+
+def _rank_index_counts(
+    counts: Tuple[np.ndarray, ...],
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    """_rank_episodes for the match counts of the episode index."""
+    episode_ids, title_matches, desc_matches, publish_ts = counts
+    if after is not None:
+        # The index keeps publish dates as timestamps, 0 when missing
+        score, publish_date, episode_id = after
+        after = (score, publish_date.timestamp() if publish_date else 0.0, episode_id)
+    return _rank_episodes(
+        episode_ids,
+        title_matches,
+        desc_matches,
+        publish_ts,
+        title_weight,
+        description_weight,
+        cap_n_matches,
+        skip,
+        limit,
+        after,
+    )
+
+
+def _search_episodes_regex(
+    db: Session,
+    query: str,
+    podcast_ids: List[int],
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    episode_ids: Optional[Iterable[int]] = None,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    return _rank_rows(
+        _scan_rows(db, podcast_ids, episode_ids),
+        query,
+        title_weight,
+        description_weight,
+        cap_n_matches,
+        skip,
+        limit,
+        after,
+    )
+
+
+def _scan_rows(
+    db: Session, podcast_ids: List[int], episode_ids: Optional[Iterable[int]] = None
+) -> List:
+    """(id, title, description, publish_date) rows for the regex scan."""
+    columns = (Episode.id, Episode.title, Episode.description, Episode.publish_date)
+    if episode_ids is not None:
+        # Only scan the given candidates
+        episode_ids = sorted(episode_ids)
+        rows = []
+        for start in range(0, len(episode_ids), _ID_CHUNK_SIZE):
+            chunk = episode_ids[start : start + _ID_CHUNK_SIZE]
+            rows.extend(
+                db.query(*columns)
+                .filter(Episode.id.in_(chunk))
+                .order_by(Episode.id)
+                .all()
+            )
     else:
-        title_weight = title_weight / total * 100
-        description_weight = description_weight / total * 100
-    # Get all episodes for the selected podcasts
-    episodes = db.query(Episode).filter(Episode.podcast_id.in_(podcast_ids)).all()
+        # Get all episodes for the selected podcasts
+        rows = (
+            db.query(*columns)
+            .filter(Episode.podcast_id.in_(podcast_ids))
+            .order_by(Episode.id)
+            .all()
+        )
+    return rows
+
 
+def _rank_rows(
+    rows: List,
+    query: str,
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    """Count the query's matches in scanned rows and rank them."""
     # Compile regex pattern once
     pattern = re.compile(re.escape(query), re.IGNORECASE)
 
-    # Calculate scores for each episode
-    scored_episodes = []
-    for episode in episodes:
-        # Count matches in title and description
-        title_matches = len(list(pattern.finditer(episode.title)))
-        desc_matches = len(list(pattern.finditer(episode.description)))
+    # Count matches in title and description
+    n_rows = len(rows)
+    title_matches = np.fromiter(
+        (len(pattern.findall(row.title or "")) for row in rows),
+        dtype=np.int64,
+        count=n_rows,
+    )
+    desc_matches = np.fromiter(
+        (len(pattern.findall(row.description or "")) for row in rows),
+        dtype=np.int64,
+        count=n_rows,
+    )
+    if after is not None:
+        score, publish_date, episode_id = after
+        after = (score, _datetime_ts(publish_date), episode_id)
+    return _rank_episodes(
+        np.fromiter((row.id for row in rows), dtype=np.int64, count=n_rows),
+        title_matches,
+        desc_matches,
+        np.maximum(
+            np.array([row.publish_date for row in rows], dtype="datetime64[us]").astype(
+                np.int64
+            ),
+            _NO_DATE_TS,
+        ),
+        title_weight,
+        description_weight,
+        cap_n_matches,
+        skip,
+        limit,
+        after,
+    )
 
-        # Cap the number of matches
-        title_matches = min(title_matches, cap_n_matches)
-        desc_matches = min(desc_matches, cap_n_matches)
 
-        score = title_matches * title_weight + desc_matches * description_weight
+def _datetime_ts(publish_date: Optional[datetime]) -> int:
+    """Microsecond timestamp as ranked by the regex scan."""
+    if publish_date is None:
+        return _NO_DATE_TS
+    return int(np.datetime64(publish_date, "us").astype(np.int64))
 
-        if score > 0:
-            scored_episodes.append(
-                {
-                    "episode": episode,
-                    "score": score,
-                    "matches": {
-                        "title": [m.span() for m in pattern.finditer(episode.title)],
-                        "description": [
-                            m.span() for m in pattern.finditer(episode.description)
-                        ],
-                    },
-                }
-            )
 
-    # Sort by score (descending) and then by publish date (descending)
-    sorted_episodes = sorted(
-        scored_episodes,
-        key=lambda x: (x["score"], x["episode"].publish_date),
-        reverse=True,
+def _rank_episodes(
+    episode_ids: np.ndarray,
+    title_matches: np.ndarray,
+    desc_matches: np.ndarray,
+    publish_ts: np.ndarray,
+    title_weight: float,
+    description_weight: float,
+    cap_n_matches: int,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple] = None,
+) -> List[Tuple[int, float]]:
+    """Score match counts and pick the (id, score) pairs of the requested page.
+
+    Episodes are ranked by score, then publish date (both descending), then
+    id. Only the best skip + limit scores are partitioned out and sorted,
+    together with anything tied with the last of them. With an after key of
+    (score, publish timestamp, id), the page starts after that episode.
+    """
+    scores = (
+        np.minimum(title_matches, cap_n_matches) * title_weight
+        + np.minimum(desc_matches, cap_n_matches) * description_weight
     )
+    hits = scores > 0
+    if after is not None:
+        after_score, after_ts, after_id = after
+        hits &= (scores < after_score) | (scores == after_score) & (
+            (publish_ts < after_ts) | (publish_ts == after_ts) & (episode_ids > after_id)
+        )
+    hits = np.flatnonzero(hits)
+    k = min(skip + limit, hits.size)
+    if skip >= k:
+        return []
+    if k < hits.size:
+        top = np.argpartition(-scores[hits], k - 1)[:k]
+        hits = hits[scores[hits] >= scores[hits[top]].min()]
+    order = np.lexsort((episode_ids[hits], -publish_ts[hits], -scores[hits]))
+    page = hits[order[skip:k]]
+    return list(zip(episode_ids[page].tolist(), scores[page].tolist()))
 
-    # Apply pagination
-    paginated_episodes = sorted_episodes[skip : skip + limit]
 
-    # Return results in the expected format
+def _page_results(
+    episodes: Dict[int, Episode], hits: List[Tuple[int, float]], query: Optional[str]
+) -> List[Dict]:
+    pattern = re.compile(re.escape(query), re.IGNORECASE) if query else None
     return [
-        {"episode": item["episode"], "matches": item["matches"]}
-        for item in paginated_episodes
+        {
+            "episode": episodes[episode_id],
+            "matches": _match_spans(pattern, episodes[episode_id]) if pattern else None,
+            "score": score,
+        }
+        for episode_id, score in hits
+        if episode_id in episodes
     ]
 
 
@@ -263,3 +1375,4 @@ def delete_podcast(db: Session, podcast_id: int) -> None:
     if podcast:
         db.delete(podcast)
         db.commit()
+        _unindex_podcasts([podcast_id])
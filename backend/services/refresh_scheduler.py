@@ -0,0 +1,245 @@
+"""Background refresh of podcast feeds at intervals adapted to their cadence."""
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from backend.models.database import Episode, Podcast
+from backend.models.database_session import SessionLocal
+from backend.services.refresh_service import RefreshService, refresh_service
+
+logger = logging.getLogger(__name__)
+
+# Off unless enabled, so tests and tools starting the app poll no feeds
+REFRESH_SCHEDULER_ENABLED = (
+    os.getenv("REFRESH_SCHEDULER_ENABLED", "false").lower() == "true"
+)
+# Seconds between scheduler ticks, and max podcasts refreshed per tick
+REFRESH_SCHEDULER_TICK = float(os.getenv("REFRESH_SCHEDULER_TICK", "60"))
+REFRESH_SCHEDULER_BATCH = int(os.getenv("REFRESH_SCHEDULER_BATCH", "20"))
+# Bounds of the per-podcast polling interval, in seconds
+REFRESH_MIN_INTERVAL = float(os.getenv("REFRESH_MIN_INTERVAL", str(15 * 60)))
+REFRESH_MAX_INTERVAL = float(os.getenv("REFRESH_MAX_INTERVAL", str(24 * 3600)))
+# Intervals are randomly stretched or shrunk by up to this fraction
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))
+
+# Feeds are polled this many times per typical gap between episodes
+POLLS_PER_EPISODE = 4
+# Number of most recent episodes the cadence is estimated from
+CADENCE_EPISODES = 10
+# Interval of feeds without enough episodes to estimate a cadence
+_DEFAULT_INTERVAL = 6 * 3600
+
+
+def polling_intervals(
+    db: Session, podcast_ids: Iterable[int], now: Optional[datetime] = None
+) -> Dict[int, float]:
+    """Polling interval in seconds for each podcast, from its publish cadence.
+
+    The cadence is the median gap between the podcast's latest episodes, or
+    the time since its last episode if that is longer, so dormant feeds are
+    polled less often.
+    """
+    now = now or datetime.utcnow()
+    podcast_ids = list(podcast_ids)
+    # Rank of each episode from the newest one, counted over the episodes
+    # that follow it in (podcast_id, publish_date) index order
+    ranked = (
+        select(
+            Episode.podcast_id,
+            Episode.publish_date,
+            func.count()
+            .over(
+                partition_by=Episode.podcast_id,
+                order_by=Episode.publish_date,
+                rows=(0, None),
+            )
+            .label("recency"),
+        )
+        .where(Episode.podcast_id.in_(podcast_ids), Episode.publish_date.isnot(None))
+        .subquery()
+    )
+    dates: Dict[int, List[datetime]] = {}
+    for podcast_id, publish_date in db.execute(
+        select(ranked.c.podcast_id, ranked.c.publish_date).where(
+            ranked.c.recency <= CADENCE_EPISODES + 1
+        )
+    ):
+        dates.setdefault(podcast_id, []).append(publish_date)
+
+    intervals = {}
+    for podcast_id in podcast_ids:
+        timestamps = np.sort([d.timestamp() for d in dates.get(podcast_id, [])])
+        if len(timestamps) < 2:
+            intervals[podcast_id] = _DEFAULT_INTERVAL
+            continue
+        gap = max(
+            float(np.median(np.diff(timestamps))),
+            now.timestamp() - timestamps[-1],
+        )
+        intervals[podcast_id] = float(
+            np.clip(
+                gap / POLLS_PER_EPISODE, REFRESH_MIN_INTERVAL, REFRESH_MAX_INTERVAL
+            )
+        )
+    return intervals
+
+
+class RefreshScheduler:
+    """Refreshes each podcast when its polling interval has passed.
+
+    Every tick the scheduler picks up added and deleted podcasts, then
+    refreshes at most batch_size of the most overdue ones through the refresh
+    service, which bounds the concurrent downloads. Next due times are
+    jittered so podcasts added together drift apart instead of being polled
+    in lockstep.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        service: RefreshService = refresh_service,
+        tick_seconds: float = REFRESH_SCHEDULER_TICK,
+        batch_size: int = REFRESH_SCHEDULER_BATCH,
+        jitter: float = REFRESH_JITTER,
+    ):
+        self.session_factory = session_factory
+        self.service = service
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self._state: Dict[int, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_tick: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            logger.info("Starting feed refresh scheduler")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.error("Error in feed refresh scheduler", exc_info=True)
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self, now: Optional[datetime] = None) -> List[int]:
+        """Refresh the podcasts that are due. Returns their ids."""
+        now = now or datetime.utcnow()
+        self.last_tick = now
+        db = self.session_factory()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._sync_podcasts, db, now
+            )
+            due = sorted(
+                (state["next_due"], podcast_id)
+                for podcast_id, state in self._state.items()
+                if state["next_due"] <= now
+            )
+            podcast_ids = [podcast_id for _, podcast_id in due[: self.batch_size]]
+            if not podcast_ids:
+                return []
+
+            summary = await self.service.refresh_podcasts(db, podcast_ids)
+            intervals = await asyncio.get_running_loop().run_in_executor(
+                None, polling_intervals, db, podcast_ids
+            )
+        finally:
+            db.close()
+
+        finished = datetime.utcnow()
+        for result in summary["results"]:
+            state = self._state.get(result["podcast_id"])
+            if state is None:
+                continue
+            state["interval"] = intervals[result["podcast_id"]]
+            state["next_due"] = finished + self._jittered(state["interval"])
+            state["last_refreshed"] = finished
+            state["last_status"] = result["status"]
+            state["last_inserted"] = result.get("inserted", 0)
+        logger.info(
+            f"Scheduled refresh of {len(podcast_ids)} podcasts, "
+            f"{summary['inserted']} new episodes"
+        )
+        return podcast_ids
+
+    def _sync_podcasts(self, db: Session, now: datetime) -> None:
+        """Schedule added podcasts and forget deleted ones."""
+        podcasts = dict(db.query(Podcast.id, Podcast.last_updated))
+        for podcast_id in self._state.keys() - podcasts.keys():
+            del self._state[podcast_id]
+        added = podcasts.keys() - self._state.keys()
+        if not added:
+            return
+        for podcast_id, interval in polling_intervals(db, added, now).items():
+            last_updated = podcasts[podcast_id] or now
+            next_due = last_updated + self._jittered(interval)
+            if next_due <= now:
+                # Spread overdue podcasts, e.g. after a restart, over a few
+                # ticks instead of refreshing them all at once
+                next_due = now + timedelta(
+                    seconds=random.uniform(0, self.tick_seconds * 5)
+                )
+            self._state[podcast_id] = {
+                "interval": interval,
+                "next_due": next_due,
+                "last_refreshed": podcasts[podcast_id],
+                "last_status": None,
+                "last_inserted": 0,
+            }
+
+    def _jittered(self, interval: float) -> timedelta:
+        factor = 1 + random.uniform(-self.jitter, self.jitter)
+        return timedelta(seconds=interval * factor)
+
+    def status(self, now: Optional[datetime] = None) -> Dict:
+        """Scheduler state, with each podcast's schedule and lag in seconds."""
+        now = now or datetime.utcnow()
+        podcasts = [
+            {
+                "podcast_id": podcast_id,
+                "interval_seconds": state["interval"],
+                "next_due": state["next_due"],
+                "last_refreshed": state["last_refreshed"],
+                "last_status": state["last_status"],
+                "last_inserted": state["last_inserted"],
+                "lag_seconds": max(0.0, (now - state["next_due"]).total_seconds()),
+            }
+            for podcast_id, state in sorted(self._state.items())
+        ]
+        return {
+            "enabled": REFRESH_SCHEDULER_ENABLED,
+            "running": self.running,
+            "tick_seconds": self.tick_seconds,
+            "batch_size": self.batch_size,
+            "last_tick": self.last_tick,
+            "due": sum(podcast["lag_seconds"] > 0 for podcast in podcasts),
+            "max_lag_seconds": max(
+                (podcast["lag_seconds"] for podcast in podcasts), default=0.0
+            ),
+            "podcasts": podcasts,
+        }
+
+
+# Global refresh scheduler instance
+refresh_scheduler = RefreshScheduler(SessionLocal)
@@ -0,0 +1,225 @@
+"""Concurrent refresh of many podcast feeds."""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy.orm import Session
+from backend.models.database import Podcast
+from backend.services import feed_fetcher, feed_stream, podcast_service
+
+logger = logging.getLogger(__name__)
+
+# Max feeds downloaded at once, and at once from the same host
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "20"))
+REFRESH_PER_HOST = int(os.getenv("REFRESH_PER_HOST", "2"))
+REFRESH_PARSE_WORKERS = int(os.getenv("REFRESH_PARSE_WORKERS", "4"))
+
+
+class RefreshService:
+    """Refreshes podcasts by downloading feeds concurrently.
+
+    Downloads are bounded by a global and a per-host limit and revalidate
+    the feed's cache validators, parsing runs in a thread pool, and all
+    database work goes through a single writer thread so SQLite sees one
+    writer at a time. Feeds too large to buffer are parsed while they
+    download, and the writer thread stores them batch by batch. A feed
+    validated just before its podcast's first refresh is taken from the
+    feed cache instead of being downloaded.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = REFRESH_CONCURRENCY,
+        per_host: int = REFRESH_PER_HOST,
+        parse_workers: int = REFRESH_PARSE_WORKERS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        # Downloads share the pooled feed client, unless a transport is given
+        self._client = (
+            feed_fetcher.FeedClient(async_transport=transport)
+            if transport is not None
+            else feed_fetcher.feed_client
+        )
+        self._parse_pool = ThreadPoolExecutor(
+            max_workers=parse_workers, thread_name_prefix="feed-parse"
+        )
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="feed-write"
+        )
+
+    async def refresh_podcasts(
+        self, db: Session, podcast_ids: Union[List[int], str] = "all"
+    ) -> Dict:
+        """Refresh the given podcasts (or "all") and summarize the results.
+
+        Besides a result per podcast, the summary counts the feeds answered
+        from cache validators (cache_hits) and the feed bytes downloaded.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        targets = await loop.run_in_executor(
+            self._writer, _refresh_targets, db, podcast_ids
+        )
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        client = self._client.async_client
+        results = await asyncio.gather(
+            *(
+                self._refresh_one(db, client, target, limit, host_limits)
+                for target in targets
+            )
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        failed = sum(result["status"] == "error" for result in results)
+        logger.info(
+            f"Refreshed {len(results)} podcasts in {elapsed_ms:.0f} ms, {failed} failed"
+        )
+        return {
+            "results": results,
+            "inserted": sum(result.get("inserted", 0) for result in results),
+            "failed": failed,
+            "cache_hits": sum(
+                result.get("cache", "miss") != "miss" for result in results
+            ),
+            "bytes": sum(result.get("bytes", 0) for result in results),
+            "elapsed_ms": elapsed_ms,
+        }
+
+    async def _refresh_one(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        target: Tuple,
+        limit: asyncio.Semaphore,
+        host_limits: Dict[str, asyncio.Semaphore],
+    ) -> Dict:
+        loop = asyncio.get_running_loop()
+        podcast_id, rss_url, etag, last_modified, content_hash = target
+        host = urlsplit(rss_url).hostname or ""
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            start = time.perf_counter()
+            result = None
+            cached = podcast_service.take_cached_feed(
+                rss_url, etag, last_modified, content_hash
+            )
+            if cached is not None:
+                fetched, entries = cached
+                fetch_ms = (time.perf_counter() - start) * 1000
+            else:
+                # Host first, so feeds queued behind a busy host hold no
+                # global slot that feeds from other hosts could use
+                async with host_limit, limit:
+                    async with feed_fetcher.open_feed_async(
+                        client, rss_url, etag, last_modified, content_hash
+                    ) as fetched:
+                        fetch_ms = (time.perf_counter() - start) * 1000
+                        if fetched["status"] == feed_fetcher.STREAMING:
+                            # Too large to buffer: stored as it downloads
+                            result = await self._store_stream(db, podcast_id, fetched)
+
+            if result is None:
+                if cached is None:
+                    entries = await loop.run_in_executor(
+                        self._parse_pool, podcast_service.parse_fetched_feed, fetched
+                    )
+                result = await loop.run_in_executor(
+                    self._writer, _store_entries, db, podcast_id, fetched, entries
+                )
+            return {
+                "podcast_id": podcast_id,
+                "status": "ok",
+                "fetch_ms": fetch_ms,
+                **result,
+            }
+        except Exception as e:
+            logger.warning(f"Error refreshing podcast {podcast_id} ({rss_url}): {e}")
+            return {"podcast_id": podcast_id, "status": "error", "error": str(e)}
+
+    async def _store_stream(self, db: Session, podcast_id: int, fetched: Dict) -> Dict:
+        """Parse a streaming download as it arrives and store it in batches.
+
+        The writer thread only ever gets parsed batches, so it never waits
+        on the download.
+        """
+        loop = asyncio.get_running_loop()
+        parser = feed_stream.FeedStreamParser(fetched["headers"])
+        ingest = await loop.run_in_executor(self._writer, _start_stream, db, podcast_id)
+        entries = []
+        async for chunk in fetched["chunks"]:
+            entries += await loop.run_in_executor(self._parse_pool, parser.feed, chunk)
+            if len(entries) >= podcast_service.FEED_BATCH_SIZE:
+                if not await loop.run_in_executor(
+                    self._writer, _store_batch, db, ingest, entries
+                ):
+                    break
+                entries = []
+        else:
+            entries += await loop.run_in_executor(self._parse_pool, parser.close)
+            if entries:
+                await loop.run_in_executor(
+                    self._writer, _store_batch, db, ingest, entries
+                )
+        return await loop.run_in_executor(
+            self._writer, _finish_stream, db, ingest, fetched
+        )
+
+
+def _refresh_targets(db: Session, podcast_ids: Union[List[int], str]) -> List[Tuple]:
+    query = db.query(
+        Podcast.id,
+        Podcast.rss_url,
+        Podcast.feed_etag,
+        Podcast.feed_last_modified,
+        Podcast.feed_content_hash,
+    )
+    if podcast_ids != "all":
+        query = query.filter(Podcast.id.in_(podcast_ids))
+    return [tuple(row) for row in query]
+
+
+def _store_entries(
+    db: Session, podcast_id: int, fetched: Dict, entries: Optional[List]
+) -> Dict:
+    try:
+        podcast = db.get(Podcast, podcast_id)
+        return podcast_service.store_feed_entries(db, podcast, fetched, entries)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _start_stream(db: Session, podcast_id: int) -> podcast_service.FeedIngest:
+    return podcast_service.FeedIngest(
+        db, db.get(Podcast, podcast_id), podcast_service.FEED_STOP_AFTER_KNOWN
+    )
+
+
+def _store_batch(
+    db: Session, ingest: podcast_service.FeedIngest, entries: List
+) -> bool:
+    try:
+        return ingest.add(entries)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _finish_stream(
+    db: Session, ingest: podcast_service.FeedIngest, fetched: Dict
+) -> Dict:
+    try:
+        return podcast_service.finish_feed_stream(ingest, fetched)
+    except Exception:
+        db.rollback()
+        raise
+
+
+# Global refresh service instance
+refresh_service = RefreshService()
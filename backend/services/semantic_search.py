@@ -0,0 +1,311 @@
+"""Semantic episode search over sentence embeddings stored in a FAISS index."""
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.models.database import Episode
+from backend.services.vector_store import VectorStore, VectorStoreUnavailable
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_SEARCH_ENABLED = os.getenv("SEMANTIC_SEARCH_ENABLED", "false").lower() == "true"
+
+# Hub model name or a local directory (for offline use). The default is
+# multilingual and handles Hebrew.
+EMBEDDING_MODEL = os.getenv(
+    "EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+SEMANTIC_INDEX_PATH = os.getenv("SEMANTIC_INDEX_PATH", "data/episodes.faiss")
+# Map the index read-only, for query workers sharing an index owned by
+# another process
+SEMANTIC_INDEX_MMAP = os.getenv("SEMANTIC_INDEX_MMAP", "false").lower() == "true"
+# FAISS index factory string (Flat, IVF4096,PQ48, HNSW32, ...) and query-time
+# parameters (nprobe=32, efSearch=64); see benchmarks/bench_vectors.py
+SEMANTIC_INDEX_FACTORY = os.getenv("SEMANTIC_INDEX_FACTORY", "Flat")
+SEMANTIC_SEARCH_PARAMS = os.getenv("SEMANTIC_SEARCH_PARAMS", "")
+# Number of episodes sampled to train IVF indexes
+SEMANTIC_TRAIN_SAMPLE = int(os.getenv("SEMANTIC_TRAIN_SAMPLE", "50000"))
+
+_TAG_RE = re.compile(r"<[^>]+>")
+# Max number of bound parameters per IN (...) clause when loading rows by id
+_ID_CHUNK_SIZE = 5000
+
+
+class SemanticSearchUnavailable(RuntimeError):
+    """Raised when semantic search is disabled or its dependencies are missing."""
+
+
+def episode_text(title: Optional[str], description: Optional[str]) -> str:
+    """Text embedded for an episode: its title and tag-stripped description."""
+    description = _TAG_RE.sub(" ", description or "")
+    return f"{title or ''}\n{description}".strip()
+
+
+class SemanticEpisodeIndex:
+    """Normalized episode embeddings in a VectorStore keyed by Episode.id.
+
+    A dense array mapping episode id to podcast id is kept next to the
+    store, so searches can be restricted to the selected podcasts with an
+    id bitmap instead of a database round trip. Both are persisted together,
+    in batches (see VectorStore.maybe_save) and on shutdown.
+
+    Indexes that need training (IVF) are trained by sync() on a random sample
+    of episodes; episodes added before that are picked up by the next sync.
+    Episodes stored by feed refreshes are embedded on a worker thread of the
+    index (see queue_episodes), off the database write path.
+    """
+
+    def __init__(
+        self,
+        index_path: str = SEMANTIC_INDEX_PATH,
+        model_name: str = EMBEDDING_MODEL,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        mmap: bool = SEMANTIC_INDEX_MMAP,
+        index_factory: str = SEMANTIC_INDEX_FACTORY,
+        search_params: str = SEMANTIC_SEARCH_PARAMS,
+        train_sample: int = SEMANTIC_TRAIN_SAMPLE,
+    ):
+        self.index_path = index_path
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.mmap = mmap
+        self.index_factory = index_factory
+        self.search_params = search_params
+        self.train_sample = train_sample
+        self._encoder = encoder
+        self._store: Optional[VectorStore] = None
+        self._podcast_of = np.zeros(0, dtype=np.int32)
+        self._lock = threading.RLock()
+        # One worker, so queued batches are embedded in the order stored
+        self._embedder = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="semantic-embed"
+        )
+        self.loaded = False
+
+    @property
+    def _podcasts_path(self) -> str:
+        return f"{self.index_path}.podcasts.npy"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as L2-normalized float32 vectors."""
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise SemanticSearchUnavailable(
+                    "sentence-transformers is not installed"
+                ) from e
+            logger.info(f"Loading embedding model: {self.model_name}")
+            model = SentenceTransformer(
+                self.model_name, local_files_only=os.path.isdir(self.model_name)
+            )
+            self._encoder = lambda batch: model.encode(
+                batch,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+        return np.ascontiguousarray(self._encoder(texts), dtype=np.float32)
+
+    def load(self) -> None:
+        """Load the persisted index, or start an empty one."""
+        with self._lock:
+            if os.path.exists(self.index_path):
+                try:
+                    self._store = VectorStore.load(
+                        self.index_path,
+                        mmap=self.mmap,
+                        search_params=self.search_params,
+                    )
+                except VectorStoreUnavailable as e:
+                    raise SemanticSearchUnavailable(str(e)) from e
+                self._podcast_of = np.load(self._podcasts_path)
+            else:
+                self._store = None
+                self._podcast_of = np.zeros(0, dtype=np.int32)
+            self.loaded = True
+
+    def save(self) -> None:
+        with self._lock:
+            if self._store is None or self._store.read_only:
+                return
+            self._store.save()
+            self._save_podcasts()
+
+    def _maybe_save(self) -> None:
+        if self._store.maybe_save():
+            self._save_podcasts()
+
+    def _save_podcasts(self) -> None:
+        tmp_path = f"{self._podcasts_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self._podcast_of)
+        os.replace(tmp_path, self._podcasts_path)
+
+    def sync(self, db: Session) -> int:
+        """Embed every episode missing from the index. Returns how many."""
+        if self.mmap:
+            return 0
+        embedded = 0
+        if self._store is None or not self._store.is_trained:
+            embedded = self._train(db)
+        indexed = set(np.flatnonzero(self._podcast_of).tolist())
+        missing = [
+            episode_id
+            for (episode_id,) in db.query(Episode.id).order_by(Episode.id)
+            if episode_id not in indexed
+        ]
+        for start in range(0, len(missing), self.batch_size * 16):
+            self.add_episodes(
+                _episode_rows(db, missing[start : start + self.batch_size * 16])
+            )
+        embedded += len(missing)
+        self.save()
+        logger.info(f"Semantic index synced, embedded {embedded} episodes")
+        return embedded
+
+    def _new_store(self, dim: int) -> VectorStore:
+        return VectorStore(
+            dim,
+            self.index_path,
+            index_factory=self.index_factory,
+            search_params=self.search_params,
+        )
+
+    def _train(self, db: Session) -> int:
+        """Create the store from a sample of episodes, training it if needed.
+
+        Returns the number of sampled episodes, which are indexed right away.
+        """
+        sample_ids = [
+            episode_id
+            for (episode_id,) in db.query(Episode.id)
+            .order_by(func.random())
+            .limit(self.train_sample)
+        ]
+        if not sample_ids:
+            return 0
+        rows = _episode_rows(db, sample_ids)
+        vectors = self.encode([episode_text(row[2], row[3]) for row in rows])
+        with self._lock:
+            store = self._new_store(vectors.shape[1])
+            if not store.is_trained:
+                logger.info(
+                    f"Training {self.index_factory} semantic index on "
+                    f"{len(rows)} episodes"
+                )
+                store.train(vectors)
+            self._store = store
+            self._podcast_of = np.zeros(0, dtype=np.int32)
+            self._add_vectors(rows, vectors)
+        return len(rows)
+
+    def add_episodes(self, rows: Iterable[Tuple]) -> None:
+        """Embed and index episodes, replacing previous vectors of the same ids.
+
+        Each row is (id, podcast_id, title, description, publish_date).
+        """
+        rows = list(rows)
+        if not self.loaded or self.mmap or not rows:
+            return
+        if self._store is not None and not self._store.is_trained:
+            return
+        vectors = self.encode([episode_text(row[2], row[3]) for row in rows])
+        with self._lock:
+            if self._store is None:
+                self._store = self._new_store(vectors.shape[1])
+                if not self._store.is_trained:
+                    logger.info("Semantic index needs training, deferred to sync")
+                    return
+            self._add_vectors(rows, vectors)
+
+    def queue_episodes(self, rows: Iterable[Tuple]) -> Optional[Future]:
+        """Embed and index episodes on the index's worker thread.
+
+        Returns the future of the batch, or None if there is nothing to do.
+        Errors are logged; episodes left out are embedded by the next sync.
+        """
+        rows = list(rows)
+        if not self.loaded or self.mmap or not rows:
+            return None
+        return self._embedder.submit(self._add_queued, rows)
+
+    def _add_queued(self, rows: List[Tuple]) -> None:
+        try:
+            self.add_episodes(rows)
+        except Exception:
+            logger.error("Error embedding new episodes", exc_info=True)
+
+    def close(self) -> None:
+        """Drop queued batches and wait for the one being embedded."""
+        self._embedder.shutdown(wait=True, cancel_futures=True)
+
+    def _add_vectors(self, rows: List[Tuple], vectors: np.ndarray) -> None:
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        with self._lock:
+            self._store.add_many(ids, vectors)
+            if ids.max() >= len(self._podcast_of):
+                grown = np.zeros(int(ids.max()) * 2 + 1, dtype=np.int32)
+                grown[: len(self._podcast_of)] = self._podcast_of
+                self._podcast_of = grown
+            self._podcast_of[ids] = [row[1] for row in rows]
+            self._maybe_save()
+
+    def remove_podcasts(self, podcast_ids: Iterable[int]) -> None:
+        with self._lock:
+            if self._store is None or self.mmap:
+                return
+            ids = np.flatnonzero(np.isin(self._podcast_of, list(podcast_ids)))
+            if ids.size:
+                # Stores that cannot remove vectors rely on the search mask
+                self._store.remove(ids)
+                self._podcast_of[ids] = 0
+                self._maybe_save()
+
+    def search(
+        self, query: str, podcast_ids: Iterable[int], k: int
+    ) -> List[Tuple[int, float]]:
+        """Top-k (episode id, cosine similarity) pairs within the given podcasts."""
+        if not self.loaded:
+            raise SemanticSearchUnavailable("Semantic search is not enabled")
+        if self._store is None or k <= 0:
+            return []
+        if self._store.reload_if_changed():
+            self._podcast_of = np.load(self._podcasts_path)
+        vector = self.encode([query])
+        mask = np.isin(self._podcast_of, list(podcast_ids))
+        if not mask.any():
+            return []
+        scores, ids = self._store.search(vector, k, id_mask=mask)
+        results = {}
+        for episode_id, score in zip(ids[0], scores[0]):
+            # Stale vectors of re-added episodes can linger in HNSW indexes
+            if episode_id >= 0 and episode_id not in results:
+                results[int(episode_id)] = float(score)
+        return list(results.items())
+
+
+def _episode_rows(db: Session, episode_ids: List[int]) -> List[Tuple]:
+    rows = []
+    for start in range(0, len(episode_ids), _ID_CHUNK_SIZE):
+        rows.extend(
+            db.query(
+                Episode.id,
+                Episode.podcast_id,
+                Episode.title,
+                Episode.description,
+                Episode.publish_date,
+            ).filter(Episode.id.in_(episode_ids[start : start + _ID_CHUNK_SIZE]))
+        )
+    return rows
+
+
+# Global semantic index instance
+semantic_index = SemanticEpisodeIndex()
@@ -0,0 +1,234 @@
+"""FAISS vector store with explicit ids, bulk updates and batched persistence."""
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreUnavailable(RuntimeError):
+    """Raised when faiss is not installed."""
+
+
+def import_faiss():
+    try:
+        import faiss
+    except ImportError as e:
+        raise VectorStoreUnavailable("faiss is not installed") from e
+    return faiss
+
+
+class VectorStore:
+    """Inner-product FAISS index keyed by explicit int64 ids.
+
+    Vectors live in an IndexIDMap2, so ids stay valid across deletions.
+    index_factory picks the underlying FAISS index with a factory string:
+    "Flat" (exact, the default), an IVF index such as "IVF4096,PQ48", which
+    has to be trained with train() before vectors are added, or "HNSW32".
+    HNSW graphs cannot remove vectors: removed ids stay in the index until it
+    is rebuilt, so searches have to mask them out with id_mask.
+    search_params tunes the speed/recall tradeoff at query time, e.g.
+    "nprobe=32" for IVF or "efSearch=64" for HNSW.
+
+    Changes are written to disk by save(), or by maybe_save() once
+    autosave_every changes are pending or autosave_seconds have passed since
+    the last write, instead of after every insert.
+
+    A store loaded with mmap=True maps the index file read-only, so several
+    worker processes serving queries share the same pages. Such a store
+    cannot be modified; reload_if_changed() picks up a newer file written by
+    the process that owns the index.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_path: Optional[str] = None,
+        index_factory: str = "Flat",
+        search_params: str = "",
+        autosave_every: int = 10000,
+        autosave_seconds: float = 60.0,
+    ):
+        faiss = import_faiss()
+        self.dim = dim
+        self.index_path = index_path
+        self.autosave_every = autosave_every
+        self.autosave_seconds = autosave_seconds
+        self.search_params = search_params
+        self.read_only = False
+        self._index = faiss.index_factory(
+            dim, f"IDMap2,{index_factory}", faiss.METRIC_INNER_PRODUCT
+        )
+        self._apply_search_params()
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._file_mtime = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, index_path: str, mmap: bool = False, **kwargs) -> "VectorStore":
+        """Load a persisted store, memory-mapped and read-only if mmap is set."""
+        faiss = import_faiss()
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(index_path, flags)
+        search_params = kwargs.pop("search_params", "")
+        store = cls(index.d, index_path, **kwargs)
+        store.search_params = search_params
+        store._index = index
+        store._apply_search_params()
+        store.read_only = mmap
+        store._file_mtime = os.path.getmtime(index_path)
+        logger.info(
+            f"Loaded vector store {index_path} with {index.ntotal} vectors"
+            + (" (mmap)" if mmap else "")
+        )
+        return store
+
+    @property
+    def ntotal(self) -> int:
+        return self._index.ntotal
+
+    @property
+    def is_trained(self) -> bool:
+        return self._index.is_trained
+
+    @property
+    def supports_remove(self) -> bool:
+        return not isinstance(self._inner_index(), import_faiss().IndexHNSW)
+
+    def _inner_index(self):
+        return import_faiss().downcast_index(self._index.index)
+
+    def _apply_search_params(self) -> None:
+        if self.search_params:
+            import_faiss().ParameterSpace().set_index_parameters(
+                self._index, self.search_params
+            )
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Train an IVF index on a representative sample of vectors."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._check_writable()
+            self._index.train(vectors)
+
+    def add_many(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add a matrix of vectors, replacing any stored under the same ids."""
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(
+                f"Expected a ({len(ids)}, {self.dim}) matrix, got {vectors.shape}"
+            )
+        with self._lock:
+            self._check_writable()
+            if not self._index.is_trained:
+                raise ValueError("Vector store has to be trained before adding")
+            self._remove(ids)
+            self._index.add_with_ids(vectors, ids)
+            self._pending += len(ids)
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by id. Returns how many were removed.
+
+        Stores that do not support removal (HNSW) remove nothing.
+        """
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        with self._lock:
+            self._check_writable()
+            removed = self._remove(ids)
+            self._pending += removed
+            return removed
+
+    def _remove(self, ids: np.ndarray) -> int:
+        if not ids.size or not self._index.ntotal or not self.supports_remove:
+            return 0
+        faiss = import_faiss()
+        return self._index.remove_ids(
+            faiss.IDSelectorBatch(ids.size, faiss.swig_ptr(ids))
+        )
+
+    def search(
+        self, vectors: np.ndarray, k: int, id_mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, ids) per query vector; missing hits have id -1.
+
+        id_mask, when given, is a boolean array indexed by id restricting
+        which vectors may be returned.
+        """
+        faiss = import_faiss()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            params = None
+            if id_mask is not None:
+                bitmap = np.packbits(id_mask, bitorder="little")
+                selector = faiss.IDSelectorBitmap(bitmap.size, faiss.swig_ptr(bitmap))
+                params = self._selector_params(selector)
+            return self._index.search(vectors, k, params=params)
+
+    def _selector_params(self, selector):
+        # Search parameters replace the index's own, so carry those over
+        faiss = import_faiss()
+        inner = self._inner_index()
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=inner.nprobe)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(
+                sel=selector, efSearch=inner.hnsw.efSearch
+            )
+        return faiss.SearchParameters(sel=selector)
+
+    def save(self) -> None:
+        """Write the index to index_path, atomically replacing the old file."""
+        if self.index_path is None or self.read_only:
+            return
+        faiss = import_faiss()
+        with self._lock:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(self._index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._pending = 0
+            self._saved_at = time.monotonic()
+            self._file_mtime = os.path.getmtime(self.index_path)
+
+    def maybe_save(self) -> bool:
+        """Save if enough changes are pending or the last save is old enough."""
+        with self._lock:
+            if not self._pending:
+                return False
+            if (
+                self._pending >= self.autosave_every
+                or time.monotonic() - self._saved_at >= self.autosave_seconds
+            ):
+                self.save()
+                return True
+            return False
+
+    def reload_if_changed(self) -> bool:
+        """Re-map a read-only store whose file was replaced on disk."""
+        if not self.read_only or self.index_path is None:
+            return False
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return False
+        if mtime == self._file_mtime:
+            return False
+        faiss = import_faiss()
+        index = faiss.read_index(
+            self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        )
+        with self._lock:
+            self._index = index
+            self._apply_search_params()
+            self._file_mtime = mtime
+        logger.info(f"Reloaded vector store {self.index_path}")
+        return True
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise RuntimeError("Vector store is memory-mapped read-only")
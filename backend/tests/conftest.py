@@ -0,0 +1,81 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+
+class FeedServer:
+    """Local HTTP server answering each path with a canned feed response."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(
+                    {
+                        "path": self.path,
+                        "headers": dict(self.headers),
+                        "client_port": self.client_address[1],
+                    }
+                )
+                route = server.routes.get(self.path)
+                if route is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(route["delay"])
+                body = route["body"]
+                self.send_response(route["status"])
+                for name, value in route["headers"].items():
+                    self.send_header(name, value)
+                if route["gzip"] and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    def route(self, path, body, status=200, headers=None, delay=0.0, gzip=False):
+        self.routes[path] = {
+            "body": body,
+            "status": status,
+            "headers": {"Content-Type": "application/rss+xml", **(headers or {})},
+            "delay": delay,
+            "gzip": gzip,
+        }
+        return self.url(path)
+
+    def url(self, path):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def feed_server():
+    """A local feed server; add responses with feed_server.route()."""
+    with FeedServer() as server:
+        yield server
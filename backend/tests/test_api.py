@@ -156,6 +156,67 @@ def test_get_episodes():
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+def test_get_episodes_cursor():
+    from datetime import datetime
+    from backend.models.database import Episode
+
+    podcast_response = client.post(
+        "/api/podcasts/",
+        json={
+            "title": "Test Podcast",
+            "description": "Test Description",
+            "rss_url": "https://example.com/feed.xml",
+        }
+    )
+    podcast_id = podcast_response.json()["id"]
+    db = TestingSessionLocal()
+    db.add_all(
+        Episode(
+            podcast_id=podcast_id,
+            title=f"Episode {i}",
+            description="",
+            url=f"https://example.com/{i}",
+            publish_date=datetime(2024, 1, i + 1),
+        )
+        for i in range(5)
+    )
+    db.commit()
+    db.close()
+
+    titles, cursor = [], None
+    while True:
+        params = {"podcast_ids": [podcast_id], "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/episodes", params=params)
+        assert response.status_code == 200
+        titles.extend(episode["title"] for episode in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert titles == [f"Episode {i}" for i in range(4, -1, -1)]
+
+    response = client.post(
+        "/api/episodes/search",
+        params={"limit": 2},
+        json={"query": "Episode", "podcast_ids": [podcast_id]},
+    )
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.post(
+        "/api/episodes/search",
+        params={"limit": 2, "cursor": cursor},
+        json={"query": "Episode", "podcast_ids": [podcast_id]},
+    )
+    assert [item["episode"]["title"] for item in response.json()] == [
+        "Episode 2",
+        "Episode 1",
+    ]
+
+    response = client.get(
+        "/api/episodes", params={"podcast_ids": [podcast_id], "cursor": cursor}
+    )
+    assert response.status_code == 400
+
 def test_delete_episodes():
     # Create a podcast first
     podcast_response = client.post(
@@ -195,4 +256,189 @@ def test_get_db_status():
     assert "podcasts" in data
     assert "episodes" in data
     assert data["podcasts"] == 1
-    assert data["episodes"] == 0 
\ No newline at end of file
+    assert data["episodes"] == 0 
+
+def test_get_episode_index_stats():
+    response = client.get("/api/episodes/index/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert "loaded" in data
+    assert "projected_bytes_1m_episodes" in data
+    assert data["bytes"]["total"] >= 0
+
+
+def test_search_episodes_without_matches():
+    podcast_response = client.post(
+        "/api/podcasts/",
+        json={
+            "title": "Test Podcast",
+            "description": "Test Description",
+            "rss_url": "https://example.com/feed.xml",
+            "image_url": "https://example.com/image.jpg"
+        }
+    )
+    podcast_id = podcast_response.json()["id"]
+
+    response = client.post(
+        "/api/episodes/search",
+        json={
+            "query": "test",
+            "podcast_ids": [podcast_id],
+            "include_matches": False,
+        },
+    )
+    assert response.status_code == 200
+    for item in response.json():
+        assert item["matches"] is None
+
+
+def test_search_episodes_semantic_unavailable():
+    response = client.post(
+        "/api/episodes/search",
+        json={"query": "test", "podcast_ids": [1], "mode": "semantic"},
+    )
+    assert response.status_code == 503
+
+
+def test_search_episodes_server_timing():
+    response = client.post(
+        "/api/episodes/search",
+        json={"query": "test", "podcast_ids": [1]},
+    )
+    assert response.status_code == 200
+    assert "lexical;dur=" in response.headers["Server-Timing"]
+
+
+def test_refresh_podcast_reports_counts(monkeypatch):
+    from functools import partial
+    import httpx
+    from backend.services import feed_fetcher
+
+    items = "".join(
+        f"<item><title>Episode {i}</title><link>https://example.com/{i}</link></item>"
+        for i in range(3)
+    )
+    feed = f'<rss version="2.0"><channel>{items}</channel></rss>'
+
+    stub = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text=feed))
+    )
+    monkeypatch.setattr(
+        feed_fetcher, "open_feed", partial(feed_fetcher.open_feed, client=stub)
+    )
+    podcast_response = client.post(
+        "/api/podcasts/",
+        json={
+            "title": "Test Podcast",
+            "description": "Test Description",
+            "rss_url": "https://example.com/feed.xml",
+        },
+    )
+    podcast_id = podcast_response.json()["id"]
+
+    response = client.post(f"/api/podcasts/{podcast_id}/refresh")
+    assert response.status_code == 200
+    assert (response.json()["inserted"], response.json()["skipped"]) == (3, 0)
+    assert response.json()["cache"] == "miss"
+
+    response = client.post(f"/api/podcasts/{podcast_id}/refresh")
+    assert response.json()["inserted"] == 0
+    assert response.json()["cache"] == "unchanged"
+    assert "elapsed_ms" in response.json()
+
+
+def test_refresh_podcasts_bulk(monkeypatch):
+    import httpx
+    from backend.api import routes
+    from backend.services.refresh_service import RefreshService
+
+    feed = '<rss version="2.0"><channel><item><title>A</title><link>https://example.com/a</link></item></channel></rss>'
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=feed))
+    monkeypatch.setattr(routes, "refresh_service", RefreshService(transport=transport))
+    podcast_response = client.post(
+        "/api/podcasts/",
+        json={
+            "title": "Test Podcast",
+            "description": "Test Description",
+            "rss_url": "https://example.com/feed.xml",
+        },
+    )
+    podcast_id = podcast_response.json()["id"]
+
+    response = client.post("/api/podcasts/refresh", json={"podcast_ids": "all"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 1
+    assert data["results"][0]["podcast_id"] == podcast_id
+    assert data["results"][0]["status"] == "ok"
+
+
+def test_get_refresh_schedule():
+    response = client.get("/api/podcasts/refresh/schedule")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"enabled", "running", "max_lag_seconds", "podcasts"} <= set(data)
+
+
+def test_add_podcast_fetches_feed_once(feed_server, monkeypatch):
+    from backend.services import feed_fetcher, podcast_service
+    from backend.services.feed_cache import FeedCache
+
+    monkeypatch.setattr(podcast_service, "feed_cache", FeedCache())
+    monkeypatch.setattr(feed_fetcher, "feed_client", feed_fetcher.FeedClient())
+    items = "".join(
+        f"<item><title>Episode {i}</title><link>https://example.com/{i}</link></item>"
+        for i in range(3)
+    )
+    feed = (
+        '<rss version="2.0"><channel><title>Test Podcast</title>'
+        f"<description>Test Description</description>{items}</channel></rss>"
+    )
+    rss_url = feed_server.route("/feed.xml", feed.encode())
+
+    response = client.post("/api/podcasts/validate", json={"rss_url": rss_url})
+    assert response.json()["valid"] is True
+    podcast = response.json()["podcast"]
+    podcast_id = client.post("/api/podcasts/", json=podcast).json()["id"]
+    response = client.post(f"/api/podcasts/{podcast_id}/refresh")
+    assert response.json()["inserted"] == 3
+    assert response.json()["cache"] == "cached"
+    assert len(feed_server.requests) == 1
+
+    # Later refreshes revalidate the feed
+    response = client.post(f"/api/podcasts/{podcast_id}/refresh")
+    assert response.json()["cache"] == "unchanged"
+    assert len(feed_server.requests) == 2
+
+
+def test_import_opml(feed_server, monkeypatch):
+    from backend.services import feed_fetcher, podcast_service
+    from backend.services.feed_cache import FeedCache
+    from backend.services.opml_import import opml_import_service
+
+    monkeypatch.setattr(podcast_service, "feed_cache", FeedCache())
+    monkeypatch.setattr(feed_fetcher, "feed_client", feed_fetcher.FeedClient())
+    monkeypatch.setattr(opml_import_service, "session_factory", TestingSessionLocal)
+    rss_url = feed_server.route(
+        "/feed.xml",
+        b'<rss version="2.0"><channel><title>Imported</title>'
+        b"<description>D</description></channel></rss>",
+    )
+    opml = (
+        '<opml version="2.0"><body>'
+        f'<outline text="Imported" xmlUrl="{rss_url}"/></body></opml>'
+    )
+
+    response = client.post("/api/podcasts/import_opml", content=opml)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["total"] == 1
+
+    response = client.get(f"/api/podcasts/import_opml/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "done"
+    assert response.json()["created"] == 1
+    assert [p["title"] for p in client.get("/api/podcasts/").json()] == ["Imported"]
+
+    assert client.post("/api/podcasts/import_opml", content="<rss/>").status_code == 400
+    assert client.get("/api/podcasts/import_opml/unknown").status_code == 404
@@ -0,0 +1,157 @@
+"""Tests for the async read routes on the aiosqlite engine."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from backend.api import async_routes, interviews, projects, routes
+from backend.models.database import (
+    Base,
+    Episode,
+    Podcast,
+    create_async_sqlite_engine,
+    create_sqlite_engine,
+    ensure_episode_fts,
+)
+from backend.models.database_session import get_async_db, get_db
+from backend.models.interview_models import Interview, Note, NoteItem, ItemType, Project
+from backend.services import podcast_service
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_sqlite_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_episode_fts(connection)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        Podcast(id=i, title=f"Podcast {i}", rss_url=f"https://example.com/{i}")
+        for i in (1, 2)
+    )
+    db.add_all(
+        Episode(
+            podcast_id=i % 2 + 1,
+            title=f"Episode {i} about python",
+            description="python " * (i % 3),
+            url=f"https://example.com/episodes/{i}",
+            publish_date=datetime(2024, 1, 1) + timedelta(days=i),
+        )
+        for i in range(30)
+    )
+    project = Project(title="Project")
+    interview = Interview(project=project, interview_title="Interview")
+    interview.notes = [
+        Note(
+            title="Note",
+            order_index=0,
+            items=[NoteItem(type=ItemType.TEXT, content="Item", order_index=0)],
+        )
+    ]
+    db.add(project)
+    db.commit()
+    db.close()
+    yield url
+    engine.dispose()
+
+
+@pytest.fixture
+def clients(database_url):
+    """Test clients of a sync and an async app on the same database."""
+    engine = create_sqlite_engine(database_url)
+    async_engine = create_async_sqlite_engine(database_url, poolclass=NullPool)
+    SessionLocal = sessionmaker(bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    sync_app = FastAPI()
+    for router in (routes.router, projects.router, interviews.router):
+        sync_app.include_router(router, prefix="/api")
+    sync_app.dependency_overrides[get_db] = override_get_db
+    async_app = FastAPI()
+    async_app.include_router(async_routes.router, prefix="/api")
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(sync_app) as sync_client, TestClient(async_app) as async_client:
+        yield sync_client, async_client
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "method,path,params,body",
+    [
+        ("get", "/api/episodes", {"podcast_ids": [1, 2], "limit": 5}, None),
+        ("post", "/api/episodes/search", {"limit": 5}, {"query": "python", "podcast_ids": [1]}),
+        ("post", "/api/episodes/search", {"limit": 5}, {"query": "", "podcast_ids": [2]}),
+        ("get", "/api/podcasts/with_counts", None, None),
+        ("get", "/api/projects", None, None),
+        ("get", "/api/interviews/1", None, None),
+        ("get", "/api/interviews/99", None, None),
+    ],
+)
+def test_async_routes_match_sync(clients, method, path, params, body):
+    """Test that the async routes answer exactly like the sync ones."""
+    sync_client, async_client = clients
+    kwargs = {"params": params} if body is None else {"params": params, "json": body}
+    expected = getattr(sync_client, method)(path, **kwargs)
+    response = getattr(async_client, method)(path, **kwargs)
+    assert response.status_code == expected.status_code
+    assert response.json() == expected.json()
+    assert response.headers.get("X-Next-Cursor") == expected.headers.get("X-Next-Cursor")
+
+
+@pytest.mark.parametrize("engine", ["fts", "scan"])
+def test_async_search_ranks_off_the_event_loop(clients, monkeypatch, engine):
+    """Test that async search matches sync search, ranking in worker threads."""
+    monkeypatch.setattr(podcast_service, "SEARCH_ENGINE", engine)
+    on_event_loop = []
+
+    def off_loop(function):
+        def wrapper(*args):
+            try:
+                asyncio.get_running_loop()
+                on_event_loop.append(function.__name__)
+            except RuntimeError:
+                pass
+            return function(*args)
+
+        return wrapper
+
+    for name in ("_rank_rows", "_page_results"):
+        function = getattr(podcast_service, name)
+        monkeypatch.setattr(podcast_service, name, off_loop(function))
+    sync_client, async_client = clients
+    body = {"query": "python", "podcast_ids": [1, 2], "title_weight": 20}
+    expected = sync_client.post("/api/episodes/search", json=body)
+    response = async_client.post("/api/episodes/search", json=body)
+    assert response.status_code == 200
+    assert response.json() == expected.json()
+    assert on_event_loop == []
+
+
+def test_async_engine_pragmas(database_url):
+    """Test that async connections get the same pragmas as sync ones."""
+
+    async def journal_mode():
+        engine = create_async_sqlite_engine(database_url)
+        try:
+            async with engine.connect() as connection:
+                return (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(journal_mode()) == "wal"
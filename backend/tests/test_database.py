@@ -0,0 +1,45 @@
+"""Tests for the SQLite engine setup."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from backend.models.database import SQLITE_PRAGMAS, create_sqlite_engine
+
+
+def test_engine_applies_pragmas(tmp_path):
+    """Test that every pooled connection gets the configured pragmas."""
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path}/test.db", pool_size=3)
+    with engine.connect() as connection:
+        pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == SQLITE_PRAGMAS["cache_size"]
+        assert pragma("temp_store") == 2  # MEMORY
+        assert pragma("busy_timeout") == SQLITE_PRAGMAS["busy_timeout"]
+    assert engine.pool.size() == 3
+    engine.dispose()
+
+
+@pytest.mark.parametrize("journal_mode", ["WAL", "DELETE"])
+def test_reads_during_write_transaction(tmp_path, journal_mode):
+    """Test that only WAL lets readers in while a write transaction commits."""
+    pragmas = {**SQLITE_PRAGMAS, "journal_mode": journal_mode, "busy_timeout": 50}
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path}/test.db", pragmas)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+
+    reader = engine.connect()
+    writer = engine.raw_connection()
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute("INSERT INTO t VALUES (2)")
+    try:
+        if journal_mode == "WAL":
+            assert reader.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        else:
+            with pytest.raises(OperationalError, match="locked"):
+                reader.execute(text("SELECT count(*) FROM t"))
+    finally:
+        writer.rollback()
+        writer.close()
+        reader.close()
+        engine.dispose()
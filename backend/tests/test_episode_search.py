@@ -0,0 +1,280 @@
+"""Tests for episode search engines in podcast_service."""
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, Podcast, Episode, has_episode_fts
+from backend.services import podcast_service
+from backend.services.episode_index import EpisodeIndex
+
+CORPUS = [
+    ("Python tips", "Talking about python and more PYTHON", 0),
+    ("The python episode", "Nothing else", 1),
+    ("Cooking", "No snakes here", 2),
+    ("Python Python Python", "python python", 3),
+    ("Weekly news", "Python, python, python, python", 4),
+    ("שלום עולם", "פרק על עולם הפייתון", 5),
+    ("Same score A", "python", 6),
+    ("Same score B", "python", 6),
+    ("Quotes \"python\"", "a \"quoted\" description", 7),
+]
+
+
+@pytest.fixture
+def db_session():
+    """Create an in-memory SQLite database with a small episode corpus."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    podcast = Podcast(title="Test Podcast", rss_url="https://example.com/feed.xml")
+    other = Podcast(title="Other Podcast", rss_url="https://example.com/other.xml")
+    session.add_all([podcast, other])
+    session.flush()
+    base_date = datetime(2024, 1, 1)
+    for i, (title, description, age_days) in enumerate(CORPUS):
+        session.add(
+            Episode(
+                podcast_id=podcast.id if i % 4 else other.id,
+                title=title,
+                description=description,
+                url=f"https://example.com/{i}",
+                publish_date=base_date - timedelta(days=age_days),
+            )
+        )
+    session.commit()
+    yield session
+    session.close()
+
+
+def _ids(results):
+    return [item["episode"].id for item in results]
+
+
+def test_fts_index_created(db_session):
+    """Test that the FTS5 index is created with the episodes table."""
+    assert has_episode_fts(db_session.connection())
+
+
+@pytest.mark.parametrize(
+    "query,title_weight,description_weight,cap",
+    [
+        ("python", 50, 50, 10),
+        ("PYTHON", 80, 20, 2),
+        ("python", 0, 100, 10),
+        ("עולם", 50, 50, 10),
+        ('"python"', 50, 50, 10),
+        ("python, python", 30, 70, 1),
+    ],
+)
+def test_fts_matches_regex_ordering(
+    db_session, query, title_weight, description_weight, cap
+):
+    """Test that the FTS5 and regex engines return identical results."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    args = (db_session, query, podcast_ids, title_weight, description_weight, cap)
+
+    fts = podcast_service._search_episodes_fts(*args, 0, 100)
+    regex = podcast_service._search_episodes_regex(*args, 0, 100)
+
+    assert fts == regex
+    assert len(fts) > 0
+
+
+def test_fts_pagination_and_podcast_filter(db_session):
+    """Test that skip/limit and podcast filtering are applied in SQL."""
+    podcast_id = db_session.query(Podcast).first().id
+    all_results = podcast_service._search_episodes_fts(
+        db_session, "python", [podcast_id], 50, 50, 10, 0, 100
+    )
+    page = podcast_service._search_episodes_fts(
+        db_session, "python", [podcast_id], 50, 50, 10, 1, 2
+    )
+
+    episodes = podcast_service._load_episodes(
+        db_session, [episode_id for episode_id, _ in all_results]
+    )
+    assert page == all_results[1:3]
+    assert all(episode.podcast_id == podcast_id for episode in episodes.values())
+
+
+def test_fts_index_follows_deletes(db_session):
+    """Test that deleted episodes disappear from the FTS5 index."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    podcast_service.delete_all_episodes(db_session, podcast_ids[:1])
+
+    results = podcast_service.search_episodes(db_session, "python", podcast_ids)
+    assert all(item["episode"].podcast_id == podcast_ids[1] for item in results)
+
+
+def test_search_match_spans(db_session):
+    """Test that match spans are attached to the page, or skipped on request."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    results = podcast_service.search_episodes(db_session, "PYTHON", podcast_ids)
+    first = results[0]
+    assert first["episode"].title == "Python Python Python"
+    assert first["matches"] == {
+        "title": [(0, 6), (7, 13), (14, 20)],
+        "description": [(0, 6), (7, 13)],
+    }
+
+    results = podcast_service.search_episodes(
+        db_session, "PYTHON", podcast_ids, include_matches=False
+    )
+    assert results[0]["episode"].id == first["episode"].id
+    assert all(item["matches"] is None for item in results)
+
+
+@pytest.mark.parametrize("engine", ["fts", "scan", "index"])
+def test_search_cursor_pages(db_session, monkeypatch, engine):
+    """Test that paging with cursors returns the same results as offsets."""
+    # A missing publish date ranks last
+    db_session.query(Episode).filter(Episode.title == "Same score B").update(
+        {"publish_date": None}
+    )
+    if engine == "index":
+        index = EpisodeIndex()
+        index.build(db_session)
+        monkeypatch.setattr(podcast_service, "episode_index", index)
+    monkeypatch.setattr(podcast_service, "SEARCH_ENGINE", engine)
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    expected = podcast_service.search_episodes(db_session, "python", podcast_ids)
+    assert _ids(expected)[-1] == 8
+
+    pages, cursor = [], None
+    while True:
+        page = podcast_service.search_episodes(
+            db_session, "python", podcast_ids, limit=2, cursor=cursor
+        )
+        pages.extend(page)
+        if len(page) < 2:
+            break
+        cursor = podcast_service.episode_cursor(page[-1]["episode"], page[-1]["score"])
+    assert _ids(pages) == _ids(expected)
+    assert [item["score"] for item in pages] == [item["score"] for item in expected]
+
+
+def test_invalid_cursor(db_session):
+    """Test that malformed cursors, or cursors of another ordering, are rejected."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    episode = db_session.query(Episode).first()
+    list_cursor = podcast_service.episode_cursor(episode)
+    for cursor in ["not a cursor", "bnVsbA", list_cursor]:
+        with pytest.raises(ValueError):
+            podcast_service.search_episodes(
+                db_session, "python", podcast_ids, cursor=cursor
+            )
+    with pytest.raises(ValueError):
+        podcast_service.search_episodes(
+            db_session, "python", podcast_ids, mode="semantic", cursor=list_cursor
+        )
+    assert podcast_service.search_episodes(db_session, "", podcast_ids, cursor=list_cursor)
+
+
+def test_short_query_uses_regex(db_session):
+    """Test that queries too short for the trigram index still match."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    results = podcast_service.search_episodes(db_session, "py", podcast_ids)
+    assert len(results) == 7
+
+
+@pytest.fixture
+def index(db_session, monkeypatch):
+    """Build an in-memory episode index and route searches through it."""
+    index = EpisodeIndex()
+    index.build(db_session)
+    monkeypatch.setattr(podcast_service, "episode_index", index)
+    monkeypatch.setattr(podcast_service, "SEARCH_ENGINE", "index")
+    return index
+
+
+@pytest.mark.parametrize(
+    "query", ["python", "PYTH", "ython", "עולם", "python, python", "o", "!!"]
+)
+def test_index_matches_regex_ordering(db_session, index, query):
+    """Test that the in-memory index returns the same results as the regex scan."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    args = (db_session, query, podcast_ids, 70, 30, 3)
+
+    indexed = podcast_service._search_episodes_index(*args, 0, 100)
+    regex = podcast_service._search_episodes_regex(*args, 0, 100)
+
+    assert indexed == regex
+
+
+def test_index_incremental_updates(db_session, index):
+    """Test that the index follows added and deleted episodes."""
+    podcast_ids = [p.id for p in db_session.query(Podcast)]
+    episode = Episode(
+        podcast_id=podcast_ids[0],
+        title="Brand new pythonista",
+        description="",
+        url="https://example.com/new",
+        publish_date=datetime(2024, 2, 1),
+    )
+    db_session.add(episode)
+    db_session.commit()
+    index.add_episodes(
+        [(episode.id, episode.podcast_id, episode.title, "", episode.publish_date)]
+    )
+
+    results = podcast_service.search_episodes(db_session, "pythonista", podcast_ids)
+    assert _ids(results) == [episode.id]
+
+    podcast_service.delete_all_episodes(db_session, podcast_ids[:1])
+    results = podcast_service.search_episodes(db_session, "python", podcast_ids)
+    assert results
+    assert all(item["episode"].podcast_id == podcast_ids[1] for item in results)
+
+    index.compact()
+    assert podcast_service.search_episodes(
+        db_session, "python", podcast_ids
+    ) == results
+
+
+def test_index_term_lookup_matches_scan():
+    """Test that the trigram lookup finds exactly the terms containing a word."""
+    rng = np.random.default_rng(0)
+    words = ["".join(rng.choice(list("abcde"), size=rng.integers(1, 7))) for _ in range(300)]
+    index = EpisodeIndex()
+    index.loaded = True
+    index.add_episodes(
+        (i, 1, " ".join(words[i : i + 5]), "", None) for i in range(0, len(words), 5)
+    )
+    index.remove_episodes(range(0, 30))
+    index.compact()
+    for word in ["a", "ab", "abc", "cab", "eeee", "zzz"]:
+        expected = sorted(term for term in index._postings if word in term)
+        assert sorted(index._terms_containing(word)) == expected
+
+
+def test_index_memory_report(index):
+    """Test that the memory report accounts for the indexed corpus."""
+    report = index.memory_report()
+    assert report["loaded"] is True
+    assert report["episodes"] == len(CORPUS)
+    assert report["terms"] > 0
+    assert report["bytes"]["total"] == sum(
+        report["bytes"][part] for part in ("terms", "postings", "docs")
+    )
+
+
+def test_rank_episodes_breaks_ties_across_pages():
+    """Test that the partial sort keeps ties at the page boundary in order."""
+    episode_ids = np.arange(1, 9)
+    title_matches = np.array([1, 3, 1, 3, 0, 1, 2, 1])
+    desc_matches = np.zeros(8, dtype=np.int64)
+    publish_ts = np.array([5.0, 1.0, 5.0, 2.0, 9.0, 7.0, 3.0, 5.0])
+
+    full = podcast_service._rank_episodes(
+        episode_ids, title_matches, desc_matches, publish_ts, 100.0, 0.0, 10, 0, 100
+    )
+    assert [episode_id for episode_id, _ in full] == [4, 2, 7, 6, 1, 3, 8]
+    assert [score for _, score in full] == [300.0, 300.0, 200.0] + [100.0] * 4
+    for skip in range(len(full)):
+        page = podcast_service._rank_episodes(
+            episode_ids, title_matches, desc_matches, publish_ts, 100.0, 0.0, 10, skip, 2
+        )
+        assert page == full[skip : skip + 2]
@@ -0,0 +1,56 @@
+"""Tests for the parsed feed cache."""
+from feedparser import FeedParserDict
+from backend.services.feed_cache import FeedCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fetched(size):
+    return {"status": "fetched", "content": b"x" * size, "bytes": size}
+
+
+def test_cache_expires_after_ttl():
+    """Test that feeds are only reused within the TTL."""
+    clock = Clock()
+    cache = FeedCache(ttl=60, max_bytes=1000, clock=clock)
+    feed = FeedParserDict(entries=[])
+    cache.put("a", fetched(10), feed)
+    cached, cached_feed = cache.get("a")
+    assert cached_feed is feed
+    assert cached["content"] is None
+    clock.now = 61
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    """Test that the total feed size stays within max_bytes."""
+    cache = FeedCache(ttl=60, max_bytes=100)
+    cache.put("a", fetched(40), FeedParserDict())
+    cache.put("b", fetched(40), FeedParserDict())
+    cache.get("a")
+    cache.put("c", fetched(40), FeedParserDict())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.size_bytes == 80
+
+    # Feeds larger than the whole cache are not kept
+    cache.put("d", fetched(101), FeedParserDict())
+    assert cache.get("d") is None
+    assert cache.size_bytes == 80
+
+
+def test_take_removes_feed():
+    cache = FeedCache(ttl=60, max_bytes=100)
+    cache.put("a", fetched(10), FeedParserDict())
+    assert cache.take("a") is not None
+    assert cache.take("a") is None
+    assert cache.size_bytes == 0
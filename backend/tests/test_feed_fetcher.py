@@ -0,0 +1,152 @@
+"""Tests for conditional feed downloads."""
+import asyncio
+import time
+import httpx
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from backend.models.database import add_missing_columns, add_missing_indexes
+from backend.services import feed_fetcher
+
+FEED = b'<rss version="2.0"><channel><title>T</title></channel></rss>'
+ETAG = '"v1"'
+
+
+def handler(request):
+    """Serve FEED with an ETag, answering matching revalidations with 304."""
+    if request.headers.get("If-None-Match") == ETAG:
+        return httpx.Response(304, headers={"ETag": ETAG})
+    return httpx.Response(
+        200,
+        content=FEED,
+        headers={"ETag": ETAG, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+    )
+
+
+@pytest.fixture
+def client():
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        yield client
+
+
+def test_first_fetch_returns_validators(client):
+    """Test that a download reports its body, validators and size."""
+    fetched = feed_fetcher.fetch_feed("https://example.com/feed.xml", client=client)
+    assert fetched["status"] == feed_fetcher.FETCHED
+    assert fetched["content"] == FEED
+    assert fetched["etag"] == ETAG
+    assert fetched["last_modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert fetched["content_hash"] == feed_fetcher.content_hash(FEED)
+    assert fetched["bytes"] == len(FEED)
+
+
+def test_etag_revalidation_is_not_modified(client):
+    """Test that a 304 answer skips the body and keeps the previous hash."""
+    fetched = feed_fetcher.fetch_feed(
+        "https://example.com/feed.xml", ETAG, None, "abc", client=client
+    )
+    assert fetched["status"] == feed_fetcher.NOT_MODIFIED
+    assert fetched["content"] is None
+    assert fetched["content_hash"] == "abc"
+    assert fetched["bytes"] == 0
+
+
+def test_same_body_hash_is_unchanged(client):
+    """Test that a full download with a known body hash is reported unchanged."""
+    fetched = feed_fetcher.fetch_feed(
+        "https://example.com/feed.xml",
+        previous_hash=feed_fetcher.content_hash(FEED),
+        client=client,
+    )
+    assert fetched["status"] == feed_fetcher.UNCHANGED
+
+
+def test_http_errors_raise(client):
+    """Test that error responses raise instead of being parsed."""
+    with httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(404))
+    ) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            feed_fetcher.fetch_feed("https://example.com/feed.xml", client=client)
+
+
+def test_add_missing_columns():
+    """Test that columns added to models are added to existing tables."""
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE podcasts (id INTEGER PRIMARY KEY, rss_url VARCHAR)")
+        )
+        add_missing_columns(connection)
+        columns = {c["name"] for c in inspect(connection).get_columns("podcasts")}
+    assert {"feed_etag", "feed_last_modified", "feed_content_hash"} <= columns
+
+
+def test_add_missing_indexes():
+    """Test that indexes added to models are created on existing tables."""
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE episodes (id INTEGER PRIMARY KEY, podcast_id INTEGER)")
+        )
+        add_missing_columns(connection)
+        add_missing_indexes(connection)
+        indexes = {i["name"] for i in inspect(connection).get_indexes("episodes")}
+    assert "ux_episodes_podcast_guid" in indexes
+
+
+def test_feed_client_decompresses_and_reuses_connections(feed_server):
+    """Test that the shared client negotiates gzip and keeps connections alive."""
+    url = feed_server.route("/feed.xml", FEED * 100, gzip=True)
+    feed_client = feed_fetcher.FeedClient()
+
+    async def fetch_twice():
+        try:
+            return [await feed_client.fetch(url) for _ in range(2)]
+        finally:
+            await feed_client.aclose()
+
+    fetched = asyncio.run(fetch_twice())
+    assert [f["content"] for f in fetched] == [FEED * 100] * 2
+    requests = feed_server.requests
+    assert "gzip" in requests[0]["headers"]["Accept-Encoding"]
+    assert requests[0]["client_port"] == requests[1]["client_port"]
+
+
+def test_feed_client_read_timeout(feed_server):
+    """Test that a host that stops answering times out instead of hanging."""
+    url = feed_server.route("/slow.xml", FEED, delay=1.0)
+    feed_client = feed_fetcher.FeedClient(timeout=0.2)
+    start = time.perf_counter()
+    with pytest.raises(httpx.ReadTimeout):
+        feed_fetcher.fetch_feed(url, client=feed_client.client)
+    assert time.perf_counter() - start < 1.0
+    feed_client.close()
+
+
+def test_feeds_over_max_bytes_are_rejected(feed_server, monkeypatch):
+    """Test that downloads stop at FEED_MAX_BYTES, compressed or not."""
+    monkeypatch.setattr(feed_fetcher, "FEED_MAX_BYTES", 1000)
+    feed_client = feed_fetcher.FeedClient()
+    plain = feed_server.route("/plain.xml", b" " * 2000)
+    packed = feed_server.route("/packed.xml", b" " * 2000, gzip=True)
+    for url in (plain, packed):
+        with pytest.raises(feed_fetcher.FeedTooLarge):
+            feed_fetcher.fetch_feed(url, client=feed_client.client)
+    feed_client.close()
+
+
+def test_validate_uses_feed_client(feed_server, monkeypatch):
+    """Test that validation downloads through the shared client and parses bytes."""
+    from backend.services import podcast_service
+    from backend.services.feed_cache import FeedCache
+
+    monkeypatch.setattr(podcast_service, "feed_cache", FeedCache())
+    monkeypatch.setattr(feed_fetcher, "feed_client", feed_fetcher.FeedClient())
+    feed = (
+        "<rss version='2.0'><channel><title>Tést</title>"
+        "<description>D</description><link>https://example.com</link></channel></rss>"
+    ).encode("utf-8")
+    url = feed_server.route("/feed.xml", feed, gzip=True)
+    assert asyncio.run(podcast_service.validate_rss_feed(url))[:2] == (True, "Tést")
+    missing = asyncio.run(podcast_service.validate_rss_feed(feed_server.url("/none")))
+    assert missing[:2] == (False, "Could not download RSS feed")
@@ -0,0 +1,400 @@
+"""Tests for storing feed entries as episodes."""
+import time
+import tracemalloc
+from datetime import datetime
+from functools import partial
+import feedparser
+import httpx
+import pytest
+from feedparser import FeedParserDict
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, Podcast, Episode
+from backend.services import feed_fetcher, feed_stream, podcast_service
+
+
+def make_entry(i, **fields):
+    entry = {
+        "title": f"Episode {i}",
+        "description": f"Description of episode {i}",
+        "link": f"https://example.com/episodes/{i}",
+        "published_parsed": time.gmtime(1700000000 + i * 3600),
+    }
+    entry.update(fields)
+    return FeedParserDict(entry)
+
+
+@pytest.fixture
+def db():
+    """Create an in-memory database with one podcast."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Podcast(id=1, title="Test", rss_url="https://example.com/feed.xml"))
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_ingest_inserts_only_new_entries(db):
+    """Test that known and repeated links are skipped."""
+    podcast = db.get(Podcast, 1)
+    result = podcast_service.ingest_feed_entries(
+        db, podcast, [make_entry(i) for i in range(3)]
+    )
+    assert (result["inserted"], result["skipped"]) == (3, 0)
+
+    entries = [make_entry(i) for i in range(5)] + [make_entry(4)]
+    result = podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert (result["inserted"], result["skipped"]) == (2, 4)
+    assert db.query(Episode).count() == 5
+    assert result["elapsed_ms"] >= 0
+
+
+def test_ingest_indexes_inserted_rows(db, monkeypatch):
+    """Test that inserted episodes reach the search indexes with their ids."""
+    indexed = []
+    monkeypatch.setattr(podcast_service, "_index_episodes", indexed.extend)
+    podcast = db.get(Podcast, 1)
+    podcast_service.ingest_feed_entries(
+        db, podcast, [make_entry(1), make_entry(2, published_parsed=None)]
+    )
+
+    episodes = {e.url: e for e in db.query(Episode)}
+    assert [row[0] for row in indexed] == [
+        episodes["https://example.com/episodes/1"].id,
+        episodes["https://example.com/episodes/2"].id,
+    ]
+    assert indexed[0][2] == "Episode 1"
+    assert episodes["https://example.com/episodes/2"].publish_date is not None
+
+
+@pytest.mark.parametrize("engine", ["fts", "scan"])
+def test_search_after_ingesting_entries_without_text(db, monkeypatch, engine):
+    """Test that items with no title or description are stored and searchable."""
+    monkeypatch.setattr(podcast_service, "SEARCH_ENGINE", engine)
+    podcast = db.get(Podcast, 1)
+    no_description = make_entry(1, title="Python news")
+    del no_description["description"]
+    no_title = make_entry(2, description="All about python")
+    del no_title["title"]
+    podcast_service.ingest_feed_entries(db, podcast, [no_description, no_title])
+    # Rows stored as NULL by earlier builds
+    db.add(Episode(podcast_id=1, title="Python", url="https://example.com/old"))
+    db.commit()
+
+    results = podcast_service.search_episodes(db, "python", [1])
+    assert sorted((r["episode"].title, r["episode"].description) for r in results) == [
+        ("", "All about python"),
+        ("Python", None),
+        ("Python news", ""),
+    ]
+    assert all(r["matches"] for r in results)
+
+
+def test_ingest_large_feed(db):
+    """Test that a full 5,000-entry feed is stored, then skipped unchanged."""
+    podcast = db.get(Podcast, 1)
+    entries = [make_entry(i) for i in range(5000)]
+    result = podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert result["inserted"] == 5000
+
+    result = podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert (result["inserted"], result["skipped"]) == (0, 5000)
+
+
+def test_ingest_inserts_in_bulk(db):
+    """Test that new entries take two INSERTs however many there are."""
+    podcast = db.get(Podcast, 1)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            statements.append(statement.split()[:3])
+
+    event.listen(db.get_bind(), "after_cursor_execute", capture)
+    try:
+        result = podcast_service.ingest_feed_entries(
+            db, podcast, [make_entry(i) for i in range(1000)]
+        )
+    finally:
+        event.remove(db.get_bind(), "after_cursor_execute", capture)
+
+    assert result["inserted"] == 1000
+    assert statements == [["INSERT", "INTO", "episodes"]] * 2
+    ids = [row.id for row in db.query(Episode.id).order_by(Episode.publish_date)]
+    assert ids == list(range(1, 1001))
+
+
+def rss_chunks(start, stop, chunk_size=4096):
+    """Generate an RSS feed of items start..stop-1, newest first, in chunks."""
+
+    def parts():
+        yield (
+            '<?xml version="1.0"?><rss version="2.0" '
+            'xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+            "<channel><title>Big</title>"
+        )
+        for i in reversed(range(start, stop)):
+            yield (
+                f"<item><title>Episode {i}</title>"
+                f"<link>https://example.com/episodes/{i}</link>"
+                f"<guid>urn:episode:{i}</guid>"
+                f"<description><![CDATA[<p>Description {i} {'x' * 400}</p>]]></description>"
+                f"<pubDate>Tue, 14 Nov 2023 22:13:20 +0200</pubDate>"
+                f'<itunes:image href="https://example.com/{i}.jpg"/></item>'
+            )
+        yield "</channel></rss>"
+
+    buffer = b""
+    for part in parts():
+        buffer += part.encode()
+        while len(buffer) >= chunk_size:
+            yield buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+    yield buffer
+
+
+def test_iter_feed_entries_rss():
+    """Test that streamed RSS items carry the fields used for ingest."""
+    entries = list(feed_stream.iter_feed_entries(rss_chunks(0, 3, chunk_size=7)))
+    assert [e["title"] for e in entries] == ["Episode 2", "Episode 1", "Episode 0"]
+    entry = entries[0]
+    assert entry["link"] == "https://example.com/episodes/2"
+    assert entry["id"] == "urn:episode:2"
+    assert entry["description"].startswith("<p>Description 2")
+    assert entry["image"]["href"] == "https://example.com/2.jpg"
+    assert tuple(entry["published_parsed"][:6]) == (2023, 11, 14, 20, 13, 20)
+
+
+def test_iter_feed_entries_atom():
+    """Test that Atom entries use their alternate link and ISO dates."""
+    atom = (
+        b'<feed xmlns="http://www.w3.org/2005/Atom"><entry><title>A</title>'
+        b'<link rel="enclosure" href="https://example.com/a.mp3"/>'
+        b'<link href="https://example.com/a"/><id>urn:a</id>'
+        b"<summary>About A</summary><published>2024-01-02T03:04:05Z</published>"
+        b"</entry></feed>"
+    )
+    (entry,) = feed_stream.iter_feed_entries([atom])
+    assert (entry["title"], entry["link"], entry["description"]) == (
+        "A",
+        "https://example.com/a",
+        "About A",
+    )
+    assert tuple(entry["published_parsed"][:6]) == (2024, 1, 2, 3, 4, 5)
+
+
+def test_iter_feed_entries_rdf():
+    """Test that RSS 1.0 (RDF) items are streamed like feedparser parses them."""
+    items = "".join(
+        f'<item rdf:about="https://example.com/{i}"><title>Episode {i}</title>'
+        f"<link>https://example.com/{i}</link>"
+        f"<description>&lt;p&gt;About {i}&lt;/p&gt;</description>"
+        f"<dc:date>2024-01-02T03:04:{i % 60:02d}Z</dc:date></item>"
+        for i in range(45)
+    )
+    feed = (
+        '<?xml version="1.0"?>'
+        '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+        'xmlns="http://purl.org/rss/1.0/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        '<channel rdf:about="https://example.com/"><title>R</title></channel>'
+        f"{items}</rdf:RDF>"
+    ).encode()
+    parsed = feedparser.parse(feed).entries
+    streamed = list(
+        feed_stream.iter_feed_entries(
+            feed[i : i + 100] for i in range(0, len(feed), 100)
+        )
+    )
+    assert len(streamed) == 45
+    assert [dict(e) for e in streamed] == [dict(e) for e in parsed]
+    assert streamed[0]["description"] == "<p>About 0</p>"
+
+
+def test_streamed_entries_match_feedparser():
+    """Test that streamed entries are sanitized and hashed like parsed ones."""
+    feed = (
+        b'<?xml version="1.0"?><rss version="2.0" '
+        b'xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+        b"<channel><title>T</title>"
+        b"<item><title>Tom &amp; Jerry &lt;b&gt;live&lt;/b&gt;</title>"
+        b"<link> https://example.com/a </link><guid isPermaLink=\"false\">a</guid>"
+        b'<description><![CDATA[<p onclick="steal()">Hi<script>alert(1)</script>'
+        b'<a href="/notes">notes</a></p>]]></description>'
+        b"<pubDate>Tue, 14 Nov 2023 22:13:20 +0200</pubDate></item>"
+        b"<item><title>B</title><guid>https://example.com/b</guid>"
+        b"<content:encoded><![CDATA[<b>Bold</b><iframe src=x></iframe>]]>"
+        b"</content:encoded></item>"
+        b"</channel></rss>"
+    )
+    headers = {"Content-Location": "https://example.com/feed.xml"}
+    parsed = feedparser.parse(feed, response_headers=headers).entries
+    streamed = list(
+        feed_stream.iter_feed_entries(
+            [feed[i : i + 10] for i in range(0, len(feed), 10)], headers
+        )
+    )
+    assert [podcast_service._entry_hash(e) for e in streamed] == [
+        podcast_service._entry_hash(e) for e in parsed
+    ]
+    assert streamed[0]["description"] == '<p>Hi<a href="/notes">notes</a></p>'
+    assert streamed[1]["description"] == "<b>Bold</b>"
+
+
+def test_iter_feed_entries_invalid_xml():
+    """Test that malformed feeds raise ValueError."""
+    with pytest.raises(ValueError):
+        list(feed_stream.iter_feed_entries([b"<rss><channel><item>"]))
+
+
+def test_iter_feed_entries_memory_is_flat():
+    """Test that parsing memory does not grow with the size of the feed."""
+
+    def peak_bytes(n_items):
+        tracemalloc.start()
+        for _ in feed_stream.iter_feed_entries(rss_chunks(0, n_items)):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    # Warm up feedparser's lazy imports outside the measurement
+    peak_bytes(1)
+    # Five times the XML (40 KB and 200 KB) takes about the same memory
+    small, large = peak_bytes(60), peak_bytes(300)
+    assert large < small * 1.5
+
+
+def test_ingest_feed_stream_batches_and_stops_early(db):
+    """Test batched streaming ingest and the early stop at stored entries."""
+    podcast = db.get(Podcast, 1)
+    entries = feed_stream.iter_feed_entries(rss_chunks(0, 1000))
+    result = podcast_service.ingest_feed_stream(db, podcast, entries, batch_size=64)
+    assert (result["inserted"], result["skipped"]) == (1000, 0)
+    assert not result["stopped_early"]
+
+    consumed = []
+    entries = feed_stream.iter_feed_entries(rss_chunks(0, 1050))
+    result = podcast_service.ingest_feed_stream(
+        db,
+        podcast,
+        (consumed.append(entry) or entry for entry in entries),
+        batch_size=64,
+        stop_after_known=10,
+    )
+    assert (result["inserted"], result["skipped"]) == (50, 10)
+    assert result["stopped_early"]
+    assert len(consumed) == 64
+    assert db.query(Episode).count() == 1050
+
+
+def test_interrupted_stream_ingest_does_not_stop_early(db):
+    """Test that batches kept from a failed ingest do not end the next one."""
+    podcast = db.get(Podcast, 1)
+    entries = feed_stream.iter_feed_entries(rss_chunks(0, 1000))
+    podcast_service.ingest_feed_stream(db, podcast, entries, batch_size=64)
+
+    def failing(entries):
+        for i, entry in enumerate(entries):
+            if i == 100:
+                raise ConnectionError("Connection reset")
+            yield entry
+
+    entries = feed_stream.iter_feed_entries(rss_chunks(0, 1200))
+    with pytest.raises(ConnectionError):
+        podcast_service.ingest_feed_stream(db, podcast, failing(entries), batch_size=64)
+    db.rollback()
+    # The first batch was committed, the high-water mark was not moved
+    assert db.query(Episode).count() == 1064
+    assert podcast.feed_high_water == "urn:episode:999"
+
+    entries = feed_stream.iter_feed_entries(rss_chunks(0, 1200))
+    result = podcast_service.ingest_feed_stream(
+        db, podcast, entries, batch_size=64, stop_after_known=10
+    )
+    assert (result["inserted"], result["stopped_early"]) == (136, True)
+    assert db.query(Episode).count() == 1200
+    assert podcast.feed_high_water == "urn:episode:1199"
+
+
+def test_update_podcast_episodes_streams_large_feeds(db, monkeypatch):
+    """Test that feeds over the stream threshold are parsed while downloading."""
+    body = b"".join(rss_chunks(0, 300))
+    stub = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+    )
+    monkeypatch.setattr(
+        feed_fetcher,
+        "open_feed",
+        partial(feed_fetcher.open_feed, client=stub, stream_threshold=10000),
+    )
+    podcast = db.get(Podcast, 1)
+    result = podcast_service.update_podcast_episodes(db, podcast)
+    assert result["inserted"] == 300
+    assert result["bytes"] == len(body)
+    assert podcast.feed_content_hash is None
+    assert db.query(Episode).count() == 300
+
+
+def test_ingest_upserts_by_guid(db, monkeypatch):
+    """Test that entries are matched by guid and only changed ones are updated."""
+    indexed = []
+    monkeypatch.setattr(podcast_service, "_index_episodes", indexed.extend)
+    podcast = db.get(Podcast, 1)
+    entries = [make_entry(i, id=f"urn:{i}") for i in range(3)]
+    podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert len(indexed) == 3
+
+    indexed.clear()
+    entries = [
+        make_entry(0, id="urn:0", link="https://example.com/episodes/0?utm=1"),
+        make_entry(1, id="urn:1", title="Episode 1 (edited)"),
+        make_entry(2, id="urn:2"),
+    ]
+    result = podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert (result["inserted"], result["updated"], result["skipped"]) == (0, 2, 1)
+    assert db.query(Episode).count() == 3
+    assert sorted(row[2] for row in indexed) == ["Episode 0", "Episode 1 (edited)"]
+    episodes = {e.guid: e for e in db.query(Episode)}
+    assert episodes["urn:0"].url == "https://example.com/episodes/0?utm=1"
+    assert episodes["urn:1"].title == "Episode 1 (edited)"
+
+    indexed.clear()
+    result = podcast_service.ingest_feed_entries(db, podcast, entries)
+    assert (result["inserted"], result["updated"], result["skipped"]) == (0, 0, 3)
+    assert indexed == []
+
+
+def test_ingest_adopts_episodes_without_guid(db):
+    """Test that episodes stored before guids existed are matched by link."""
+    db.add(
+        Episode(
+            podcast_id=1,
+            title="Episode 1",
+            url="https://example.com/episodes/1",
+            publish_date=datetime(2024, 1, 1),
+        )
+    )
+    db.commit()
+    podcast = db.get(Podcast, 1)
+    result = podcast_service.ingest_feed_entries(
+        db, podcast, [make_entry(1, id="urn:1", published_parsed=None)]
+    )
+    assert (result["inserted"], result["updated"]) == (0, 1)
+    (episode,) = db.query(Episode).all()
+    assert episode.guid == "urn:1"
+    assert episode.content_hash is not None
+    assert episode.publish_date == datetime(2024, 1, 1)
+
+
+def test_guid_is_unique_per_podcast(db):
+    """Test the unique (podcast_id, guid) index."""
+    db.add_all(
+        Episode(podcast_id=1, guid="urn:1", url=f"https://example.com/{i}")
+        for i in range(2)
+    )
+    with pytest.raises(IntegrityError):
+        db.commit()
@@ -201,3 +201,23 @@ def test_item_ordering(db_session):
     assert items[0].content == "Item 2"  # order_index=0
     assert items[1].content == "Item 3"  # order_index=1
     assert items[2].content == "Item 1"  # order_index=2
+
+
+def test_version_added_to_existing_interviews():
+    """Test that interviews created before versioning start at version 1."""
+    from sqlalchemy import inspect, text
+    from backend.models.database import add_missing_columns
+
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE interviews (id INTEGER PRIMARY KEY, project_id INTEGER, "
+                "interview_title VARCHAR)"
+            )
+        )
+        connection.execute(text("INSERT INTO interviews VALUES (1, 1, 'Old')"))
+        add_missing_columns(connection)
+        columns = {c["name"]: c for c in inspect(connection).get_columns("interviews")}
+        assert not columns["version"]["nullable"]
+        assert connection.execute(text("SELECT version FROM interviews")).scalar() == 1
@@ -0,0 +1,252 @@
+"""Tests for the write-behind buffer of interview operations."""
+import time
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload, sessionmaker
+from backend.models.database import Base
+from backend.models.interview_models import Interview, InterviewOpsSession, Note, Project
+from backend.models.interview_schemas import InterviewFullUpdate, InterviewOp
+from backend.services import interview_service
+from backend.services.interview_ops import InterviewOpsBuffer
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Project(id=1, title="Project"))
+    interview = Interview(id=1, project_id=1, interview_title="Interview")
+    db.add(interview)
+    interview_service.autosave_interview(
+        db,
+        interview,
+        InterviewFullUpdate(
+            interview_title="Interview",
+            notes=[
+                {
+                    "client_id": "n0",
+                    "title": "Note",
+                    "items": [
+                        {"client_id": f"i{j}", "type": "text", "content": f"Item {j}", "order_index": j}
+                        for j in range(3)
+                    ],
+                }
+            ],
+            canvas_blocks=[{"client_id": "b0", "type": "paragraph", "text": "B"}],
+        ),
+    )
+    db.commit()
+    db.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def buffer(engine):
+    buffer = InterviewOpsBuffer(sessionmaker(bind=engine), flush_delay=60)
+    yield buffer
+    buffer.discard(1)
+
+
+def op(**fields):
+    return InterviewOp(**fields)
+
+
+def load(engine):
+    db = sessionmaker(bind=engine)()
+    interview = (
+        db.query(Interview)
+        .options(
+            selectinload(Interview.notes).selectinload(Note.items),
+            selectinload(Interview.canvas_blocks),
+        )
+        .filter(Interview.id == 1)
+        .one()
+    )
+    db.close()
+    return interview
+
+
+def stored_seqs(engine):
+    db = sessionmaker(bind=engine)()
+    seqs = dict(db.query(InterviewOpsSession.session_id, InterviewOpsSession.seq))
+    db.close()
+    return seqs
+
+
+def wait_for_seqs(engine):
+    deadline = time.monotonic() + 5
+    while not stored_seqs(engine) and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+def test_typing_coalesces_into_one_update(engine, buffer):
+    """Test that a burst of edits of one block is written as one UPDATE."""
+    text = ""
+    for seq, char in enumerate("Hello, interview", start=1):
+        text += char
+        result = buffer.submit(
+            1, "tab", None, seq, [op(op="update", entity="block", client_id="b0", text=text)]
+        )
+        assert result == {"client_seq": seq, "status": "buffered", "pending": 1}
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement.split()[:2], cursor.rowcount))
+
+    event.listen(engine, "after_cursor_execute", capture)
+    try:
+        changes = buffer.flush(1)
+    finally:
+        event.remove(engine, "after_cursor_execute", capture)
+
+    assert changes == {"inserted": 0, "updated": 1, "reordered": 0, "deleted": 0}
+    # The version bump, the session's client_seq, then the block
+    assert [statement for statement, _ in statements] == [
+        ["UPDATE", "interviews"],
+        ["INSERT", "INTO"],
+        ["UPDATE", "canvas_blocks"],
+    ]
+    assert statements[2][1] == 1
+    interview = load(engine)
+    assert interview.canvas_blocks[0].text == "Hello, interview"
+    assert stored_seqs(engine) == {"tab": 16}
+    assert buffer.flush(1) is None
+
+
+def test_ops_add_move_and_delete(engine, buffer):
+    """Test adds, moves across notes and cascading note deletes."""
+    buffer.submit(
+        1,
+        "tab",
+        None,
+        1,
+        [
+            op(op="add", entity="note", client_id="n1", title="New note", order_index=1),
+            op(op="add", entity="item", client_id="i9", note_client_id="n1", type="text", content="New"),
+            op(op="update", entity="item", client_id="i9", content="Newer"),
+            op(op="move", entity="item", client_id="i1", note_client_id="n1", order_index=1),
+        ],
+    )
+    result = buffer.submit(
+        1,
+        "tab",
+        None,
+        2,
+        [
+            op(op="delete", entity="note", client_id="n0"),
+            op(op="add", entity="block", client_id="b1", type="heading", text="H", order_index=1),
+            op(op="add", entity="block", client_id="b2", type="paragraph", text="P"),
+            op(op="delete", entity="block", client_id="b2"),
+        ],
+        flush=True,
+    )
+    assert result["status"] == "saved"
+    # Note n0 with items i0 and i2 deleted; i1 moved out before
+    assert result["changes"] == {"inserted": 3, "updated": 0, "reordered": 1, "deleted": 3}
+
+    interview = load(engine)
+    assert [note.client_id for note in interview.notes] == ["n1"]
+    assert [(item.client_id, item.content) for item in interview.notes[0].items] == [
+        ("i9", "Newer"),
+        ("i1", "Item 1"),
+    ]
+    assert [block.client_id for block in interview.canvas_blocks] == ["b0", "b1"]
+
+
+def test_retried_batch_is_ignored(engine, buffer):
+    """Test that batches with an accepted client_seq are not applied twice."""
+    edit = [op(op="update", entity="note", client_id="n0", title="Renamed")]
+    buffer.submit(1, "tab", None, 5, edit, flush=True)
+    assert buffer.submit(1, "tab", None, 5, edit)["status"] == "duplicate"
+    assert buffer.submit(1, "tab", None, 4, edit)["status"] == "duplicate"
+    # After a restart the stored client_seq is used
+    restarted = InterviewOpsBuffer(sessionmaker(bind=engine))
+    assert restarted.submit(1, "tab", stored_seqs(engine)["tab"], 5, edit) == {
+        "client_seq": 5,
+        "status": "duplicate",
+        "pending": 0,
+    }
+
+
+def test_sessions_number_batches_independently(engine, buffer):
+    """Test that a batch is only a retry of batches from the same session."""
+    rename = [op(op="update", entity="note", client_id="n0", title="From tab 1")]
+    edit = [op(op="update", entity="block", client_id="b0", text="From tab 2")]
+    assert buffer.submit(1, "tab-1", None, 7, rename)["status"] == "buffered"
+    assert buffer.submit(1, "tab-2", None, 1, edit)["status"] == "buffered"
+    assert buffer.submit(1, "tab-2", None, 1, edit)["status"] == "duplicate"
+    buffer.flush(1)
+    assert stored_seqs(engine) == {"tab-1": 7, "tab-2": 1}
+    interview = load(engine)
+    assert interview.notes[0].title == "From tab 1"
+    assert interview.canvas_blocks[0].text == "From tab 2"
+
+
+def test_accepted_sessions_are_bounded(engine):
+    """Test that only recent or pending sessions keep their client_seq in memory."""
+    buffer = InterviewOpsBuffer(sessionmaker(bind=engine), flush_delay=60, max_sessions=2)
+    edit = [op(op="update", entity="block", client_id="b0", text="Edit")]
+    buffer.submit(1, "tab-1", None, 1, edit)
+    buffer.submit(1, "tab-2", None, 1, edit, flush=True)
+    buffer.submit(1, "tab-3", None, 1, edit, flush=True)
+    assert list(buffer._accepted) == [(1, "tab-2"), (1, "tab-3")]
+    # Sessions with pending changes are kept beyond the bound
+    for session_id in ("tab-4", "tab-5", "tab-6"):
+        buffer.submit(1, session_id, None, 1, edit)
+    assert list(buffer._accepted) == [(1, "tab-4"), (1, "tab-5"), (1, "tab-6")]
+    buffer.discard(1)
+    # A forgotten session is checked against its stored client_seq
+    assert buffer.submit(1, "tab-1", stored_seqs(engine)["tab-1"], 1, edit)["status"] == "duplicate"
+
+
+def test_pending_ops_are_written_after_delay(engine):
+    """Test that buffered operations are written without a flush call."""
+    buffer = InterviewOpsBuffer(sessionmaker(bind=engine), flush_delay=0.05)
+    buffer.submit(
+        1, "tab", None, 1, [op(op="update", entity="block", client_id="b0", text="Later")]
+    )
+    wait_for_seqs(engine)
+    assert load(engine).canvas_blocks[0].text == "Later"
+    assert buffer.pending(1) == 0
+
+
+def test_failed_write_is_retried(engine, monkeypatch):
+    """Test that changes whose write failed are written again later."""
+    apply_changes = interview_service.apply_interview_changes
+    failures = []
+
+    def fail_once(*args):
+        if not failures:
+            failures.append(None)
+            raise OperationalError("UPDATE", {}, Exception("database is locked"))
+        return apply_changes(*args)
+
+    monkeypatch.setattr(interview_service, "apply_interview_changes", fail_once)
+    buffer = InterviewOpsBuffer(sessionmaker(bind=engine), flush_delay=0.05)
+    buffer.submit(
+        1, "tab", None, 1, [op(op="update", entity="block", client_id="b0", text="Retried")]
+    )
+    wait_for_seqs(engine)
+    assert failures
+    assert load(engine).canvas_blocks[0].text == "Retried"
+    assert buffer.pending(1) == 0
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"op": "add", "entity": "item", "client_id": "x", "type": "text", "content": "No note"},
+        {"op": "move", "entity": "block", "client_id": "b0", "text": "Not a move"},
+        {"op": "update", "entity": "note", "client_id": "n0"},
+        {"op": "update", "entity": "block", "client_id": "b0", "type": "image"},
+    ],
+)
+def test_invalid_ops(fields):
+    """Test that operations with fields that do not fit are rejected."""
+    with pytest.raises(ValueError):
+        InterviewOp(**fields)
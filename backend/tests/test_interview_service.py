@@ -0,0 +1,223 @@
+"""Tests for diff-based interview autosave."""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import selectinload, sessionmaker
+from backend.models.database import Base
+from backend.models.interview_models import CanvasBlock, Interview, Note, NoteItem, Project
+from backend.models.interview_schemas import InterviewCreate, InterviewFullUpdate
+from backend.services import interview_service
+
+
+def workspace(n_notes=10, n_items=50):
+    return {
+        "interview_title": "Interview",
+        "background_context": "Context",
+        "notes": [
+            {
+                "client_id": f"n{i}",
+                "title": f"Note {i}",
+                "order_index": i,
+                "items": [
+                    {
+                        "client_id": f"n{i}-i{j}",
+                        "type": "text",
+                        "content": f"Item {j} of note {i}",
+                        "order_index": j,
+                    }
+                    for j in range(n_items)
+                ],
+            }
+            for i in range(n_notes)
+        ],
+        "canvas_blocks": [
+            {
+                "client_id": f"b{i}",
+                "type": "paragraph",
+                "text": f"Block {i}",
+                "order_index": i,
+            }
+            for i in range(5)
+        ],
+    }
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(bind=engine)()
+    db.add(Project(id=1, title="Project"))
+    db.add(Interview(id=1, project_id=1, interview_title="Interview"))
+    db.commit()
+    yield db
+    db.close()
+
+
+def autosave(db, data):
+    interview = db.get(Interview, 1)
+    changes = interview_service.autosave_interview(
+        db, interview, InterviewFullUpdate(**data)
+    )
+    db.commit()
+    db.expire_all()
+    return changes
+
+
+def load(db):
+    return (
+        db.query(Interview)
+        .options(selectinload(Interview.notes).selectinload(Note.items))
+        .filter(Interview.id == 1)
+        .one()
+    )
+
+
+def test_autosave_writes_only_changed_rows(engine, db):
+    """Test that changing one word of a 500-item interview touches one row."""
+    data = workspace()
+    assert autosave(db, data) == {
+        "inserted": 10 + 500 + 5,
+        "updated": 1,
+        "reordered": 0,
+        "deleted": 0,
+    }
+    ids = {item.client_id: item.id for note in load(db).notes for item in note.items}
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, cursor.rowcount))
+
+    data["notes"][3]["items"][7]["content"] = "Item 7 of note three"
+    event.listen(engine, "after_cursor_execute", capture)
+    try:
+        changes = autosave(db, data)
+    finally:
+        event.remove(engine, "after_cursor_execute", capture)
+
+    assert changes == {"inserted": 0, "updated": 1, "reordered": 0, "deleted": 0}
+    # The version bump, then the item
+    assert [statement.split()[:2] for statement, _ in statements] == [
+        ["UPDATE", "interviews"],
+        ["UPDATE", "note_items"],
+    ]
+    assert statements[1][1] == 1
+    assert db.get(NoteItem, ids["n3-i7"]).content == "Item 7 of note three"
+
+    assert autosave(db, data) == dict.fromkeys(changes, 0)
+
+
+def test_autosave_inserts_moves_and_deletes(db):
+    """Test reorders, moves between notes, inserts and deletes."""
+    data = workspace(n_notes=3, n_items=3)
+    autosave(db, data)
+    stored = {item.client_id: item.id for note in load(db).notes for item in note.items}
+
+    notes = data["notes"]
+    # Swap the first two notes, move an item to the last note, delete a
+    # note with its remaining items, and add a note and a block
+    notes[0]["order_index"], notes[1]["order_index"] = 1, 0
+    moved = notes[1]["items"].pop(0)
+    notes[2]["items"].append({**moved, "order_index": 3})
+    del notes[0]
+    notes.append(
+        {
+            "client_id": "n9",
+            "title": "New note",
+            "order_index": 3,
+            "items": [{"type": "image", "content": "https://example.com/a.png"}],
+        }
+    )
+    data["canvas_blocks"].append({"type": "heading", "text": "New", "order_index": 5})
+
+    changes = autosave(db, data)
+    # Note n1 and item n1-i0 moved; note n0 and its 3 items deleted
+    assert changes == {"inserted": 3, "updated": 0, "reordered": 2, "deleted": 4}
+
+    interview = load(db)
+    assert [note.client_id for note in interview.notes] == ["n1", "n2", "n9"]
+    assert [item.client_id for item in interview.notes[1].items] == [
+        "n2-i0",
+        "n2-i1",
+        "n2-i2",
+        "n1-i0",
+    ]
+    assert interview.notes[1].items[3].id == stored["n1-i0"]
+    assert interview.notes[2].items[0].content == "https://example.com/a.png"
+    assert len(interview.canvas_blocks) == 6
+
+
+def test_autosave_rejects_duplicate_client_ids(db):
+    """Test that a client_id used twice is an error rather than a lost row."""
+    data = workspace(n_notes=1, n_items=2)
+    data["notes"][0]["items"][1]["client_id"] = "n0-i0"
+    with pytest.raises(ValueError):
+        autosave(db, data)
+
+
+def test_stale_autosave_conflicts(db):
+    """Test that a stale autosave writes nothing and gets the changes it missed."""
+    data = workspace(n_notes=2, n_items=2)
+    autosave(db, data)
+    version = db.get(Interview, 1).version
+    assert version == 2
+    # A no-op autosave leaves the version alone
+    assert autosave(db, {**data, "version": version})["updated"] == 0
+    assert db.get(Interview, 1).version == version
+
+    other_tab = {**data, "notes": [dict(note) for note in data["notes"]]}
+    data["notes"][1]["items"] = [{**data["notes"][1]["items"][0], "content": "Edited"}]
+    autosave(db, {**data, "version": version})
+
+    other_tab["canvas_blocks"] = other_tab["canvas_blocks"][:1]
+    with pytest.raises(interview_service.InterviewVersionConflict):
+        autosave(db, {**other_tab, "version": version})
+    db.rollback()
+    assert db.query(CanvasBlock).count() == 5
+
+    conflict = interview_service.changes_since(db, 1, version)
+    assert conflict["version"] == version + 1
+    assert [note.client_id for note in db.query(Note).filter(Note.id.in_(conflict["note_ids"]))] == ["n0", "n1"]
+    assert [(note["client_id"], [item.content for item in note["items"]]) for note in conflict["notes"]] == [
+        ("n1", ["Edited"])
+    ]
+    assert len(conflict["item_ids"]) == 3
+    assert conflict["canvas_blocks"] == []
+
+
+def test_create_interview_in_bulk(engine, db):
+    """Test that creating an interview takes a fixed number of INSERTs."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            statements.append(statement.split()[:3])
+
+    event.listen(engine, "after_cursor_execute", capture)
+    try:
+        interview_id = interview_service.create_interview(
+            db, InterviewCreate(project_id=1, **workspace(n_notes=100, n_items=3))
+        )
+        db.commit()
+    finally:
+        event.remove(engine, "after_cursor_execute", capture)
+
+    assert statements == [
+        ["INSERT", "INTO", "interviews"],
+        ["INSERT", "INTO", "notes"],
+        ["INSERT", "INTO", "notes"],
+        ["INSERT", "INTO", "note_items"],
+        ["INSERT", "INTO", "canvas_blocks"],
+    ]
+    interview = db.get(Interview, interview_id)
+    assert len(interview.notes) == 100
+    for i, note in enumerate(interview.notes):
+        assert note.client_id == f"n{i}"
+        assert [item.client_id for item in note.items] == [f"n{i}-i{j}" for j in range(3)]
+    assert [block.client_id for block in interview.canvas_blocks] == [f"b{i}" for i in range(5)]
@@ -263,6 +263,170 @@ def test_autosave_interview(project):
     assert data["canvas_blocks"][0]["text"] == "New paragraph"
 
 
+def test_autosave_interview_diff(project):
+    """Test that autosave matches entities by client_id and reports changes."""
+    workspace = {
+        "project_id": project["id"],
+        "interview_title": "Interview",
+        "background_context": "",
+        "notes": [
+            {
+                "client_id": "note-1",
+                "title": "Note",
+                "items": [
+                    {"client_id": "item-1", "type": "text", "content": "First"},
+                    {"client_id": "item-2", "type": "text", "content": "Second", "order_index": 1},
+                ],
+            }
+        ],
+        "canvas_blocks": [{"client_id": "block-1", "type": "heading", "text": "Heading"}],
+    }
+    created = client.post("/api/interviews", json=workspace).json()
+    assert created["notes"][0]["client_id"] == "note-1"
+
+    workspace["notes"][0]["items"][1]["content"] = "Second, edited"
+    response = client.post(f"/api/interviews/{created['id']}/autosave", json=workspace)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["changes"] == {"inserted": 0, "updated": 1, "reordered": 0, "deleted": 0}
+    assert [item["id"] for item in data["notes"][0]["items"]] == [
+        item["id"] for item in created["notes"][0]["items"]
+    ]
+    assert data["notes"][0]["items"][1]["content"] == "Second, edited"
+
+    workspace["canvas_blocks"].append(workspace["canvas_blocks"][0])
+    response = client.post(f"/api/interviews/{created['id']}/autosave", json=workspace)
+    assert response.status_code == 400
+
+
+def test_stale_writes_conflict(project):
+    """Test that a write based on an old version gets a 409 with the changes."""
+    workspace = {
+        "project_id": project["id"],
+        "interview_title": "Interview",
+        "background_context": "",
+        "notes": [
+            {
+                "client_id": "note-1",
+                "title": "Note",
+                "items": [{"client_id": "item-1", "type": "text", "content": "First"}],
+            }
+        ],
+        "canvas_blocks": [{"client_id": "block-1", "type": "heading", "text": "Heading"}],
+    }
+    created = client.post("/api/interviews", json=workspace).json()
+    assert created["version"] == 1
+    url = f"/api/interviews/{created['id']}"
+
+    first_tab = {**workspace, "version": 1, "canvas_blocks": [{"client_id": "block-1", "type": "heading", "text": "Title"}]}
+    response = client.post(url + "/autosave", json=first_tab)
+    assert response.json()["version"] == 2
+
+    second_tab = {**workspace, "version": 1, "interview_title": "Renamed"}
+    response = client.post(url + "/autosave", json=second_tab)
+    assert response.status_code == 409
+    conflict = response.json()["detail"]
+    assert conflict["version"] == 2
+    assert conflict["notes"] == []
+    assert [block["text"] for block in conflict["canvas_blocks"]] == ["Title"]
+    assert conflict["item_ids"] == [created["notes"][0]["items"][0]["id"]]
+    assert client.get(url).json()["interview_title"] == "Interview"
+
+    # Rebased on the changes
+    second_tab = {**second_tab, "version": 2, "canvas_blocks": first_tab["canvas_blocks"]}
+    response = client.post(url + "/autosave", json=second_tab)
+    assert response.status_code == 200
+    assert response.json()["version"] == 3
+
+    response = client.put(url, json={"background_context": "Stale", "version": 2})
+    assert response.status_code == 409
+    response = client.put(url, json={"background_context": "Fresh", "version": 3})
+    assert response.json()["version"] == 4
+
+
+def test_interview_ops(project, monkeypatch):
+    """Test that operation batches are buffered and visible on read."""
+    from backend.services.interview_ops import interview_ops_buffer
+
+    monkeypatch.setattr(interview_ops_buffer, "session_factory", TestingSessionLocal)
+    created = client.post(
+        "/api/interviews",
+        json={
+            "project_id": project["id"],
+            "interview_title": "Interview",
+            "canvas_blocks": [{"client_id": "block-1", "type": "paragraph", "text": "Draft"}],
+        },
+    ).json()
+    url = f"/api/interviews/{created['id']}/ops"
+
+    batch = {
+        "session_id": "tab-1",
+        "client_seq": 1,
+        "ops": [
+            {"op": "add", "entity": "note", "client_id": "note-1", "title": "Note"},
+            {"op": "add", "entity": "item", "client_id": "item-1", "note_client_id": "note-1", "type": "text", "content": "Fact"},
+            {"op": "update", "entity": "block", "client_id": "block-1", "text": "Final"},
+        ],
+    }
+    response = client.post(url, json=batch)
+    assert response.status_code == 200
+    assert response.json() == {"client_seq": 1, "status": "buffered", "pending": 3, "changes": None}
+    assert client.post(url, json=batch).json()["status"] == "duplicate"
+    # Another tab numbers its batches on its own
+    other = {"session_id": "tab-2", "client_seq": 1, "ops": batch["ops"][2:]}
+    assert client.post(url, json=other).json()["status"] == "buffered"
+
+    data = client.get(f"/api/interviews/{created['id']}").json()
+    assert data["canvas_blocks"][0]["text"] == "Final"
+    assert data["notes"][0]["items"][0]["content"] == "Fact"
+
+    response = client.post(
+        url + "?flush=true",
+        json={"session_id": "tab-1", "client_seq": 2, "ops": [{"op": "delete", "entity": "item", "client_id": "item-1"}]},
+    )
+    assert response.json()["changes"] == {"inserted": 0, "updated": 0, "reordered": 0, "deleted": 1}
+
+    response = client.post(url, json={"session_id": "tab-1", "client_seq": 3, "ops": [{"op": "move", "entity": "note", "client_id": "note-1"}]})
+    assert response.status_code == 422
+    response = client.post("/api/interviews/99999/ops", json=batch)
+    assert response.status_code == 404
+
+
+def test_get_interview_when_pending_ops_fail_to_write(project, monkeypatch):
+    """Test that a failing write of pending edits does not fail reads."""
+    from backend.services import interview_service
+    from backend.services.interview_ops import interview_ops_buffer
+
+    monkeypatch.setattr(interview_ops_buffer, "session_factory", TestingSessionLocal)
+    created = client.post(
+        "/api/interviews",
+        json={
+            "project_id": project["id"],
+            "interview_title": "Interview",
+            "canvas_blocks": [{"client_id": "block-1", "type": "paragraph", "text": "Draft"}],
+        },
+    ).json()
+
+    def fail(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(interview_service, "apply_interview_changes", fail)
+    batch = {
+        "session_id": "failing-tab",
+        "client_seq": 1,
+        "ops": [{"op": "update", "entity": "block", "client_id": "block-1", "text": "Final"}],
+    }
+    response = client.post(f"/api/interviews/{created['id']}/ops", json=batch)
+    assert response.json()["status"] == "buffered"
+    try:
+        response = client.get(f"/api/interviews/{created['id']}")
+        assert response.status_code == 200
+        assert response.json()["canvas_blocks"][0]["text"] == "Draft"
+        assert interview_ops_buffer.pending(created["id"]) == 1
+    finally:
+        interview_ops_buffer.discard(created["id"])
+
+
 def test_delete_interview(project):
     """Test deleting an interview."""
     # Create interview
@@ -0,0 +1,99 @@
+"""Tests for OPML subscription import."""
+import asyncio
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.models.database import Base, Episode, Podcast
+from backend.services import feed_fetcher, podcast_service
+from backend.services.feed_cache import FeedCache
+from backend.services.opml_import import OpmlImportService, parse_opml
+from backend.services.refresh_service import RefreshService
+
+N_FEEDS = 30
+
+
+def feed_xml(i):
+    return (
+        f'<rss version="2.0"><channel><title>Show {i}</title>'
+        f"<description>About show {i}</description>"
+        f"<item><title>Episode {i}</title><link>https://example.com/{i}</link></item>"
+        "</channel></rss>"
+    ).encode()
+
+
+def opml(urls):
+    outlines = "".join(f'<outline type="rss" text="Feed" xmlUrl="{url}"/>' for url in urls)
+    return (
+        '<?xml version="1.0"?><opml version="2.0"><head><title>Subs</title></head>'
+        f'<body><outline text="Folder">{outlines}</outline></body></opml>'
+    ).encode()
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def feed_client(monkeypatch):
+    monkeypatch.setattr(podcast_service, "feed_cache", FeedCache())
+    monkeypatch.setattr(feed_fetcher, "feed_client", feed_fetcher.FeedClient())
+
+
+def test_parse_opml():
+    """Test that nested outlines are flattened and duplicates dropped."""
+    feeds = parse_opml(
+        opml(["https://a.example.com/feed", "https://b.example.com/feed"])
+        .replace(b"</body>", b'<outline xmlUrl="https://a.example.com/feed"/></body>')
+    )
+    assert [feed["rss_url"] for feed in feeds] == [
+        "https://a.example.com/feed",
+        "https://b.example.com/feed",
+    ]
+    with pytest.raises(ValueError):
+        parse_opml(b"<rss></rss>")
+    with pytest.raises(ValueError):
+        parse_opml(b"not xml")
+
+
+def test_import_validates_concurrently(session_factory, feed_server):
+    """Test a bulk import with invalid, duplicate and already added feeds."""
+    urls = [
+        feed_server.route(f"/feed{i}.xml", feed_xml(i), delay=0.05)
+        for i in range(N_FEEDS)
+    ]
+    urls.append(feed_server.url("/missing.xml"))
+    db = session_factory()
+    db.add(Podcast(title="Show 0", rss_url=urls[0]))
+    db.commit()
+
+    service = OpmlImportService(
+        session_factory, RefreshService(), concurrency=10, per_host=10
+    )
+    feeds = parse_opml(opml(urls))
+    job = service.create_job(feeds, ingest=True)
+    start = time.perf_counter()
+    asyncio.run(service.run_job(job["job_id"], feeds))
+    elapsed = time.perf_counter() - start
+
+    job = service.get_job(job["job_id"])
+    assert job["status"] == "done"
+    assert (job["total"], job["validated"]) == (N_FEEDS + 1, N_FEEDS + 1)
+    assert (job["existing"], job["invalid"], job["created"]) == (1, 1, N_FEEDS - 1)
+    assert job["errors"][0]["rss_url"] == urls[-1]
+    assert elapsed < N_FEEDS * 0.05
+    assert db.query(Podcast).count() == N_FEEDS
+    assert db.query(Podcast).filter_by(rss_url=urls[5]).one().title == "Show 5"
+
+    # Feeds are downloaded once, while validating
+    assert job["inserted"] == N_FEEDS - 1
+    assert db.query(Episode).count() == N_FEEDS - 1
+    assert len(feed_server.requests) == N_FEEDS
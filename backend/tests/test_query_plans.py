@@ -0,0 +1,213 @@
+"""Query plan regression tests for hot queries.
+
+Every SELECT, UPDATE and DELETE a hot code path sends to SQLite is run
+through EXPLAIN QUERY PLAN. A plan that scans a whole table or sorts rows in
+a temporary B-tree fails the test.
+"""
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from feedparser import FeedParserDict
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.api import interviews as interviews_api
+from backend.api import projects as projects_api
+from backend.models.database import Base, Episode, Podcast, ensure_episode_fts
+from backend.models.interview_models import (
+    CanvasBlock,
+    Interview,
+    ItemType,
+    BlockType,
+    Note,
+    NoteItem,
+    Project,
+)
+from backend.services import podcast_service
+from backend.services.refresh_scheduler import polling_intervals
+
+# A bare "SCAN <table>" reads the whole table; "SCAN <table> USING INDEX"
+# walks an index in ORDER BY order and stops at the LIMIT. Scans of
+# subqueries read rows they already filtered.
+_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_episode_fts(connection)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(bind=engine)()
+    start = datetime(2024, 1, 1)
+    db.add_all(
+        Podcast(id=i, title=f"Podcast {i}", rss_url=f"https://example.com/{i}.xml")
+        for i in range(1, 6)
+    )
+    db.add_all(
+        Episode(
+            podcast_id=i % 5 + 1,
+            title=f"Episode {i}",
+            url=f"https://example.com/episodes/{i}",
+            guid=f"urn:{i}",
+            publish_date=start + timedelta(days=i),
+        )
+        for i in range(200)
+    )
+    project = Project(title="Project")
+    interview = Interview(project=project, interview_title="Interview")
+    for i in range(3):
+        note = Note(interview=interview, title=f"Note {i}", order_index=i)
+        note.items = [
+            NoteItem(type=ItemType.TEXT, content=f"Item {j}", order_index=j)
+            for j in range(3)
+        ]
+        interview.canvas_blocks.append(
+            CanvasBlock(type=BlockType.PARAGRAPH, text=f"Block {i}", order_index=i)
+        )
+    db.add(project)
+    db.commit()
+    yield db
+    db.close()
+
+
+@contextmanager
+def query_plans(engine):
+    """Collect (statement, plan details) of the statements run in the block."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "DELETE", "WITH")
+        ):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    plans = []
+    try:
+        yield plans
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).fetchall()
+            plans.append((statement, [row[-1] for row in rows]))
+
+
+def assert_indexed(plans):
+    assert plans
+    for statement, details in plans:
+        for detail in details:
+            scan = _SCAN.match(detail)
+            assert not (scan and scan[1] in Base.metadata.tables), (
+                f"{detail} in {statement}"
+            )
+            assert "TEMP B-TREE" not in detail, f"{detail} in {statement}"
+
+
+@pytest.mark.parametrize("podcast_ids", [[1], [1, 2, 3]])
+def test_list_episodes(engine, db, podcast_ids):
+    with query_plans(engine) as plans:
+        episodes = podcast_service.get_episodes_for_podcasts(db, podcast_ids, 5, 10)
+    assert_indexed(plans)
+    dates = [episode.publish_date for episode in episodes]
+    assert dates == sorted(dates, reverse=True)
+    assert {episode.podcast_id for episode in episodes} <= set(podcast_ids)
+
+
+def test_list_episodes_across_chunks(db, monkeypatch):
+    """Test that podcasts split over several statements are merged in order."""
+    monkeypatch.setattr(podcast_service, "_MAX_COMPOUND_SELECT", 2)
+    expected = (
+        db.query(Episode)
+        .order_by(Episode.publish_date.desc(), Episode.id.desc())
+        .offset(7)
+        .limit(20)
+        .all()
+    )
+    assert podcast_service.get_episodes_for_podcasts(db, [1, 2, 3, 4, 5], 7, 20) == expected
+
+
+@pytest.mark.parametrize("podcast_ids", [[1], [1, 2, 3]])
+def test_list_episodes_after_cursor(engine, db, podcast_ids):
+    """Test that a cursor page seeks into the index instead of skipping rows."""
+    first = podcast_service.get_episodes_for_podcasts(db, podcast_ids, 0, 40)
+    cursor = podcast_service.episode_cursor(first[29])
+    with query_plans(engine) as plans:
+        episodes = podcast_service.get_episodes_for_podcasts(
+            db, podcast_ids, 0, 10, cursor
+        )
+    assert_indexed(plans)
+    assert all("publish_date<?" in " ".join(details) for _, details in plans)
+    assert episodes == first[30:40]
+
+
+def test_list_episodes_cursor_across_chunks(db, monkeypatch):
+    """Test that cursor pages of merged chunks continue where the last page ended."""
+    monkeypatch.setattr(podcast_service, "_MAX_COMPOUND_SELECT", 2)
+    expected = podcast_service.get_episodes_for_podcasts(db, [1, 2, 3, 4, 5], 0, 60)
+    cursor = podcast_service.episode_cursor(expected[29])
+    assert (
+        podcast_service.get_episodes_for_podcasts(db, [1, 2, 3, 4, 5], 0, 30, cursor)
+        == expected[30:]
+    )
+
+
+def test_search_without_query(engine, db):
+    with query_plans(engine) as plans:
+        results = podcast_service.search_episodes(db, "", [1, 2], skip=0, limit=10)
+    assert_indexed(plans)
+    assert len(results) == 10
+
+
+def test_ingest_lookup(engine, db):
+    entries = [
+        FeedParserDict(
+            id=f"urn:{i}",
+            title=f"Episode {i}",
+            link=f"https://example.com/episodes/{i}",
+        )
+        for i in range(0, 50, 5)
+    ]
+    with query_plans(engine) as plans:
+        podcast_service.ingest_feed_entries(db, db.get(Podcast, 1), entries)
+    assert_indexed(plans)
+
+
+def test_polling_intervals(engine, db):
+    with query_plans(engine) as plans:
+        polling_intervals(db, [1, 2, 3])
+    assert_indexed(plans)
+
+
+def test_load_interview(engine, db):
+    interview_id = db.query(Interview.id).scalar()
+    db.expunge_all()
+    with query_plans(engine) as plans:
+        interview = interviews_api.get_interview(interview_id, db)
+    assert_indexed(plans)
+    assert [note.title for note in interview.notes] == ["Note 0", "Note 1", "Note 2"]
+    assert [item.content for item in interview.notes[0].items] == [
+        "Item 0",
+        "Item 1",
+        "Item 2",
+    ]
+
+
+def test_list_projects(engine, db):
+    with query_plans(engine) as plans:
+        projects = projects_api.list_projects(0, 10, db)
+    assert_indexed(plans)
+    assert projects[0].stats.note_count == 3
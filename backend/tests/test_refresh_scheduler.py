@@ -0,0 +1,116 @@
+"""Tests for the background feed refresh scheduler."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.models.database import Base, Podcast, Episode
+from backend.services import refresh_scheduler
+from backend.services.refresh_scheduler import RefreshScheduler, polling_intervals
+
+NOW = datetime(2024, 6, 1)
+HOUR = 3600
+
+
+@pytest.fixture
+def Session():
+    """Create a shared in-memory database with podcasts of different cadences."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    cadences = {1: timedelta(days=1), 2: timedelta(hours=1), 3: timedelta(days=7)}
+    for podcast_id in range(1, 6):
+        db.add(
+            Podcast(
+                id=podcast_id,
+                title=f"Podcast {podcast_id}",
+                rss_url=f"https://example.com/{podcast_id}.xml",
+                last_updated=NOW - timedelta(days=2),
+            )
+        )
+    for podcast_id, gap in cadences.items():
+        db.add_all(
+            Episode(
+                podcast_id=podcast_id,
+                title=f"Episode {i}",
+                url=f"https://example.com/{podcast_id}/{i}",
+                publish_date=NOW - gap * i,
+            )
+            for i in range(20)
+        )
+    # A podcast that stopped publishing a year ago
+    db.add_all(
+        Episode(
+            podcast_id=4,
+            title=f"Episode {i}",
+            url=f"https://example.com/4/{i}",
+            publish_date=NOW - timedelta(days=365 + i),
+        )
+        for i in range(5)
+    )
+    db.commit()
+    db.close()
+    return Session
+
+
+def test_polling_intervals_follow_cadence(Session):
+    """Test that intervals follow publish cadence within the configured bounds."""
+    intervals = polling_intervals(Session(), [1, 2, 3, 4, 5], NOW)
+    assert intervals[1] == pytest.approx(6 * HOUR)
+    assert intervals[2] == refresh_scheduler.REFRESH_MIN_INTERVAL
+    assert intervals[3] == refresh_scheduler.REFRESH_MAX_INTERVAL
+    assert intervals[4] == refresh_scheduler.REFRESH_MAX_INTERVAL
+    assert intervals[5] == refresh_scheduler._DEFAULT_INTERVAL
+
+
+class FakeRefreshService:
+    def __init__(self):
+        self.calls = []
+
+    async def refresh_podcasts(self, db, podcast_ids):
+        self.calls.append(list(podcast_ids))
+        return {
+            "results": [
+                {"podcast_id": podcast_id, "status": "ok", "inserted": 1}
+                for podcast_id in podcast_ids
+            ],
+            "inserted": len(podcast_ids),
+        }
+
+
+def test_tick_refreshes_due_podcasts_in_batches(Session):
+    """Test that overdue podcasts are spread out and refreshed in batches."""
+    service = FakeRefreshService()
+    scheduler = RefreshScheduler(Session, service, tick_seconds=60, batch_size=2)
+
+    # All podcasts are overdue: they are spread over the next few ticks
+    assert asyncio.run(scheduler.tick(NOW)) == []
+    for podcast in scheduler.status(NOW)["podcasts"]:
+        assert NOW < podcast["next_due"] <= NOW + timedelta(minutes=5)
+
+    later = NOW + timedelta(minutes=10)
+    assert len(asyncio.run(scheduler.tick(later))) == 2
+    assert scheduler.status(later)["due"] == 3
+    assert scheduler.status(later)["max_lag_seconds"] > 0
+
+    asyncio.run(scheduler.tick(later))
+    asyncio.run(scheduler.tick(later))
+    assert sorted(sum(service.calls, [])) == [1, 2, 3, 4, 5]
+    refreshed = scheduler.status()["podcasts"][0]
+    assert refreshed["last_status"] == "ok"
+    assert refreshed["next_due"] > datetime.utcnow()
+
+
+def test_tick_forgets_deleted_podcasts(Session):
+    """Test that deleted podcasts are dropped from the schedule."""
+    scheduler = RefreshScheduler(Session, FakeRefreshService())
+    asyncio.run(scheduler.tick(NOW))
+    db = Session()
+    db.delete(db.get(Podcast, 5))
+    db.commit()
+    asyncio.run(scheduler.tick(NOW))
+    assert [p["podcast_id"] for p in scheduler.status(NOW)["podcasts"]] == [1, 2, 3, 4]
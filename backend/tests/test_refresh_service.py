@@ -0,0 +1,192 @@
+"""Tests for concurrent podcast refresh."""
+import asyncio
+import time
+from collections import Counter
+from functools import partial
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.models.database import Base, Podcast, Episode
+from backend.services import feed_fetcher, podcast_service
+from backend.services.refresh_service import RefreshService
+
+N_PODCASTS = 12
+
+
+def feed_xml(n_items):
+    items = "".join(
+        f"<item><title>Episode {i}</title><link>https://example.com/{i}</link>"
+        f"<description>About {i}</description></item>"
+        for i in range(n_items)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>T</title>{items}</channel></rss>'
+
+
+@pytest.fixture
+def db():
+    """Create a shared in-memory database with podcasts on two hosts."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        Podcast(
+            id=i,
+            title=f"Podcast {i}",
+            rss_url=f"https://host{i % 2}.example.com/feed{i}.xml",
+        )
+        for i in range(1, N_PODCASTS + 1)
+    )
+    db.add(Podcast(id=99, title="Broken", rss_url="https://broken.example.com/feed.xml"))
+    db.commit()
+    yield db
+    db.close()
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Serve feeds after a delay, recording the peak number of requests per host."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = Counter()
+        self.peak = Counter()
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        self.in_flight[host] += 1
+        self.peak[host] = max(self.peak[host], self.in_flight[host])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight[host] -= 1
+        if host == "broken.example.com":
+            return httpx.Response(500)
+        return httpx.Response(200, text=feed_xml(3))
+
+
+def test_refresh_podcasts_concurrently(db):
+    """Test that feeds are fetched in parallel within the per-host limit."""
+    transport = StubTransport()
+    service = RefreshService(concurrency=10, per_host=3, transport=transport)
+
+    start = time.perf_counter()
+    summary = asyncio.run(service.refresh_podcasts(db, "all"))
+    elapsed = time.perf_counter() - start
+
+    assert summary["inserted"] == 3 * N_PODCASTS
+    assert summary["failed"] == 1
+    assert db.query(Episode).count() == 3 * N_PODCASTS
+    assert max(transport.peak.values()) == 3
+    # Two hosts at three feeds at a time: two rounds of requests, not twelve
+    assert elapsed < N_PODCASTS * transport.delay
+
+    errors = [r for r in summary["results"] if r["status"] == "error"]
+    assert [r["podcast_id"] for r in errors] == [99]
+
+
+def test_busy_host_does_not_hold_global_slots(db):
+    """Test that feeds waiting for their host leave the global slots free."""
+    db.add_all(
+        Podcast(id=i, title=f"Busy {i}", rss_url=f"https://busy.example.com/{i}.xml")
+        for i in range(100, 106)
+    )
+    db.add(Podcast(id=106, title="Other", rss_url="https://other.example.com/feed.xml"))
+    db.commit()
+    transport = StubTransport()
+    started = {}
+    handle = transport.handle_async_request
+
+    async def record_start(request):
+        started.setdefault(request.url.host, time.perf_counter())
+        return await handle(request)
+
+    transport.handle_async_request = record_start
+    service = RefreshService(concurrency=2, per_host=1, transport=transport)
+    asyncio.run(service.refresh_podcasts(db, list(range(100, 107))))
+    # The other host is served alongside the first busy feed, not after all six
+    assert started["other.example.com"] - started["busy.example.com"] < transport.delay
+
+
+def test_refresh_selected_podcasts(db):
+    """Test that only the requested podcasts are refreshed."""
+    service = RefreshService(transport=StubTransport(delay=0))
+    summary = asyncio.run(service.refresh_podcasts(db, [1, 2]))
+    assert [r["podcast_id"] for r in summary["results"]] == [1, 2]
+    assert [r["inserted"] for r in summary["results"]] == [3, 3]
+
+    summary = asyncio.run(service.refresh_podcasts(db, [1]))
+    assert summary["results"][0]["cache"] == "unchanged"
+    assert summary["cache_hits"] == 1
+
+
+def test_refresh_revalidates_with_etag(db):
+    """Test that feeds answered with 304 are neither downloaded nor parsed."""
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=feed_xml(2), headers={"ETag": '"v1"'})
+
+    service = RefreshService(transport=httpx.MockTransport(handler))
+    summary = asyncio.run(service.refresh_podcasts(db, [1]))
+    assert summary["results"][0]["cache"] == "miss"
+    assert summary["bytes"] > 0
+    assert db.get(Podcast, 1).feed_etag == '"v1"'
+
+    summary = asyncio.run(service.refresh_podcasts(db, [1]))
+    assert summary["results"][0]["cache"] == "not_modified"
+    assert (summary["cache_hits"], summary["bytes"]) == (1, 0)
+    assert db.get(Podcast, 1).feed_etag == '"v1"'
+
+
+def test_refresh_streams_large_feeds(db, monkeypatch):
+    """Test that feeds over the stream threshold are stored as they download."""
+    body = feed_xml(200).encode()
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=body)
+
+    monkeypatch.setattr(
+        feed_fetcher,
+        "open_feed_async",
+        partial(feed_fetcher.open_feed_async, stream_threshold=1000),
+    )
+    monkeypatch.setattr(podcast_service, "FEED_BATCH_SIZE", 64)
+    service = RefreshService(transport=httpx.MockTransport(handler))
+    summary = asyncio.run(service.refresh_podcasts(db, [1]))
+    result = summary["results"][0]
+    assert result["status"] == "ok"
+    assert (result["inserted"], result["stopped_early"]) == (200, False)
+    assert result["bytes"] == len(body)
+    # Downloaded once
+    assert len(requests) == 1
+    assert db.query(Episode).count() == 200
+
+
+def test_first_refresh_uses_cached_feed(db, feed_server, monkeypatch):
+    """Test that a feed parsed while validating is not downloaded again."""
+    from backend.services import podcast_service
+    from backend.services.feed_cache import FeedCache
+
+    monkeypatch.setattr(podcast_service, "feed_cache", FeedCache())
+    monkeypatch.setattr(feed_fetcher, "feed_client", feed_fetcher.FeedClient())
+    rss_url = feed_server.route("/feed.xml", feed_xml(3).encode())
+    db.get(Podcast, 1).rss_url = rss_url
+    db.commit()
+    asyncio.run(podcast_service.fetch_parsed_feed(rss_url))
+
+    transport = StubTransport(delay=0)
+    service = RefreshService(transport=transport)
+    summary = asyncio.run(service.refresh_podcasts(db, [1, 2]))
+    assert [r["cache"] for r in summary["results"]] == ["cached", "miss"]
+    assert [r["inserted"] for r in summary["results"]] == [3, 3]
+    assert set(transport.peak) == {"host0.example.com"}
+    assert len(feed_server.requests) == 1
+    assert db.get(Podcast, 1).feed_content_hash is not None
@@ -0,0 +1,219 @@
+"""Tests for semantic episode search."""
+import threading
+import zlib
+import numpy as np
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, Podcast, Episode
+from backend.services import podcast_service, semantic_search
+from backend.services.episode_index import EpisodeIndex
+from backend.services.semantic_search import (
+    SemanticEpisodeIndex,
+    SemanticSearchUnavailable,
+    episode_text,
+)
+
+faiss = pytest.importorskip("faiss")
+
+DIM = 64
+
+
+def fake_encoder(texts):
+    """Hash words into a normalized bag-of-words vector."""
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+ROWS = [
+    (1, 1, "Jazz history", "the story of jazz music", None),
+    (2, 1, "Space travel", "rockets and the moon", None),
+    (3, 2, "Jazz legends", "<p>great jazz musicians</p>", None),
+    (4, 2, "Cooking pasta", "italian kitchen", None),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Create a semantic index with a fake encoder and a few episodes."""
+    index = SemanticEpisodeIndex(
+        index_path=str(tmp_path / "episodes.faiss"), encoder=fake_encoder
+    )
+    index.load()
+    index.add_episodes(ROWS)
+    return index
+
+
+def test_episode_text_strips_tags():
+    """Test that HTML tags are removed from embedded descriptions."""
+    assert episode_text("Title", "<p>Hello <b>world</b></p>") == "Title\n Hello  world"
+
+
+def test_search_restricted_to_podcasts(index):
+    """Test that results only come from the selected podcasts."""
+    results = index.search("jazz music", [1, 2], 2)
+    assert {episode_id for episode_id, _ in results} == {1, 3}
+
+    results = index.search("jazz music", [2], 10)
+    assert [episode_id for episode_id, _ in results][0] == 3
+    assert {episode_id for episode_id, _ in results} <= {3, 4}
+
+
+def test_remove_podcasts_and_persistence(index, tmp_path):
+    """Test that removals are persisted and reloaded keyed by episode id."""
+    index.remove_podcasts([1])
+    index.save()
+
+    reloaded = SemanticEpisodeIndex(index_path=index.index_path, encoder=fake_encoder)
+    reloaded.load()
+    results = reloaded.search("jazz", [1, 2], 10)
+    assert {episode_id for episode_id, _ in results} == {3, 4}
+
+
+def test_search_requires_loaded_index():
+    """Test that searching a disabled index raises SemanticSearchUnavailable."""
+    with pytest.raises(SemanticSearchUnavailable):
+        SemanticEpisodeIndex(encoder=fake_encoder).search("jazz", [1], 10)
+
+
+@pytest.fixture
+def db():
+    """Create an in-memory database holding the indexed episodes."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        [
+            Podcast(id=1, title="One", rss_url="https://example.com/1.xml"),
+            Podcast(id=2, title="Two", rss_url="https://example.com/2.xml"),
+        ]
+    )
+    db.add_all(
+        Episode(
+            id=episode_id,
+            podcast_id=podcast_id,
+            title=title,
+            description=description,
+            url=f"https://example.com/{episode_id}",
+            publish_date=datetime(2024, 1, episode_id),
+        )
+        for episode_id, podcast_id, title, description, _ in ROWS
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_search_episodes_semantic_mode(db, index, monkeypatch):
+    """Test that search_episodes ranks by the semantic index in semantic mode."""
+    monkeypatch.setattr(podcast_service, "semantic_index", index)
+
+    results = podcast_service.search_episodes(
+        db, "jazz music", [1, 2], skip=0, limit=2, mode="semantic"
+    )
+    assert {item["episode"].id for item in results} == {1, 3}
+
+
+def test_reciprocal_rank_fusion():
+    """Test weighted RRF scores and the reported component scores."""
+    fused, components = podcast_service._reciprocal_rank_fusion(
+        {"lexical": [(1, 200.0), (2, 100.0)], "semantic": [(2, 0.9), (3, 0.5)]},
+        {"lexical": 0.5, "semantic": 0.5},
+    )
+    k = podcast_service.RRF_K
+    assert [episode_id for episode_id, _ in fused] == [2, 1, 3]
+    assert fused[0][1] == pytest.approx(0.5 / (k + 2) + 0.5 / (k + 1))
+    assert components[3] == {
+        "lexical": None,
+        "semantic": 0.5,
+        "lexical_rank": None,
+        "semantic_rank": 2,
+        "fused": pytest.approx(0.5 / (k + 2)),
+    }
+
+
+def test_search_episodes_hybrid_mode(db, index, monkeypatch):
+    """Test hybrid results carry component scores and stage timings."""
+    monkeypatch.setattr(podcast_service, "semantic_index", index)
+    timings = {}
+
+    results = podcast_service.search_episodes(
+        db, "jazz", [1, 2], mode="hybrid", semantic_weight=0.3, timings=timings
+    )
+    assert [item["episode"].id for item in results][:2] in ([1, 3], [3, 1])
+    assert all("scores" in item for item in results)
+    assert results[0]["scores"]["lexical_rank"] == 1
+    assert set(timings) == {"lexical", "semantic", "fusion", "page"}
+
+
+def test_sync_trains_ivf_index(db, tmp_path):
+    """Test that sync trains an IVF index on a sample and embeds every episode."""
+    index = SemanticEpisodeIndex(
+        index_path=str(tmp_path / "ivf.faiss"),
+        encoder=fake_encoder,
+        index_factory="IVF2,Flat",
+        search_params="nprobe=2",
+    )
+    index.load()
+    index.add_episodes(ROWS[:1])
+    assert index.search("jazz", [1, 2], 10) == []
+
+    assert index.sync(db) == len(ROWS)
+    results = index.search("jazz music", [1, 2], 2)
+    assert {episode_id for episode_id, _ in results} == {1, 3}
+
+
+def test_sync_loads_sample_in_chunks(db, tmp_path, monkeypatch):
+    """Test that the training sample is read with bounded IN (...) clauses."""
+    monkeypatch.setattr(semantic_search, "_ID_CHUNK_SIZE", 3)
+    index = SemanticEpisodeIndex(
+        index_path=str(tmp_path / "episodes.faiss"), encoder=fake_encoder
+    )
+    index.load()
+    parameters = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        if "episodes.id IN" in statement:
+            parameters.append(len(params))
+
+    event.listen(db.get_bind(), "after_cursor_execute", capture)
+    try:
+        index._train(db)
+    finally:
+        event.remove(db.get_bind(), "after_cursor_execute", capture)
+
+    assert parameters == [3, 1]
+    results = index.search("jazz music", [1, 2], 2)
+    assert {episode_id for episode_id, _ in results} == {1, 3}
+
+
+def test_stored_episodes_are_embedded_off_the_writer(tmp_path, monkeypatch):
+    """Test that indexing stored episodes queues their embedding to a worker."""
+    release = threading.Event()
+    threads = []
+
+    def blocking_encoder(texts):
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+        return fake_encoder(texts)
+
+    index = SemanticEpisodeIndex(
+        index_path=str(tmp_path / "episodes.faiss"), encoder=blocking_encoder
+    )
+    index.load()
+    monkeypatch.setattr(podcast_service, "semantic_index", index)
+    monkeypatch.setattr(podcast_service, "episode_index", EpisodeIndex())
+
+    podcast_service._index_episodes(ROWS)
+    assert index._store is None
+    release.set()
+    index.close()
+
+    assert threads and threads[0].startswith("semantic-embed")
+    results = index.search("jazz music", [1, 2], 2)
+    assert {episode_id for episode_id, _ in results} == {1, 3}
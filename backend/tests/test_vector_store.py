@@ -0,0 +1,126 @@
+"""Tests for the FAISS vector store."""
+import os
+import numpy as np
+import pytest
+from backend.services.vector_store import VectorStore
+
+faiss = pytest.importorskip("faiss")
+
+DIM = 8
+
+
+def unit_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Create a store holding ten vectors under ids 100..109."""
+    store = VectorStore(DIM, str(tmp_path / "vectors.index"))
+    store.add_many(np.arange(100, 110), unit_vectors(10))
+    return store
+
+
+def test_add_many_uses_explicit_ids(store):
+    """Test that searches return the ids vectors were added under."""
+    scores, ids = store.search(unit_vectors(10)[3:4], 1)
+    assert ids[0][0] == 103
+    assert scores[0][0] == pytest.approx(1.0)
+
+
+def test_add_many_replaces_existing_ids(store):
+    """Test that re-adding an id replaces its vector."""
+    store.add_many(np.array([103]), unit_vectors(1, seed=1))
+    assert store.ntotal == 10
+    _, ids = store.search(unit_vectors(1, seed=1), 1)
+    assert ids[0][0] == 103
+
+
+def test_add_many_rejects_wrong_shape(store):
+    """Test that a matrix of the wrong dimension is rejected."""
+    with pytest.raises(ValueError):
+        store.add_many(np.array([1, 2]), np.zeros((2, DIM + 1)))
+
+
+def test_remove_keeps_other_ids(store):
+    """Test that deletions do not shift the ids of remaining vectors."""
+    assert store.remove(np.array([100, 101, 999])) == 2
+    _, ids = store.search(unit_vectors(10)[5:6], 1)
+    assert ids[0][0] == 105
+    assert store.ntotal == 8
+
+
+def test_search_with_id_mask(store):
+    """Test that an id mask restricts the returned ids."""
+    mask = np.zeros(110, dtype=bool)
+    mask[[104, 107]] = True
+    _, ids = store.search(unit_vectors(10)[3:4], 5, id_mask=mask)
+    assert set(ids[0][ids[0] >= 0]) == {104, 107}
+
+
+def test_maybe_save_batches_writes(store):
+    """Test that maybe_save only writes once enough changes are pending."""
+    store.autosave_every = 15
+    assert not store.maybe_save()
+    assert not os.path.exists(store.index_path)
+
+    store.add_many(np.arange(200, 205), unit_vectors(5, seed=2))
+    assert store.maybe_save()
+    assert os.path.exists(store.index_path)
+    assert not store.maybe_save()
+
+
+def test_mmap_load_is_read_only_and_reloads(store):
+    """Test that a memory-mapped store is read-only and picks up new files."""
+    store.save()
+    mapped = VectorStore.load(store.index_path, mmap=True)
+    assert mapped.ntotal == 10
+    with pytest.raises(RuntimeError):
+        mapped.add_many(np.array([1]), unit_vectors(1))
+    assert not mapped.reload_if_changed()
+
+    store.remove(np.array([100]))
+    store.save()
+    os.utime(store.index_path, (0, mapped._file_mtime + 10))
+    assert mapped.reload_if_changed()
+    assert mapped.ntotal == 9
+
+
+def test_ivf_store_requires_training(tmp_path):
+    """Test that an IVF store is trained before adding and keeps its nprobe."""
+    vectors = unit_vectors(200)
+    store = VectorStore(
+        DIM,
+        str(tmp_path / "ivf.index"),
+        index_factory="IVF4,Flat",
+        search_params="nprobe=4",
+    )
+    assert not store.is_trained
+    with pytest.raises(ValueError):
+        store.add_many(np.arange(200), vectors)
+
+    store.train(vectors)
+    store.add_many(np.arange(200), vectors)
+    mask = np.zeros(200, dtype=bool)
+    mask[50:] = True
+    _, ids = store.search(vectors[60:61], 1, id_mask=mask)
+    assert ids[0][0] == 60
+
+    store.save()
+    loaded = VectorStore.load(store.index_path, search_params="nprobe=4")
+    _, ids = loaded.search(vectors[10:11], 1)
+    assert ids[0][0] == 10
+
+
+def test_hnsw_store_masks_instead_of_removing(tmp_path):
+    """Test that HNSW stores skip removal and honour id masks."""
+    store = VectorStore(DIM, index_factory="HNSW16", search_params="efSearch=64")
+    assert not store.supports_remove
+    store.add_many(np.arange(100, 110), unit_vectors(10))
+    assert store.remove(np.array([103])) == 0
+
+    mask = np.ones(110, dtype=bool)
+    mask[103] = False
+    _, ids = store.search(unit_vectors(10)[3:4], 3, id_mask=mask)
+    assert 103 not in ids[0]
@@ -0,0 +1,181 @@
+"""Load test the sync and async read routes of the API.
+
+Seeds a temporary SQLite database, then starts the API under uvicorn once per
+stack (ASYNC_DB_ENABLED false and true) and sends searches and episode
+listings from many concurrent clients. Reports throughput, latency
+percentiles and errors per stack.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_async_routes.py --clients 200 --seconds 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.database import (
+    Base,
+    Episode,
+    Podcast,
+    create_sqlite_engine,
+    ensure_episode_fts,
+)
+
+N_PODCASTS = 20
+# Random letter strings, so that trigram searches select few episodes
+_rng = random.Random(42)
+WORDS = [
+    "".join(_rng.choices("abcdefghijklmnopqrstuvwxyz", k=_rng.randint(4, 9)))
+    for _ in range(5000)
+]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(url: str, n_episodes: int, rng: random.Random):
+    engine = create_sqlite_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_episode_fts(connection)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        Podcast(id=i, title=f"Podcast {i}", rss_url=f"https://example.com/{i}.xml")
+        for i in range(1, N_PODCASTS + 1)
+    )
+    start = datetime(2020, 1, 1)
+    db.execute(
+        insert(Episode),
+        [
+            {
+                "podcast_id": rng.randint(1, N_PODCASTS),
+                "title": " ".join(rng.choices(WORDS, k=8)),
+                "description": " ".join(rng.choices(WORDS, k=60)),
+                "url": f"https://example.com/episodes/{i}",
+                "publish_date": start + timedelta(minutes=i),
+            }
+            for i in range(n_episodes)
+        ],
+    )
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url: str, async_db: bool, port: int):
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": url,
+        "ASYNC_DB_ENABLED": str(async_db).lower(),
+        "EPISODE_SEARCH_ENGINE": "fts",
+        "SEMANTIC_SEARCH_ENABLED": "false",
+        "REFRESH_SCHEDULER_ENABLED": "false",
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--port", str(port), "--log-level", "warning", "--no-access-log",
+        ],
+        # The API reads its prompts relative to the repository root
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/podcasts/with_counts", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The API did not start")
+
+
+async def client(http: httpx.AsyncClient, rng: random.Random, stop: float, stats: dict):
+    podcast_ids = list(range(1, N_PODCASTS + 1))
+    while time.monotonic() < stop:
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.8:
+                response = await http.post(
+                    "/api/episodes/search",
+                    params={"limit": 20},
+                    json={"query": rng.choice(WORDS), "podcast_ids": podcast_ids},
+                )
+            else:
+                response = await http.get(
+                    "/api/episodes",
+                    params={"podcast_ids": rng.sample(podcast_ids, 3), "limit": 20},
+                )
+            response.raise_for_status()
+            stats["latencies"].append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            stats["errors"] += 1
+
+
+async def load(port: int, clients: int, seconds: float) -> dict:
+    stats = {"latencies": [], "errors": 0}
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+    ) as http:
+        stop = time.monotonic() + seconds
+        await asyncio.gather(
+            *(client(http, random.Random(i), stop, stats) for i in range(clients))
+        )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=50000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--stacks", nargs="+", default=["sync", "async"])
+    args = parser.parse_args()
+
+    print(
+        f"{'stack':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'errors':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(url, args.episodes, random.Random(0))
+        for stack in args.stacks:
+            port = free_port()
+            server = start_server(url, stack == "async", port)
+            try:
+                stats = asyncio.run(load(port, args.clients, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            latencies = stats["latencies"] or [0.0]
+            print(
+                f"{stack:>6} {len(stats['latencies']) / args.seconds:>8.1f} "
+                f"{np.percentile(latencies, 50):>8.1f} "
+                f"{np.percentile(latencies, 95):>8.1f} "
+                f"{np.percentile(latencies, 99):>8.1f} "
+                f"{max(latencies):>8.1f} {stats['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
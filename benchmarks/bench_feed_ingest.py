@@ -0,0 +1,70 @@
+"""Benchmark storing the entries of a large feed as episodes.
+
+Ingests a synthetic feed of N entries into a temporary SQLite database with
+podcast_service.ingest_feed_entries, then ingests it again unchanged, and
+reports the median time of both passes per feed size.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_feed_ingest.py --entries 1000 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from feedparser import FeedParserDict
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.database import Base, Episode, Podcast, create_sqlite_engine
+from backend.services import podcast_service
+
+
+def make_entries(n_entries: int):
+    return [
+        FeedParserDict(
+            title=f"Episode {i}",
+            description=f"Description of episode {i} " * 20,
+            link=f"https://example.com/episodes/{i}",
+            published_parsed=time.gmtime(1700000000 + i * 3600),
+        )
+        for i in range(n_entries)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'insert ms':>10} {'unchanged ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+        with SessionLocal() as db:
+            db.add(Podcast(id=1, title="Bench", rss_url="https://example.com/feed.xml"))
+            db.commit()
+        for n_entries in args.entries:
+            entries = make_entries(n_entries)
+            inserts, unchanged = [], []
+            for _ in range(args.repeats):
+                with SessionLocal() as db:
+                    db.query(Episode).delete()
+                    db.commit()
+                    podcast = db.get(Podcast, 1)
+                    for timings in (inserts, unchanged):
+                        result = podcast_service.ingest_feed_entries(
+                            db, podcast, entries
+                        )
+                        timings.append(result["elapsed_ms"])
+            print(
+                f"{n_entries:>8} {np.median(inserts):>10.1f} "
+                f"{np.median(unchanged):>13.1f}"
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
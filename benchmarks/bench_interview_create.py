@@ -0,0 +1,151 @@
+"""Benchmark interview creation with nested notes, items and blocks.
+
+Creates interviews in a temporary SQLite database both the way the route used
+to (ORM objects, flushing every note for its id) and with
+interview_service.create_interview (bulk inserts), and reports the median
+time and the number of statements per payload size.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_interview_create.py --notes 10 100 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.models.database import Base, create_sqlite_engine
+from backend.models.interview_models import (
+    BlockType,
+    CanvasBlock,
+    Interview,
+    ItemType,
+    Note,
+    NoteItem,
+    Project,
+    ProvenanceType,
+)
+from backend.models.interview_schemas import InterviewCreate
+from backend.services import interview_service
+
+
+def payload(n_notes: int, n_items: int) -> InterviewCreate:
+    return InterviewCreate(
+        project_id=1,
+        interview_title="Template",
+        background_context="Context " * 50,
+        notes=[
+            {
+                "client_id": f"n{i}",
+                "title": f"Note {i}",
+                "order_index": i,
+                "items": [
+                    {
+                        "client_id": f"n{i}-i{j}",
+                        "type": "text",
+                        "content": f"Item {j} of note {i} " * 5,
+                        "order_index": j,
+                    }
+                    for j in range(n_items)
+                ],
+            }
+            for i in range(n_notes)
+        ],
+        canvas_blocks=[
+            {"client_id": f"b{i}", "type": "paragraph", "text": f"Block {i}", "order_index": i}
+            for i in range(n_notes // 2)
+        ],
+    )
+
+
+def create_per_note(db: Session, data: InterviewCreate) -> int:
+    """The previous implementation of the create_interview route."""
+    db_interview = Interview(
+        project_id=data.project_id,
+        interview_title=data.interview_title,
+        background_context=data.background_context,
+    )
+    db.add(db_interview)
+    db.flush()
+    for note_data in data.notes:
+        db_note = Note(
+            interview_id=db_interview.id,
+            client_id=note_data.client_id,
+            title=note_data.title,
+            order_index=note_data.order_index,
+        )
+        db.add(db_note)
+        db.flush()
+        for item_data in note_data.items:
+            db.add(
+                NoteItem(
+                    note_id=db_note.id,
+                    client_id=item_data.client_id,
+                    type=ItemType(item_data.type),
+                    content=item_data.content,
+                    provenance=ProvenanceType(item_data.provenance),
+                    source_title=item_data.source_title,
+                    source_domain=item_data.source_domain,
+                    order_index=item_data.order_index,
+                )
+            )
+    for block_data in data.canvas_blocks:
+        db.add(
+            CanvasBlock(
+                interview_id=db_interview.id,
+                client_id=block_data.client_id,
+                type=BlockType(block_data.type),
+                text=block_data.text,
+                order_index=block_data.order_index,
+            )
+        )
+    db.flush()
+    return db_interview.id
+
+
+PATHS = {"per_note": create_per_note, "bulk": interview_service.create_interview}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--items", type=int, default=5, help="Items per note")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'notes':>6} {'rows':>7} {'path':>9} {'median ms':>10} {'statements':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+        with SessionLocal() as db:
+            db.add(Project(id=1, title="Project"))
+            db.commit()
+        statements = []
+        event.listen(
+            engine, "after_cursor_execute", lambda *args: statements.append(None)
+        )
+        for n_notes in args.notes:
+            data = payload(n_notes, args.items)
+            rows = 1 + n_notes * (1 + args.items) + n_notes // 2
+            for name, create in PATHS.items():
+                timings = []
+                for _ in range(args.repeats):
+                    statements.clear()
+                    start = time.perf_counter()
+                    with SessionLocal() as db:
+                        create(db, data)
+                        db.commit()
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(
+                    f"{n_notes:>6} {rows:>7} {name:>9} "
+                    f"{np.median(timings):>10.1f} {len(statements):>11}"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
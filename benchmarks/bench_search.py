@@ -0,0 +1,139 @@
+"""Benchmark episode search latency for each search engine.
+
+Builds a synthetic corpus in a temporary SQLite database and reports p50/p99
+latency of podcast_service.search_episodes per engine and corpus size.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_search.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.database import Base
+from backend.services import podcast_service
+from backend.services.episode_index import EpisodeIndex
+
+N_PODCASTS = 50
+VOCABULARY_SIZE = 20000
+TITLE_WORDS = 8
+DESCRIPTION_WORDS = 60
+
+
+def make_vocabulary(rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        "".join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+
+
+def populate(db_path: str, n_episodes: int, vocabulary: list, rng: random.Random):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    # Zipf-like word frequencies, like natural text
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO podcasts (id, title, rss_url) VALUES (?, ?, ?)",
+        [(i, f"Podcast {i}", f"https://example.com/{i}.xml") for i in range(1, N_PODCASTS + 1)],
+    )
+    start = datetime(2010, 1, 1)
+    batch = []
+    for i in range(1, n_episodes + 1):
+        words = rng.choices(vocabulary, weights, k=TITLE_WORDS + DESCRIPTION_WORDS)
+        batch.append(
+            (
+                i,
+                rng.randint(1, N_PODCASTS),
+                " ".join(words[:TITLE_WORDS]).capitalize(),
+                " ".join(words[TITLE_WORDS:]),
+                f"https://example.com/episodes/{i}",
+                (start + timedelta(minutes=i)).isoformat(sep=" "),
+            )
+        )
+        if len(batch) == 10000:
+            _insert(conn, batch)
+            batch = []
+    _insert(conn, batch)
+    conn.commit()
+    conn.close()
+
+
+def _insert(conn, batch):
+    conn.executemany(
+        "INSERT INTO episodes (id, podcast_id, title, description, url, publish_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        batch,
+    )
+
+
+def make_queries(vocabulary: list, rng: random.Random, n: int) -> list:
+    common = vocabulary[:50]
+    rare = vocabulary[1000:]
+    queries = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            queries.append(rng.choice(common))
+        elif kind == 1:
+            queries.append(rng.choice(rare))
+        elif kind == 2:
+            queries.append(rng.choice(common)[:3])
+        else:
+            queries.append(f"{rng.choice(common)} {rng.choice(common)}")
+    return queries
+
+
+def time_engine(db, engine: str, queries: list, podcast_ids: list) -> tuple:
+    podcast_service.SEARCH_ENGINE = engine
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        podcast_service.search_episodes(db, query, podcast_ids, 60, 40, 10, 0, 100)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--engines", nargs="+", default=["scan", "fts", "index"])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    queries = make_queries(vocabulary, rng, args.queries)
+    podcast_ids = list(range(1, N_PODCASTS + 1))
+
+    print(f"{'episodes':>10} {'engine':>6} {'p50 ms':>10} {'p99 ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            populate(db_path, size, vocabulary, rng)
+            engine = create_engine(f"sqlite:///{db_path}")
+            db = sessionmaker(bind=engine)()
+            if "index" in args.engines:
+                index = EpisodeIndex()
+                index.build(db)
+                podcast_service.episode_index = index
+            for name in args.engines:
+                p50, p99 = time_engine(db, name, queries, podcast_ids)
+                print(f"{size:>10} {name:>6} {p50:>10.1f} {p99:>10.1f}")
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
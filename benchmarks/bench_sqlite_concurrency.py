@@ -0,0 +1,156 @@
+"""Benchmark search reads running concurrently with feed ingest writes.
+
+Seeds a temporary SQLite database, then runs a writer thread ingesting feed
+entries in batches while reader threads list or search episodes, once per
+journal mode. Reports completed reads and writes, read latency and lock errors.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_sqlite_concurrency.py --seconds 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from feedparser import FeedParserDict
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.database import (
+    SQLITE_PRAGMAS,
+    Base,
+    Podcast,
+    create_sqlite_engine,
+    ensure_episode_fts,
+)
+from backend.services import podcast_service
+
+N_PODCASTS = 20
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def seed(engine, n_episodes: int, rng: random.Random):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_episode_fts(connection)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        Podcast(id=i, title=f"Podcast {i}", rss_url=f"https://example.com/{i}.xml")
+        for i in range(1, N_PODCASTS + 1)
+    )
+    db.commit()
+    podcast = db.get(Podcast, 1)
+    podcast_service.ingest_feed_entries(
+        db, podcast, [make_entry(rng, f"seed-{i}") for i in range(n_episodes)]
+    )
+    db.close()
+
+
+def make_entry(rng: random.Random, guid: str) -> FeedParserDict:
+    published = datetime(2020, 1, 1) + timedelta(minutes=rng.randint(0, 10**6))
+    return FeedParserDict(
+        id=guid,
+        title=" ".join(rng.choices(WORDS, k=8)),
+        description=" ".join(rng.choices(WORDS, k=60)),
+        link=f"https://example.com/episodes/{guid}",
+        published_parsed=published.timetuple(),
+    )
+
+
+def writer(engine, stop: threading.Event, batch_size: int, stats: dict):
+    rng = random.Random(1)
+    db = sessionmaker(bind=engine)()
+    batch = 0
+    while not stop.is_set():
+        podcast = db.get(Podcast, rng.randint(1, N_PODCASTS))
+        entries = [make_entry(rng, f"w{batch}-{i}") for i in range(batch_size)]
+        try:
+            podcast_service.ingest_feed_entries(db, podcast, entries)
+            stats["writes"] += 1
+        except OperationalError:
+            db.rollback()
+            stats["write_errors"] += 1
+        batch += 1
+    db.close()
+
+
+def reader(engine, stop: threading.Event, seed_value: int, query: str, stats: dict):
+    rng = random.Random(seed_value)
+    db = sessionmaker(bind=engine)()
+    podcast_ids = list(range(1, N_PODCASTS + 1))
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if query == "search":
+                podcast_service.search_episodes(
+                    db, rng.choice(WORDS), podcast_ids, 60, 40, 10, 0, 20
+                )
+            else:
+                podcast_service.get_episodes_for_podcasts(
+                    db, [rng.randint(1, N_PODCASTS)], 0, 20
+                )
+            db.rollback()
+            stats["latencies"].append((time.perf_counter() - start) * 1000)
+        except OperationalError:
+            db.rollback()
+            stats["read_errors"] += 1
+    db.close()
+
+
+def run(journal_mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        pragmas = {**SQLITE_PRAGMAS, "journal_mode": journal_mode}
+        engine = create_sqlite_engine(f"sqlite:///{db_path}", pragmas)
+        seed(engine, args.episodes, random.Random(0))
+
+        stats = {"latencies": [], "writes": 0, "write_errors": 0, "read_errors": 0}
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=writer, args=(engine, stop, args.batch_size, stats))
+        ] + [
+            threading.Thread(target=reader, args=(engine, stop, i, args.query, stats))
+            for i in range(args.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=50000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--modes", nargs="+", default=["DELETE", "WAL"])
+    parser.add_argument("--query", choices=["list", "search"], default="list")
+    args = parser.parse_args()
+
+    podcast_service.SEARCH_ENGINE = "fts"
+    print(
+        f"{'journal':>8} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'writes/s':>9} {'read err':>9} {'write err':>10}"
+    )
+    for mode in args.modes:
+        stats = run(mode, args)
+        latencies = stats["latencies"] or [0.0]
+        print(
+            f"{mode:>8} {len(stats['latencies']) / args.seconds:>9.1f} "
+            f"{np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f} "
+            f"{max(latencies):>8.1f} {stats['writes'] / args.seconds:>9.1f} "
+            f"{stats['read_errors']:>9} {stats['write_errors']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark approximate nearest neighbour indexes for semantic search.
+
+Builds a VectorStore per index factory over a synthetic set of clustered,
+normalized vectors and reports recall@10 against the exact Flat index,
+queries per second and on-disk index size (a proxy for memory).
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_vectors.py --n 1000000 \\
+        --factories Flat IVF4096,PQ48 IVF4096,Flat HNSW32 \\
+        --search-params "" nprobe=32 nprobe=32 efSearch=64
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from backend.services.vector_store import VectorStore
+
+K = 10
+N_CLUSTERS = 1000
+
+
+def make_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian clusters on the unit sphere, closer to embeddings than noise."""
+    centers = rng.standard_normal((N_CLUSTERS, dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(start + 100000, n)
+        labels = rng.integers(N_CLUSTERS, size=stop - start)
+        vectors[start:stop] = centers[labels] + 0.5 * rng.standard_normal(
+            (stop - start, dim), dtype=np.float32
+        )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bench(factory, search_params, vectors, queries, train_size, tmp):
+    store = VectorStore(
+        vectors.shape[1],
+        os.path.join(tmp, "bench.index"),
+        index_factory=factory,
+        search_params=search_params,
+    )
+    start = time.perf_counter()
+    if not store.is_trained:
+        store.train(vectors[:train_size])
+    for offset in range(0, len(vectors), 100000):
+        chunk = vectors[offset : offset + 100000]
+        store.add_many(np.arange(offset, offset + len(chunk)), chunk)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, ids = store.search(queries, K)
+    qps = len(queries) / (time.perf_counter() - start)
+
+    store.save()
+    size = os.path.getsize(store.index_path)
+    os.remove(store.index_path)
+    return ids, build_s, qps, size
+
+
+def default_search_params(factory: str) -> str:
+    if factory.startswith("IVF"):
+        return "nprobe=32"
+    if factory.startswith("HNSW"):
+        return "efSearch=64"
+    return ""
+
+
+def recall(ids: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(row, true_row)) for row, true_row in zip(ids, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--train-size", type=int, default=100000)
+    parser.add_argument(
+        "--factories", nargs="+", default=["Flat", "IVF4096,PQ48", "HNSW32"]
+    )
+    parser.add_argument(
+        "--search-params",
+        nargs="+",
+        help="Query-time parameters, one per factory",
+    )
+    args = parser.parse_args()
+    search_params = args.search_params or [
+        default_search_params(factory) for factory in args.factories
+    ]
+
+    rng = np.random.default_rng(42)
+    vectors = make_vectors(args.n, args.dim, rng)
+    queries = make_vectors(args.queries, args.dim, rng)
+
+    print(
+        f"{'factory':>16} {'params':>12} {'recall@10':>10} {'QPS':>10} "
+        f"{'build s':>8} {'MB':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        truth, build_s, qps, size = bench("Flat", "", vectors, queries, 0, tmp)
+        for factory, params in zip(args.factories, search_params):
+            if factory != "Flat":
+                ids, build_s, qps, size = bench(
+                    factory, params, vectors, queries, args.train_size, tmp
+                )
+            else:
+                ids = truth
+            print(
+                f"{factory:>16} {params:>12} {recall(ids, truth):>10.3f} "
+                f"{qps:>10.0f} {build_s:>8.1f} {size / 2**20:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -118,8 +118,8 @@ export default function EpisodesTab() {
     }
 
     try {
-      // Refresh each selected podcast
-      await Promise.all(selectedPodcasts.map(id => podcastsApi.refresh(id)))
+      // Refresh all selected podcasts in one request
+      await podcastsApi.refreshMany(selectedPodcasts)
 
       // Refresh the podcasts list to get updated counts
       await mutate('/podcasts/with_counts')
@@ -40,6 +40,7 @@ export interface SearchResult {
     title?: [number, number][]
     description?: [number, number][]
   }
+  score?: number
 }
 
 export interface ValidateResponse {
@@ -48,6 +49,44 @@ export interface ValidateResponse {
   error?: string
 }
 
+export interface RefreshResult {
+  podcast_id: number
+  status: 'ok' | 'error'
+  inserted?: number
+  updated?: number
+  skipped?: number
+  fetch_ms?: number
+  elapsed_ms?: number
+  cache?: 'miss' | 'not_modified' | 'unchanged' | 'cached'
+  bytes?: number
+  error?: string
+}
+
+export interface RefreshSummary {
+  results: RefreshResult[]
+  inserted: number
+  failed: number
+  cache_hits: number
+  bytes: number
+  elapsed_ms: number
+}
+
+export interface OpmlImportJob {
+  job_id: string
+  status: 'pending' | 'validating' | 'saving' | 'ingesting' | 'done' | 'error'
+  ingest: boolean
+  total: number
+  validated: number
+  valid: number
+  invalid: number
+  existing: number
+  created: number
+  inserted: number
+  errors: { rss_url?: string; podcast_id?: number; error: string }[]
+  elapsed_ms: number
+  error?: string
+}
+
 const api = axios.create({
   baseURL: API_BASE_URL,
 })
@@ -153,6 +192,33 @@ export const podcastsApi = {
       throw error
     }
   },
+  refreshMany: async (ids: number[] | 'all'): Promise<ApiResponse<RefreshSummary>> => {
+    try {
+      return await api.post('/podcasts/refresh', { podcast_ids: ids })
+    } catch (error) {
+      console.error('Error in podcastsApi.refreshMany:', error)
+      throw error
+    }
+  },
+  importOpml: async (opml: string, ingest = false): Promise<ApiResponse<OpmlImportJob>> => {
+    try {
+      return await api.post('/podcasts/import_opml', opml, {
+        params: { ingest },
+        headers: { 'Content-Type': 'text/x-opml' },
+      })
+    } catch (error) {
+      console.error('Error in podcastsApi.importOpml:', error)
+      throw error
+    }
+  },
+  getOpmlImport: async (jobId: string): Promise<ApiResponse<OpmlImportJob>> => {
+    try {
+      return await api.get(`/podcasts/import_opml/${jobId}`)
+    } catch (error) {
+      console.error('Error in podcastsApi.getOpmlImport:', error)
+      throw error
+    }
+  },
   delete: async (id: number): Promise<void> => {
     try {
       return await api.delete(`/podcasts/${id}`)
@@ -62,7 +62,8 @@ start_servers() {
     if ! is_running "$backend_pid"; then
         echo "Starting backend server..."
         kill_process_on_port "$BACKEND_PORT"
-        PYTHONPATH="." uvicorn backend.main:app --host 0.0.0.0 --port "$BACKEND_PORT" > backend.log 2>&1 &
+        PYTHONPATH="." REFRESH_SCHEDULER_ENABLED="${REFRESH_SCHEDULER_ENABLED:-true}" \
+            uvicorn backend.main:app --host 0.0.0.0 --port "$BACKEND_PORT" > backend.log 2>&1 &
         echo $! > "$BACKEND_PID_FILE"
     else
         echo "Backend server is already running"
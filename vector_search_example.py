@@ -2,25 +2,27 @@ import os
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-import faiss
 import numpy as np
 import sqlite3
-from typing import List
+from typing import List, Tuple
 
+from backend.services.vector_store import VectorStore
+
+
+class ItemStore:
+    """Items with their embeddings: vectors in a VectorStore, metadata in SQLite.
+
+    Both sides share the item id, so deleting an item never shifts the
+    mapping between vector positions and rows.
+    """
 
-class VectorStore:
     def __init__(
         self, dim: int, index_path: str = "vectors.index", db_path: str = "metadata.db"
     ):
-        self.dim = dim
-        self.index_path = index_path
-        self.db_path = db_path
-
-        # Initialize or load Faiss index
         if os.path.exists(index_path):
-            self.index = faiss.read_index(index_path)
+            self.vectors = VectorStore.load(index_path)
         else:
-            self.index = faiss.IndexFlatL2(dim)
+            self.vectors = VectorStore(dim, index_path)
 
         # Initialize SQLite for metadata
         self.conn = sqlite3.connect(db_path)
@@ -34,40 +36,54 @@ class VectorStore:
         )
         self.conn.commit()
 
-    def add_item(self, description: str, embedding: List[float]) -> None:
-        """Add an item with its embedding."""
-        vector = np.array([embedding], dtype=np.float32)
-        self.index.add(vector)
-
-        # Store metadata
-        self.conn.execute("INSERT INTO items (description) VALUES (?)", (description,))
-        self.conn.commit()
+    def add_items(self, items: List[Tuple[str, List[float]]]) -> List[int]:
+        """Add (description, embedding) items in one transaction. Returns their ids."""
+        with self.conn:
+            ids = [
+                self.conn.execute(
+                    "INSERT INTO items (description) VALUES (?)", (description,)
+                ).lastrowid
+                for description, _ in items
+            ]
+        self.vectors.add_many(
+            np.array(ids), np.array([embedding for _, embedding in items])
+        )
+        self.vectors.maybe_save()
+        return ids
 
-        # Save index to disk
-        faiss.write_index(self.index, self.index_path)
+    def delete_items(self, ids: List[int]) -> None:
+        with self.conn:
+            self.conn.executemany("DELETE FROM items WHERE id = ?", [(i,) for i in ids])
+        self.vectors.remove(np.array(ids))
+        self.vectors.maybe_save()
 
     def search_similar(
         self, query_embedding: List[float], limit: int = 3
     ) -> List[tuple]:
-        """Find most similar items."""
-        query = np.array([query_embedding], dtype=np.float32)
-        distances, indices = self.index.search(query, limit)
-
-        # Get metadata for results
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            description = self.conn.execute(
-                "SELECT description FROM items WHERE id = ?",
-                (int(idx) + 1,),  # SQLite rowid starts at 1
-            ).fetchone()[0]
-            similarity = 1 / (1 + dist)  # Convert L2 distance to similarity score
-            results.append((description, similarity))
-        return results
+        """Find most similar items by inner product."""
+        scores, ids = self.vectors.search(np.array([query_embedding]), limit)
+        hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+        if not hits:
+            return []
+
+        # Get metadata for all results at once
+        placeholders = ",".join("?" * len(hits))
+        descriptions = dict(
+            self.conn.execute(
+                f"SELECT id, description FROM items WHERE id IN ({placeholders})",
+                [i for i, _ in hits],
+            )
+        )
+        return [(descriptions[i], score) for i, score in hits if i in descriptions]
+
+    def close(self) -> None:
+        self.vectors.save()
+        self.conn.close()
 
 
 def main():
     # Initialize store with 3D vectors
-    store = VectorStore(dim=3)
+    store = ItemStore(dim=3)
 
     # Sample data
     items = [
@@ -78,8 +94,7 @@ def main():
     ]
 
     # Add items
-    for desc, emb in items:
-        store.add_item(desc, emb)
+    store.add_items(items)
 
     # Search example
     query = [1.0, 0.2, 0.1]  # Similar to "red apple"
@@ -89,6 +104,8 @@ def main():
     for item, similarity in results:
         print(f"{item}: {similarity:.3f}")
 
+    store.close()
+
 
 if __name__ == "__main__":
     main()